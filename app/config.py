@@ -0,0 +1,70 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Server settings, read from `LOGLASS_*` environment variables."""
+
+    # redis://host:port/db to share tiles between workers; the in-process LRU is used when unset
+    tile_cache_url: Optional[str] = None
+    tile_cache_max_bytes: int = 256 * 1024 * 1024
+    tile_cache_ttl_seconds: Optional[int] = None
+    # "thread" or "process" pool for blocking HDF5 reads, its size, and how many workers one tileset may use at once
+    tile_executor: str = "thread"
+    tile_workers: int = min(32, (os.cpu_count() or 1) + 4)
+    tile_workers_per_tileset: int = 4
+    # Workers of their own for tileset info reads, so they never queue behind tile reads
+    tileset_info_workers: int = 2
+    # Tileset infos resolved in parallel per /tileset_info/ request, and how long one may take
+    tileset_info_concurrency: int = 16
+    tileset_info_timeout_seconds: float = 10.0
+    # SQLite database of the tileset catalog, shared by all workers; the in-memory stub catalog is used when unset
+    tileset_db: Optional[str] = None
+    tileset_db_readers: int = 4
+    # HDF5 files kept open per process (and per worker process in "process" mode)
+    max_open_files: int = 32
+    # Decompressed multivec chunks kept for the neighbouring tiles that share them
+    multivec_chunk_cache_bytes: int = 64 * 1024 * 1024
+    # Cooler tilesets whose infos, zoom tables and files are loaded at startup, at most max_open_files
+    warmup_tilesets: int = 32
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+@lru_cache
+def get_settings() -> Settings:
+    defaults = Settings()
+    return Settings(
+        tile_cache_url=os.environ.get("LOGLASS_TILE_CACHE_URL") or None,
+        tile_cache_max_bytes=_env_int("LOGLASS_TILE_CACHE_MAX_BYTES", defaults.tile_cache_max_bytes),
+        tile_cache_ttl_seconds=_env_optional_int("LOGLASS_TILE_CACHE_TTL_SECONDS"),
+        tile_executor=os.environ.get("LOGLASS_TILE_EXECUTOR") or defaults.tile_executor,
+        tile_workers=_env_int("LOGLASS_TILE_WORKERS", defaults.tile_workers),
+        tile_workers_per_tileset=_env_int("LOGLASS_TILE_WORKERS_PER_TILESET", defaults.tile_workers_per_tileset),
+        tileset_info_workers=_env_int("LOGLASS_TILESET_INFO_WORKERS", defaults.tileset_info_workers),
+        tileset_info_concurrency=_env_int("LOGLASS_TILESET_INFO_CONCURRENCY", defaults.tileset_info_concurrency),
+        tileset_info_timeout_seconds=_env_float(
+            "LOGLASS_TILESET_INFO_TIMEOUT_SECONDS", defaults.tileset_info_timeout_seconds
+        ),
+        tileset_db=os.environ.get("LOGLASS_TILESET_DB") or None,
+        tileset_db_readers=_env_int("LOGLASS_TILESET_DB_READERS", defaults.tileset_db_readers),
+        max_open_files=_env_int("LOGLASS_MAX_OPEN_FILES", defaults.max_open_files),
+        multivec_chunk_cache_bytes=_env_int("LOGLASS_MULTIVEC_CHUNK_CACHE_BYTES", defaults.multivec_chunk_cache_bytes),
+        warmup_tilesets=_env_int("LOGLASS_WARMUP_TILESETS", defaults.warmup_tilesets),
+    )
@@ -0,0 +1,80 @@
+from typing import Any, Dict, Union
+
+from fastapi import Request
+
+from app.config import Settings, get_settings
+from app.models import ErrorModel
+from app.services.chromsizes_store import ChromSizesStore
+from app.services.cooler_tiles import CoolerTileEngine
+from app.services.hdf5_pool import HDF5HandlePool
+from app.services.multivec_tiles import MultivecTileEngine
+from app.services.single_flight import SingleFlight
+from app.services.sqlite_repository import SqliteTilesetRepository
+from app.services.tile_cache import TileCache, create_tile_cache
+from app.services.tile_encoding import EncodedTile
+from app.services.tile_executor import TileExecutor
+from app.services.tileset_info_cache import TilesetInfoCache
+from app.services.tileset_repository import StubTilesetRepository
+
+_tile_flights: SingleFlight[str, Union[EncodedTile, ErrorModel]] = SingleFlight()
+_chromsizes_store = ChromSizesStore()
+
+
+def get_tile_cache(request: Request) -> TileCache:
+    """
+    The app's shared tile cache, so that cached tiles outlive a single request.
+
+    Like the repository, it is normally created and closed by the app lifespan,
+    and created on first use by apps run without it.
+    """
+    tile_cache = getattr(request.app.state, "tile_cache", None)
+    if tile_cache is None:
+        tile_cache = request.app.state.tile_cache = create_tile_cache(get_settings())
+    return tile_cache
+
+
+def get_tile_flights() -> SingleFlight[str, Union[EncodedTile, ErrorModel]]:
+    """Process-wide registry of in-flight tile generations, keyed by tile cache key."""
+    return _tile_flights
+
+
+def get_chromsizes_store() -> ChromSizesStore:
+    """Process-wide chromosome sizes, with offsets and response bodies computed once per assembly."""
+    return _chromsizes_store
+
+
+def create_tileset_repository(settings: Settings) -> StubTilesetRepository:
+    """
+    Repository with its own file handles, tile executor and info cache, meant to live as long as the app.
+
+    Backed by the SQLite database of `settings.tileset_db`, or by the stub catalog when it is unset.
+    """
+    cooler_engine = CoolerTileEngine(HDF5HandlePool(max_open=settings.max_open_files))
+    resources: Dict[str, Any] = {
+        "cooler_engine": cooler_engine,
+        "multivec_engine": MultivecTileEngine(cooler_engine.pool, settings.multivec_chunk_cache_bytes),
+        "executor": TileExecutor(
+            max_workers=settings.tile_workers,
+            per_tileset_limit=settings.tile_workers_per_tileset,
+            mode=settings.tile_executor,
+            max_open_files=settings.max_open_files,
+            info_workers=settings.tileset_info_workers,
+        ),
+        "info_cache": TilesetInfoCache(),
+    }
+    if settings.tileset_db is not None:
+        return SqliteTilesetRepository(settings.tileset_db, readers=settings.tileset_db_readers, **resources)
+    return StubTilesetRepository(**resources)
+
+
+async def get_repository(request: Request) -> StubTilesetRepository:
+    """
+    The app's shared repository, so that open files and caches outlive a single request.
+
+    It is normally created by the app lifespan; apps run without it (e.g. a TestClient
+    outside a `with` block) create it on first use.
+    """
+    repository = getattr(request.app.state, "tileset_repository", None)
+    if repository is None:
+        repository = request.app.state.tileset_repository = create_tileset_repository(get_settings())
+    return repository
@@ -1,15 +1,44 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
-from app.routers import chromsizes, tilesets
+from app.config import get_settings
+from app.dependencies import create_tileset_repository
+from app.routers import chromsizes, metrics, tilesets
+from app.services.tile_cache import create_tile_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Open the shared tileset repository and tile cache, and warm the repository up.
+
+    On shutdown, finish running reads and close both.
+    """
+    settings = get_settings()
+    tile_cache = app.state.tile_cache = create_tile_cache(settings)
+    repository = app.state.tileset_repository = create_tileset_repository(settings)
+    try:
+        await repository.warmup(settings.warmup_tilesets)
+        yield
+    finally:
+        app.state.tileset_repository = None
+        app.state.tile_cache = None
+        await repository.close()
+        await tile_cache.close()
+
 
 app = FastAPI(
     title="Loglass FastAPI Clone",
     description="A FastAPI clone of HiGlass server tileset API functionality (MVP).",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.include_router(tilesets.router)
 app.include_router(chromsizes.router)
+app.include_router(metrics.router)
 
 
 @app.get("/", tags=["root"])
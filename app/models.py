@@ -1,7 +1,7 @@
 import datetime
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, StrictInt
 
 
 class TilesetPublic(BaseModel):
@@ -45,11 +45,12 @@ class TilesetInfoCooler(BaseModel):
     chromsizes: Optional[List[List[Union[str, int]]]] = None  # e.g., [["chr1", 249250621], ...]
     bins_per_dimension: Optional[int] = None  # Often same as tile_size for cooler
     max_width: Optional[int] = None  # Max width of the tileset in base pairs
-    mirror_tiles: Optional[str] = Field(None, pattern="^(false|true|yes|no)$")
+    mirror_tiles: Optional[str] = Field(default=None, pattern="^(false|true|yes|no)$")
     clodius_version: Optional[int] = None
     row_infos: Optional[List[str]] = None
     col_infos: Optional[List[str]] = None
     zoom_step: Optional[int] = None
+    shape: Optional[List[int]] = None  # [tile_size, rows] of multivec tiles
 
 
 class TilesetInfoResponse(BaseModel):
@@ -59,12 +60,34 @@ class TilesetInfoResponse(BaseModel):
     data: Dict[str, Union[TilesetInfoCooler, ErrorModel]]
 
 
-# For Cooler tiles, data is often a dense array of numbers or an object with structure
+# Dense tiles are sent as base64-encoded little-endian float16 (or float32) buffers, as in clodius
 class TileDataCooler(BaseModel):
-    dense: List[float]
+    dense: str  # base64 of the flattened array
+    dtype: str = Field("float16", pattern="^(float16|float32)$")
+    shape: Optional[List[int]] = None  # e.g., [256, 256]; omitted for 1D tiles
     min_value: Optional[float] = None
     max_value: Optional[float] = None
-    # nan_values: Optional[bool] = False # Could be added if needed
+
+
+# aggFunc values of higlass' multivec tile options
+AggFunc = Literal["sum", "mean", "median", "std", "var", "min", "max"]
+
+
+class TileOptions(BaseModel):
+    """Options of a POST /api/v1/tiles/ entry, as in higlass' tiles_post_schema, which requires both fields"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    aggGroups: List[Union[StrictInt, List[StrictInt]]]  # multivec rows aggregated per output row
+    aggFunc: AggFunc
+
+
+class TilesetTilesRequest(BaseModel):
+    """Tiles of one tileset in a POST /api/v1/tiles/ body, as in higlass' tiles_post_schema"""
+
+    tilesetUid: str
+    tileIds: List[str] = Field(..., min_length=1)  # zoom.x[.y][.transform], without the tileset UUID
+    options: Optional[TileOptions] = None  # tiles are cached per options where the tileset uses them
 
 
 class TilesDataResponse(BaseModel):
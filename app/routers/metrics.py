@@ -0,0 +1,28 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from app.dependencies import get_repository, get_tile_cache, get_tile_flights
+from app.services.single_flight import SingleFlight
+from app.services.tile_cache import TileCache
+from app.services.tileset_repository import StubTilesetRepository
+
+router = APIRouter(prefix="/api/v1", tags=["metrics"])
+
+
+@router.get("/metrics/", summary="Cache and file handle counters")
+async def get_metrics(
+    tile_cache: TileCache = Depends(get_tile_cache),
+    tile_flights: SingleFlight = Depends(get_tile_flights),
+    repo: StubTilesetRepository = Depends(get_repository),
+) -> Dict[str, Any]:
+    """
+    Returns counters for the server's shared caches and pools, e.g. tile cache
+    hits, misses and evictions, the number of coalesced tile requests and the
+    queue depth of the tile executor.
+    """
+    return {
+        "tile_cache": await tile_cache.stats(),
+        "tile_requests": tile_flights.stats(),
+        **repo.stats(),
+    }
@@ -1,8 +1,22 @@
-from typing import List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
-
-from app.models import ErrorModel, TilesDataResponse, TilesetInfoResponse, TilesetListResponse, TilesetPublic
+import asyncio
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, Request, Response, status
+
+from app.dependencies import get_repository, get_tile_cache, get_tile_flights
+from app.models import (
+    ErrorModel,
+    TilesDataResponse,
+    TilesetInfoResponse,
+    TilesetListResponse,
+    TilesetPublic,
+    TilesetTilesRequest,
+)
+from app.services.pagination import page_url
+from app.services.single_flight import SingleFlight
+from app.services.tile_cache import TileCache, options_hash
+from app.services.tile_encoding import EncodedTile, TileResults, render_tiles_json
+from app.services.tile_ids import TileId, parse_tile_id
 from app.services.tileset_repository import StubTilesetRepository
 
 router = APIRouter(
@@ -10,13 +24,9 @@ router = APIRouter(
 )
 
 
-# Dependency function to get repository instance
-def get_repository():
-    return StubTilesetRepository()
-
-
 @router.get("/tilesets/", response_model=TilesetListResponse, summary="List available tilesets")
 async def list_tilesets(
+    request: Request,
     repo: StubTilesetRepository = Depends(get_repository),
     ac: Optional[str] = Query(None, description="Autocomplete filter by tileset name"),
     t: Optional[str] = Query(None, description="Filter by filetype"),
@@ -25,18 +35,35 @@ async def list_tilesets(
     r: Optional[bool] = Query(False, description="Reverse the order specified by o (e.g., r=True)"),
     page: Optional[int] = Query(1, ge=1, description="Page number for pagination"),
     page_size: Optional[int] = Query(10, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque position from the next/previous URL of another page"),
 ):
     """
     Lists available tilesets using the stubbed repository.
     i.e.
         https://higlass.io/api/v1/tilesets/?limit=10000&dt=map-tiles&dt=matrix&dt=2d-projection&dt=arrowhead-domains&dt=2d-rectangle-domains&dt=2d-annotations&dt=bedpe&dt=chromsizes&dt=image-tiles&dt=scatter-point
+
+    `next` and `previous` are cursor URLs, which cost the same at any depth and stay
+    stable while tilesets are added.
     """
-    tilesets, total_count = await repo.list_tilesets(
-        autocomplete=ac, filetype=t, datatype=dt, order_by=o, reverse_order=r, page=page or 1, page_size=page_size or 10
+    try:
+        result = await repo.list_tilesets(
+            autocomplete=ac,
+            filetype=t,
+            datatype=dt,
+            order_by=o,
+            reverse_order=r,
+            page=page or 1,
+            page_size=page_size or 10,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return TilesetListResponse(
+        count=result.total,
+        next=page_url(request.url, result.next_cursor),
+        previous=page_url(request.url, result.previous_cursor),
+        results=result.results,
     )
-    next_url = None
-    prev_url = None
-    return TilesetListResponse(count=total_count, next=next_url, previous=prev_url, results=tilesets)
 
 
 @router.get("/tilesets/{uuid}/", response_model=TilesetPublic, summary="Retrieve a specific tileset")
@@ -76,12 +103,106 @@ async def get_tileset_info(
 async def get_tiles(
     d: List[str] = Query(..., description="Tile ID(s) in the format uuid.zoom.x[.y]. E.g., d=uuid1.0.1.2&d=uuid2.1.3"),
     repo: StubTilesetRepository = Depends(get_repository),
+    tile_cache: TileCache = Depends(get_tile_cache),
+    tile_flights: SingleFlight = Depends(get_tile_flights),
 ):
     """
     Fetches actual data tiles for one or more tilesets using the stubbed repository.
+    Tiles are served from the tile cache when possible and cached after generation, and
+    concurrent requests for the same tile wait on a single generation.
     i.e.
         https://higlass.io/api/v1/tiles/?d=OHJakQICQD6gTD7skx4EWA.4.10&s=Z88rwOUCRgOq2GWdWJbszg
         https://higlass.io/api/v1/tiles/?d=OHJakQICQD6gTD7skx4EWA.2.0&d=OHJakQICQD6gTD7skx4EWA.2.1&s=Z88rwOUCRgOq2GWdWJbszg
     """
-    tile_data = await repo.get_tiles_data(d)
-    return TilesDataResponse(data=tile_data)
+    tile_data = await fetch_tiles(list(dict.fromkeys(d)), repo, tile_cache, tile_flights)
+    return Response(content=render_tiles_json(tile_data), media_type="application/json")
+
+
+@router.post("/tiles/", response_model=TilesDataResponse, summary="Fetch tile data with per-tileset options")
+async def post_tiles(
+    body: List[TilesetTilesRequest] = Body(..., min_length=1),
+    repo: StubTilesetRepository = Depends(get_repository),
+    tile_cache: TileCache = Depends(get_tile_cache),
+    tile_flights: SingleFlight = Depends(get_tile_flights),
+):
+    """
+    Fetches tiles like GET /tiles/, for viewports too large for a URL and with tileset options.
+    Tiles are returned as uuid.zoom.x[.y], and cached separately for each distinct set of options
+    of the tilesets that use them (multivec aggGroups and aggFunc).
+    i.e.
+        POST https://higlass.io/api/v1/tiles/
+        [{"tilesetUid": "OHJakQICQD6gTD7skx4EWA", "tileIds": ["4.10", "4.11"], "options": {"aggGroups": [[0, 1], 2], "aggFunc": "mean"}}]
+    """
+    requests = []
+    for entry in body:
+        options = entry.options.model_dump() if entry.options is not None else None
+        requests.append(
+            (
+                list(dict.fromkeys(f"{entry.tilesetUid}.{tile_id}" for tile_id in entry.tileIds)),
+                await repo.get_tile_options(entry.tilesetUid, options),
+            )
+        )
+    tile_data: TileResults = {}
+    for results in await asyncio.gather(
+        *(fetch_tiles(tile_ids, repo, tile_cache, tile_flights, options) for tile_ids, options in requests)
+    ):
+        tile_data.update(results)
+    return Response(content=render_tiles_json(tile_data), media_type="application/json")
+
+
+async def fetch_tiles(
+    tile_ids: List[str],
+    repo: StubTilesetRepository,
+    tile_cache: TileCache,
+    tile_flights: SingleFlight[str, Union[EncodedTile, ErrorModel]],
+    options: Optional[Dict[str, Any]] = None,
+) -> TileResults:
+    """
+    Look tiles up in the cache and generate the misses, caching them. Errors are never cached.
+
+    Concurrent requests missing the same normalized tile share one generation through
+    `tile_flights` instead of each generating it. Tiles with `options` are cached and
+    shared under keys including the options' hash. Keys also include the version of the
+    tileset's datafile, so tiles of a rewritten file are never served from the cache.
+    """
+    digest = options_hash(options)
+    # Tile IDs are parsed once here; the cache keys and the repository work on the parsed fields
+    parsed = {tile_id: parse_tile_id(tile_id, digest) for tile_id in tile_ids}
+    versions = await repo.get_datafile_versions(tile.uuid for tile in parsed.values() if tile is not None)
+    for tile_id, tile in parsed.items():
+        if tile is not None and tile.uuid in versions:
+            parsed[tile_id] = tile._replace(version=versions[tile.uuid])
+    cache_keys = {tile_id: tile.cache_key for tile_id, tile in parsed.items() if tile is not None}
+    cached = await tile_cache.get_many(list(cache_keys.values()))
+
+    tile_data: TileResults = {}
+    missing: Dict[str, TileId] = {}  # cache key -> a requested tile with that key
+    for tile_id, tile in parsed.items():
+        if tile is None:
+            tile_data[tile_id] = ErrorModel(error=f"Invalid tile ID format: {tile_id}")
+            continue
+        key = cache_keys[tile_id]
+        envelope = cached.get(key)
+        if envelope is not None:
+            try:
+                tile_data[tile_id] = EncodedTile.from_envelope(envelope)
+                continue
+            except ValueError:
+                pass  # not written by this version of the server; regenerate and overwrite it
+        missing.setdefault(key, tile)
+
+    async def generate(keys: List[str]) -> TileResults:
+        requested = [missing[key] for key in keys]
+        generated = await repo.get_tiles_data(requested, options)
+        by_key = {key: generated[missing[key].raw] for key in keys}
+        await tile_cache.set_many(
+            {key: tile.to_envelope() for key, tile in by_key.items() if isinstance(tile, EncodedTile)}
+        )
+        return by_key
+
+    if missing:
+        generated = await tile_flights.do_many(list(missing), generate)
+        for tile_id, key in cache_keys.items():
+            if key in generated:
+                tile_data[tile_id] = generated[key]
+    return tile_data
@@ -0,0 +1,30 @@
+from typing import Dict, List
+
+# Names of the same genome assembly, the UCSC name first
+ASSEMBLY_SYNONYMS = [
+    ("hg18", "NCBI36"),
+    ("hg19", "GRCh37"),
+    ("hg38", "GRCh38"),
+    ("mm9", "NCBIM37"),
+    ("mm10", "GRCm38"),
+    ("mm39", "GRCm39"),
+]
+
+_CANONICAL: Dict[str, str] = {name.lower(): synonyms[0].lower() for synonyms in ASSEMBLY_SYNONYMS for name in synonyms}
+
+
+def canonical_assembly(name: str) -> str:
+    """
+    Lowercased UCSC name of the assembly `name` (e.g. "GRCh37" -> "hg19").
+
+    Assemblies without known synonyms are only lowercased, so that coordSystems
+    differing in case or in naming scheme resolve to the same assembly.
+    """
+    lowered = name.lower()
+    return _CANONICAL.get(lowered, lowered)
+
+
+def assembly_aliases(name: str) -> List[str]:
+    """Lowercased names of the assembly `name`, its canonical name first."""
+    canonical = canonical_assembly(name)
+    return [canonical] + [alias for alias, target in _CANONICAL.items() if target == canonical and alias != canonical]
@@ -0,0 +1,103 @@
+import hashlib
+import json
+from typing import Dict, List, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+ChromSizesList = Sequence[Sequence[Union[str, int]]]
+
+# Media types of the two formats served by /api/v1/chrom-sizes/
+MEDIA_TYPES = {"json": "application/json", "tsv": "text/tab-separated-values"}
+
+
+class ChromSizesBody(NamedTuple):
+    content: bytes
+    etag: str
+    media_type: str
+
+
+class ChromSizes:
+    """
+    Chromosome sizes of one assembly, with every response body precomputed.
+
+    `offsets[i]` is the genome-wide position where chromosome i starts, and
+    `offsets[-1]` the total length. `locate` maps a genome-wide position back to
+    a chromosome by binary search over the offsets.
+    """
+
+    __slots__ = ("names", "lengths", "offsets", "_bodies")
+
+    def __init__(self, chromsizes: ChromSizesList):
+        self.names: List[str] = [str(name) for name, _ in chromsizes]
+        self.lengths = np.array([int(size) for _, size in chromsizes], dtype=np.int64)
+        self.offsets = np.zeros(len(self.lengths) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=self.offsets[1:])
+
+        sizes = [[name, int(size)] for name, size in zip(self.names, self.lengths)]
+        starts = [[name, int(start)] for name, start in zip(self.names, self.offsets[:-1])]
+        self._bodies: Dict[Tuple[str, bool], ChromSizesBody] = {}
+        for cumulative, rows in ((False, sizes), (True, starts)):
+            # Same bytes as FastAPI's JSONResponse of a ChromSizesResponse
+            self._add(
+                "json", cumulative, json.dumps({"chromsizes": rows}, ensure_ascii=False, separators=(",", ":")).encode()
+            )
+            self._add("tsv", cumulative, "\n".join(f"{name}\t{value}" for name, value in rows).encode())
+
+    def _add(self, fmt: str, cumulative: bool, content: bytes) -> None:
+        etag = '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+        self._bodies[(fmt, cumulative)] = ChromSizesBody(content, etag, MEDIA_TYPES[fmt])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def total_length(self) -> int:
+        return int(self.offsets[-1])
+
+    def body(self, fmt: str, cumulative: bool = False) -> ChromSizesBody:
+        """The "json" or "tsv" response, with sizes or, if `cumulative`, chromosome start positions."""
+        try:
+            return self._bodies[(fmt, cumulative)]
+        except KeyError:
+            raise ValueError(f"Unknown chromsizes format: {fmt}") from None
+
+    def locate(self, genome_pos: int) -> Tuple[str, int]:
+        """Chromosome containing the genome-wide position `genome_pos`, and the position within it."""
+        if not 0 <= genome_pos < self.total_length:
+            raise ValueError(f"Position {genome_pos} outside the genome (length {self.total_length})")
+        index = int(np.searchsorted(self.offsets, genome_pos, side="right")) - 1
+        return self.names[index], genome_pos - int(self.offsets[index])
+
+    def locate_many(self, genome_pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized `locate`: chromosome indexes into `names` and positions within them."""
+        genome_pos = np.asarray(genome_pos, dtype=np.int64)
+        if genome_pos.size and (genome_pos.min() < 0 or genome_pos.max() >= self.total_length):
+            raise ValueError(f"Positions outside the genome (length {self.total_length})")
+        indexes = np.searchsorted(self.offsets, genome_pos, side="right") - 1
+        return indexes, genome_pos - self.offsets[indexes]
+
+
+class ChromSizesStore:
+    """
+    `ChromSizes` per assembly or tileset, built once per version of their source list.
+
+    Sources are the chromsizes lists of tileset infos and of the built-in assemblies.
+    Those objects are reused until the info is recomputed, so an entry stays valid
+    as long as it is looked up with the very same list object.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[ChromSizesList, ChromSizes]] = {}
+        self.builds = 0
+
+    def get(self, key: str, chromsizes: ChromSizesList) -> ChromSizes:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is chromsizes:
+            return entry[1]
+        sizes = ChromSizes(chromsizes)
+        self._entries[key] = (chromsizes, sizes)
+        self.builds += 1
+        return sizes
+
+    def __len__(self) -> int:
+        return len(self._entries)
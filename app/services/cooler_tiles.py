@@ -0,0 +1,202 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+import cooler
+import numpy as np
+
+from app.models import TilesetInfoCooler
+from app.services.hdf5_pool import HDF5HandlePool, PooledHandle
+
+BINS_PER_TILE = 256
+
+
+class CoolerTileEngine:
+    """
+    Reads 2D matrix tiles out of cooler / multi-resolution cooler (mcool) files.
+
+    Files are opened through an `HDF5HandlePool`, so repeated tile requests for the
+    same file reuse one open handle and the `cooler.Cooler` objects built on it.
+    """
+
+    def __init__(self, pool: Optional[HDF5HandlePool] = None):
+        self.pool = pool or HDF5HandlePool()
+
+    def tileset_info(self, path: str) -> TilesetInfoCooler:
+        """Compute the tileset info for a cooler file, following clodius' mcool layout."""
+        with self.pool.lease(path) as handle:
+            resolutions = self._resolutions(handle)
+            c = self._cooler(handle, resolutions[-1])
+            chromsizes: List[List[Union[str, int]]] = [[str(name), int(size)] for name, size in c.chromsizes.items()]
+            total_length = int(c.chromsizes.sum())
+            return TilesetInfoCooler(
+                filetype="cooler",
+                datatype="matrix",
+                min_pos=[0, 0],
+                max_pos=[total_length, total_length],
+                max_zoom=len(resolutions) - 1,
+                max_width=resolutions[0] * BINS_PER_TILE,
+                tile_size=BINS_PER_TILE,
+                bins_per_dimension=BINS_PER_TILE,
+                resolutions=resolutions,
+                chromsizes=chromsizes,
+            )
+
+    def read_tile(self, path: str, zoom: int, x: int, y: int, transform: str = "default") -> np.ndarray:
+        """
+        Read the `BINS_PER_TILE` x `BINS_PER_TILE` block of tile (zoom, x, y).
+
+        Zoom level z maps to the z-th coarsest resolution, and tile (x, y) covers the
+        genome positions [x * tile_span, (x + 1) * tile_span) along its columns and the
+        same range for y along its rows, as in clodius' `make_tiles`.
+        """
+        return self.read_tiles(path, zoom, [(x, y)], transform)[(x, y)]
+
+    def read_tiles(
+        self, path: str, zoom: int, positions: List[Tuple[int, int]], transform: str = "default"
+    ) -> Dict[Tuple[int, int], np.ndarray]:
+        """
+        Read several tiles of one zoom level with a single matrix query.
+
+        The bounding box of `positions` is fetched in one range query over the pixel
+        table and then split into tiles in memory, so `positions` should be a group of
+        adjacent tiles (see `tile_partition.group_adjacent_tiles`).
+        """
+        with self.pool.lease(path) as handle:
+            resolutions = self._resolutions(handle)
+            if zoom < 0 or zoom >= len(resolutions):
+                raise ValueError(f"Zoom level {zoom} out of range (max_zoom={len(resolutions) - 1})")
+        return self.read_resolution_tiles(path, resolutions[zoom], positions, transform)
+
+    def read_resolution_tiles(
+        self, path: str, resolution: int, positions: List[Tuple[int, int]], transform: str = "default"
+    ) -> Dict[Tuple[int, int], np.ndarray]:
+        """
+        Like `read_tiles`, for a zoom level already resolved to its resolution (see `ZoomIndex`).
+
+        Tiles follow clodius' `make_tiles`: the stored (upper triangle) pixels are placed
+        by the genome position of their bins, at [row = bin2, column = bin1]. With a
+        balancing weight, bins with a NaN weight and bins past the end of the genome are
+        NaN; tiles starting past the end of the genome are NaN there in any case.
+        """
+        with self.pool.lease(path) as handle:
+            c = self._cooler(handle, resolution)
+            genome_starts, total_length = self._genome_starts(handle, resolution)
+            weight_column, divisive = _weight_for_transform(c, transform)
+            weights = self._weights(handle, resolution, weight_column) if weight_column else None
+
+            tile_span = resolution * BINS_PER_TILE
+            start1 = min(x for x, _ in positions) * tile_span
+            end1 = (max(x for x, _ in positions) + 1) * tile_span
+            start2 = min(y for _, y in positions) * tile_span
+            end2 = (max(y for _, y in positions) + 1) * tile_span
+            # Bins starting inside the bounding box; genome starts increase with the bin id
+            i0, i1 = np.searchsorted(genome_starts, [start1, end1])
+            j0, j1 = np.searchsorted(genome_starts, [start2, end2])
+            if i0 < i1 and j0 < j1:
+                pixels = c.matrix(as_pixels=True, balance=False)[i0:i1, j0:j1]
+                bin1 = pixels["bin1_id"].to_numpy()
+                bin2 = pixels["bin2_id"].to_numpy()
+                values = pixels["count"].to_numpy(dtype=np.float64)
+            else:
+                bin1 = bin2 = np.zeros(0, dtype=np.int64)
+                values = np.zeros(0, dtype=np.float64)
+
+        if weights is not None:
+            scale = weights[bin1] * weights[bin2]
+            values = values / scale if divisive else values * scale
+        values = np.nan_to_num(values)
+        pos1 = genome_starts[bin1]
+        pos2 = genome_starts[bin2]
+
+        tiles = {}
+        for x, y in positions:
+            x0, y0 = x * tile_span, y * tile_span
+            in_tile = (pos1 >= x0) & (pos1 < x0 + tile_span) & (pos2 >= y0) & (pos2 < y0 + tile_span)
+            tile = np.zeros((BINS_PER_TILE, BINS_PER_TILE), dtype=np.float32)
+            tile[(pos2[in_tile] - y0) // resolution, (pos1[in_tile] - x0) // resolution] = values[in_tile]
+            if weights is not None or x0 >= total_length or y0 >= total_length:
+                tile[:, _nan_bins(genome_starts, weights, total_length, x0, tile_span, resolution)] = np.nan
+                tile[_nan_bins(genome_starts, weights, total_length, y0, tile_span, resolution), :] = np.nan
+            tiles[(x, y)] = tile
+        return tiles
+
+    def _genome_starts(self, handle: PooledHandle, resolution: int) -> Tuple[np.ndarray, int]:
+        """Genome-wide start position of every bin of a resolution, and the genome length."""
+        key = ("genome_starts", resolution)
+        if key not in handle.cache:
+            c = self._cooler(handle, resolution)
+            chrom_offsets = np.concatenate(([0], np.cumsum(c.chromsizes.to_numpy(dtype=np.int64))))
+            bins = c.bins(convert_enum=False)[["chrom", "start"]][:]
+            starts = chrom_offsets[bins["chrom"].to_numpy()] + bins["start"].to_numpy(dtype=np.int64)
+            handle.cache[key] = (starts, int(chrom_offsets[-1]))
+        return handle.cache[key]
+
+    def _weights(self, handle: PooledHandle, resolution: int, column: str) -> np.ndarray:
+        key = ("weights", resolution, column)
+        if key not in handle.cache:
+            handle.cache[key] = self._cooler(handle, resolution).bins()[column][:].to_numpy(dtype=np.float64)
+        return handle.cache[key]
+
+    def _resolutions(self, handle: PooledHandle) -> List[int]:
+        """
+        Available resolutions, coarsest first, so that a zoom level indexes directly into the list.
+
+        Raises ValueError for an mcool whose resolutions group is empty.
+        """
+        if "resolutions" not in handle.cache:
+            if "resolutions" in handle.file:
+                resolutions = sorted((int(r) for r in handle.file["resolutions"].keys()), reverse=True)
+                if not resolutions:
+                    raise ValueError(f"no resolutions in {handle.path}")
+            else:
+                resolutions = [int(handle.file.attrs["bin-size"])]
+            handle.cache["resolutions"] = resolutions
+        return handle.cache["resolutions"]
+
+    def _cooler(self, handle: PooledHandle, resolution: int) -> cooler.Cooler:
+        key = ("cooler", resolution)
+        if key not in handle.cache:
+            if "resolutions" in handle.file:
+                group = handle.file["resolutions"][str(resolution)]
+            else:
+                group = handle.file["/"]
+            handle.cache[key] = cooler.Cooler(group)
+        return handle.cache[key]
+
+
+# Normalization vectors that clodius divides by instead of multiplying with
+DIVISIVE_WEIGHTS = ("KR", "VC", "VC_SQRT")
+
+
+def _weight_for_transform(c: cooler.Cooler, transform: str) -> Tuple[Optional[str], bool]:
+    """
+    Map a tile transform ("default", "none" or a weight column name) to (bin column, divisive).
+
+    "default" balances with "weight" when the file has it. KR, VC and VC_SQRT divide
+    the counts, as in clodius; other columns multiply them, as cooler's `balance` does.
+    """
+    bin_columns = c.bins().columns
+    if transform == "default":
+        return ("weight" if "weight" in bin_columns else None), False
+    if transform == "none":
+        return None, False
+    if transform not in bin_columns:
+        raise ValueError(f"Unknown transform: {transform}")
+    return transform, transform in DIVISIVE_WEIGHTS
+
+
+def _nan_bins(
+    genome_starts: np.ndarray,
+    weights: Optional[np.ndarray],
+    total_length: int,
+    tile_start: int,
+    tile_span: int,
+    resolution: int,
+) -> np.ndarray:
+    """Tile offsets of the bins with a NaN weight and of the positions past the end of the genome."""
+    past_end = (np.arange(total_length, tile_start + tile_span, resolution) - tile_start) // resolution
+    offsets = [past_end[past_end >= 0]]
+    if weights is not None:
+        lo, hi = np.searchsorted(genome_starts, [tile_start, tile_start + tile_span])
+        nan_starts = genome_starts[lo:hi][np.isnan(weights[lo:hi])]
+        offsets.append((nan_starts - tile_start) // resolution)
+    return np.concatenate(offsets).astype(np.int64)
@@ -0,0 +1,142 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+import h5py
+
+
+class FileSignature(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+
+    @property
+    def token(self) -> str:
+        """Short form for cache keys, which changes whenever the file is modified or replaced."""
+        return f"{self.size:x}-{self.mtime_ns:x}-{self.inode:x}"
+
+
+def file_signature(path: str) -> FileSignature:
+    st = os.stat(path)
+    return FileSignature(st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class PooledHandle:
+    """An open, read-only HDF5 file plus a scratch cache for objects derived from it."""
+
+    def __init__(self, path: str, file: h5py.File, signature: Optional[FileSignature] = None):
+        self.path = path
+        self.file = file
+        # The version of the file that was opened, see `HDF5HandlePool.revalidate`
+        self.signature = signature
+        # Objects built from this handle (e.g. cooler.Cooler instances) live exactly as long as it does
+        self.cache: Dict[Any, Any] = {}
+        self.users = 0
+        self.evicted = False
+
+    def close(self) -> None:
+        self.cache.clear()
+        if self.file.id.valid:
+            self.file.close()
+
+
+class HDF5HandlePool:
+    """
+    Bounded LRU pool of open HDF5 file handles, one per file path.
+
+    Handles are leased with `lease(path)`. A handle evicted while still leased is
+    closed only once its last user releases it, so concurrent readers never see
+    a file closed underneath them.
+    """
+
+    def __init__(self, max_open: int = 32):
+        if max_open < 1:
+            raise ValueError("max_open must be at least 1")
+        self.max_open = max_open
+        self._handles: "OrderedDict[str, PooledHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.opens = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+    @contextmanager
+    def lease(self, path: str) -> Iterator[PooledHandle]:
+        handle = self._acquire(path)
+        try:
+            yield handle
+        finally:
+            self._release(handle)
+
+    def _acquire(self, path: str) -> PooledHandle:
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is not None and handle.file.id.valid:
+                self._handles.move_to_end(path)
+                self.hits += 1
+            else:
+                # Taken before opening, so that a file replaced in between is reopened on the next revalidation
+                signature = file_signature(path)
+                handle = PooledHandle(path, h5py.File(path, "r"), signature)
+                self.opens += 1
+                self._handles[path] = handle
+                self._evict_overflow()
+            handle.users += 1
+            return handle
+
+    def _release(self, handle: PooledHandle) -> None:
+        with self._lock:
+            handle.users -= 1
+            if handle.evicted and handle.users == 0:
+                handle.close()
+
+    def _evict_overflow(self) -> None:
+        while len(self._handles) > self.max_open:
+            _, evicted = self._handles.popitem(last=False)
+            self._retire(evicted)
+            self.evictions += 1
+
+    def _retire(self, handle: PooledHandle) -> None:
+        handle.evicted = True
+        if handle.users == 0:
+            handle.close()
+
+    def invalidate(self, path: str) -> None:
+        """Drop the pooled handle for `path`, e.g. after the file was replaced on disk."""
+        with self._lock:
+            handle = self._handles.pop(path, None)
+            if handle is not None:
+                self._retire(handle)
+
+    def revalidate(self, path: str, signature: FileSignature) -> None:
+        """
+        Drop the pooled handle for `path` if it was opened on another version of the file than `signature`.
+
+        Worker processes have pools of their own, which the parent cannot invalidate;
+        tile jobs carry the signature of the file they are meant to read instead.
+        """
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is not None and handle.signature != signature:
+                del self._handles[path]
+                self._retire(handle)
+                self.revalidations += 1
+
+    def close_all(self) -> None:
+        with self._lock:
+            while self._handles:
+                _, handle = self._handles.popitem(last=False)
+                self._retire(handle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "open": len(self._handles),
+                "max_open": self.max_open,
+                "hits": self.hits,
+                "opens": self.opens,
+                "evictions": self.evictions,
+                "revalidations": self.revalidations,
+            }
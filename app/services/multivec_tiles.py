@@ -0,0 +1,238 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import h5py
+import numpy as np
+
+from app.models import TilesetInfoCooler
+from app.services.chromsizes_store import ChromSizes
+from app.services.hdf5_pool import HDF5HandlePool, PooledHandle
+
+# Distinguishes the decoded chunks of successive handles on the same path
+_layout_tokens = itertools.count()
+
+
+class MultivecLevel(NamedTuple):
+    resolution: int
+    # One (bins, rows) dataset per chromosome, None where the file has no values for it
+    datasets: List[Optional[h5py.Dataset]]
+    # Bins along the first axis per decoded chunk, None for unchunked datasets
+    chunk_bins: List[Optional[int]]
+
+
+class MultivecLayout:
+    """
+    Chromosomes, resolutions and open value datasets of a multivec file, read once per open handle.
+
+    Raises ValueError for files without resolutions.
+    """
+
+    def __init__(self, file: h5py.File):
+        self.token = next(_layout_tokens)
+        self.tile_size = int(file["info"].attrs["tile-size"])
+        names = [_decode(name) for name in file["chroms"]["name"][:]]
+        self.chromsizes = ChromSizes(list(zip(names, file["chroms"]["length"][:])))
+        # Coarsest first, so that a zoom level indexes directly into the list
+        self.resolutions = sorted((int(r) for r in file["resolutions"].keys()), reverse=True)
+        if not self.resolutions:
+            raise ValueError(f"no resolutions in {file.filename}")
+        self.levels: Dict[int, MultivecLevel] = {}
+        self.num_rows = 0
+        for resolution in self.resolutions:
+            values = file["resolutions"][str(resolution)]["values"]
+            datasets = [values[name] if name in values else None for name in self.chromsizes.names]
+            chunk_bins = [ds.chunks[0] if ds is not None and ds.chunks else None for ds in datasets]
+            self.levels[resolution] = MultivecLevel(resolution, datasets, chunk_bins)
+            self.num_rows = max([self.num_rows] + [ds.shape[1] for ds in datasets if ds is not None])
+
+        finest = file["resolutions"][str(self.resolutions[-1])]
+        row_infos = finest.attrs.get("row_infos", file["info"].attrs.get("row_infos"))
+        self.row_infos = [_decode(row) for row in row_infos] if row_infos is not None else None
+
+
+class DecodedChunkCache:
+    """
+    Byte-bounded LRU of decompressed HDF5 chunks.
+
+    Neighbouring tiles rarely end on chunk boundaries, so without it the chunk they
+    share is decompressed again for each of them.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            chunk = self._entries.get(key)
+            if chunk is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return chunk
+
+    def put(self, key: Hashable, chunk: np.ndarray) -> None:
+        if chunk.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = chunk
+            self.current_bytes += chunk.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "chunks": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class MultivecTileEngine:
+    """
+    Reads 1D tiles of (rows, bins) values out of clodius multivec (.mv5) files.
+
+    Tile x of zoom level z covers the genome positions [x * tile_size * resolution,
+    (x + 1) * tile_size * resolution) of the z-th coarsest resolution, split by
+    chromosome and binned as clodius' `multivec.get_tile` does. Files are opened
+    through an `HDF5HandlePool`, which keeps their value datasets open with the
+    handle. Values are read in whole chunks, each decompressed once and kept in a
+    `DecodedChunkCache` for the tiles around it.
+    """
+
+    def __init__(self, pool: Optional[HDF5HandlePool] = None, chunk_cache_bytes: int = 64 * 1024 * 1024):
+        self.pool = pool or HDF5HandlePool()
+        self.chunks = DecodedChunkCache(chunk_cache_bytes)
+
+    def tileset_info(self, path: str) -> TilesetInfoCooler:
+        """Compute the tileset info of a multivec file, as clodius' `multivec.tileset_info` does."""
+        with self.pool.lease(path) as handle:
+            layout = self._layout(handle)
+            chromsizes: List[List[Union[str, int]]] = [
+                [name, int(length)] for name, length in zip(layout.chromsizes.names, layout.chromsizes.lengths)
+            ]
+            return TilesetInfoCooler(
+                filetype="multivec",
+                datatype="multivec",
+                min_pos=[0],
+                max_pos=[layout.chromsizes.total_length],
+                max_zoom=len(layout.resolutions) - 1,
+                max_width=layout.resolutions[0] * layout.tile_size,
+                tile_size=layout.tile_size,
+                bins_per_dimension=layout.tile_size,
+                resolutions=layout.resolutions,
+                chromsizes=chromsizes,
+                row_infos=layout.row_infos,
+                shape=[layout.tile_size, layout.num_rows],
+            )
+
+    def read_tiles(self, path: str, resolution: int, positions: List[int]) -> Dict[int, np.ndarray]:
+        """
+        Read the (rows, tile_size) float32 tiles at `positions` of one resolution.
+
+        Bins past the end of the genome are zero-filled. Adjacent tiles share the
+        decoded chunks they overlap, so `positions` should be a group of adjacent tiles.
+        """
+        with self.pool.lease(path) as handle:
+            layout = self._layout(handle)
+            level = layout.levels.get(resolution)
+            if level is None:
+                raise ValueError(f"Resolution {resolution} not in {path}")
+            return {x: self._read_tile(layout, level, x) for x in positions}
+
+    def _read_tile(self, layout: MultivecLayout, level: MultivecLevel, x: int) -> np.ndarray:
+        """One tile, following clodius' `get_single_tile` and `get_tile`."""
+        resolution = level.resolution
+        tile_start = x * layout.tile_size * resolution
+        tile_end = tile_start + layout.tile_size * resolution
+        tile = np.zeros((layout.tile_size, layout.num_rows), dtype=np.float32)
+        filled = 0  # tile bins written so far
+        covered = 0  # base pairs of the tile inside chromosomes so far
+        binned = 0  # base pairs spanned by the bins read so far
+        for chrom, start, end in _abs2genomic(layout.chromsizes, tile_start, tile_end):
+            if filled >= layout.tile_size:
+                break
+            if chrom >= len(layout.chromsizes):
+                # Past the end of the genome: zeros
+                filled += -(-(end - start) // resolution)
+                continue
+            covered += end - start
+            lo, hi = start // resolution, -(-end // resolution)
+            if lo >= hi:
+                continue
+            values = self._read_bins(layout, level, chrom, lo, hi)
+            binned += resolution * (hi - lo)
+            # Partial bins at chromosome ends put the bins ahead of the positions; drop the extra bin
+            if binned - covered > resolution:
+                values = values[:-1]
+            values = values[: layout.tile_size - filled]
+            tile[filled : filled + len(values), : values.shape[1]] = values
+            filled += len(values)
+        return np.ascontiguousarray(tile.T)
+
+    def _read_bins(self, layout: MultivecLayout, level: MultivecLevel, chrom: int, lo: int, hi: int) -> np.ndarray:
+        """Values of bins [lo, hi) of one chromosome, assembled from whole decoded chunks."""
+        dataset = level.datasets[chrom]
+        if dataset is None:
+            return np.zeros((hi - lo, 0), dtype=np.float32)
+        hi = min(hi, dataset.shape[0])
+        chunk_bins = level.chunk_bins[chrom]
+        if chunk_bins is None or lo >= hi:
+            return dataset[lo:hi]
+
+        pieces = []
+        for index in range(lo // chunk_bins, (hi - 1) // chunk_bins + 1):
+            key = (layout.token, level.resolution, chrom, index)
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = dataset[index * chunk_bins : (index + 1) * chunk_bins]
+                self.chunks.put(key, chunk)
+            chunk_start = index * chunk_bins
+            pieces.append(chunk[max(lo - chunk_start, 0) : hi - chunk_start])
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+    def _layout(self, handle: PooledHandle) -> MultivecLayout:
+        if "multivec" not in handle.cache:
+            handle.cache["multivec"] = MultivecLayout(handle.file)
+        return handle.cache["multivec"]
+
+    def stats(self) -> Dict[str, Any]:
+        return self.chunks.stats()
+
+
+def _abs2genomic(chromsizes: ChromSizes, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Split the genome range [start, end) into (chromosome index, start, end) pieces, as clodius' `abs2genomic`.
+
+    Positions past the end of the genome come last, under the index one past the last chromosome.
+    """
+    total = chromsizes.total_length
+    if start < min(end, total):
+        (chrom_lo, chrom_hi), (piece_start, last) = chromsizes.locate_many(np.array([start, min(end, total) - 1]))
+        for chrom in range(chrom_lo, chrom_hi):
+            yield chrom, int(piece_start), int(chromsizes.lengths[chrom])
+            piece_start = 0
+        yield int(chrom_hi), int(piece_start), int(last) + 1
+    if end > total:
+        yield len(chromsizes), max(start - total, 0), end - total
+
+
+def _decode(value: Union[bytes, str]) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
@@ -0,0 +1,101 @@
+from collections import Counter
+from typing import AbstractSet, Dict, Optional, Set
+
+
+class NgramIndex:
+    """
+    Case-insensitive substring index: n-gram -> keys of the texts that contain it.
+
+    `search` answers "which texts contain this needle" by intersecting the posting
+    sets of the needle's n-grams instead of scanning every text. Needles shorter
+    than `n` cannot be looked up this way, but the number of texts containing them
+    is kept in `count_containing`. Texts are added and removed incrementally.
+    """
+
+    def __init__(self, n: int = 3):
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        self.n = n
+        self._postings: Dict[str, Set[str]] = {}
+        self._texts: Dict[str, str] = {}
+        # Texts containing each substring shorter than n, to count short needles
+        self._short_counts: Counter[str] = Counter()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def contains(self, key: str, needle: str) -> bool:
+        """Whether the text of `key` contains the already lowercased `needle`."""
+        return needle in self._texts.get(key, "")
+
+    def add(self, key: str, text: str) -> None:
+        if key in self._texts:
+            self.remove(key)
+        text = text.lower()
+        self._texts[key] = text
+        for gram in self._grams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = set()
+            posting.add(key)
+        self._short_counts.update(self._short_grams(text))
+
+    def remove(self, key: str) -> None:
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        for gram in self._grams(text):
+            posting = self._postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self._postings[gram]
+        self._short_counts.subtract(self._short_grams(text))
+
+    def search(self, needle: str, max_candidates: Optional[int] = None) -> Optional[AbstractSet[str]]:
+        """
+        Keys of the texts containing `needle`, or None if the index cannot narrow the search.
+
+        That is the case for needles shorter than `n`, and when even the rarest
+        n-gram of the needle occurs in more than `max_candidates` texts, so that a
+        caller with a smaller list to check is better off scanning that list.
+        The returned set may be an internal posting set and must not be modified.
+        """
+        needle = needle.lower()
+        if len(needle) < self.n:
+            return None
+        postings = []
+        for gram in self._grams(needle):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        if max_candidates is not None and len(postings[0]) > max_candidates:
+            return None
+        if len(postings) == 1:
+            return postings[0]
+
+        # Grams shared by most texts barely narrow the candidates; the substring check below covers them
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            if not matches or len(posting) * 2 > len(self._texts):
+                break
+            matches &= posting
+        # All n-grams present does not mean they are adjacent and in order
+        return {key for key in matches if needle in self._texts[key]}
+
+    def count_containing(self, needle: str) -> int:
+        """Number of texts containing `needle`."""
+        needle = needle.lower()
+        if not needle:
+            return len(self._texts)
+        if len(needle) < self.n:
+            return self._short_counts[needle]
+        matches = self.search(needle)
+        return len(matches) if matches is not None else 0
+
+    def _grams(self, text: str) -> Set[str]:
+        return {text[i : i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def _short_grams(self, text: str) -> Set[str]:
+        return {text[i : i + size] for size in range(1, self.n) for i in range(len(text) - size + 1)}
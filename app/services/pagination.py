@@ -0,0 +1,96 @@
+import base64
+import binascii
+import json
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from starlette.datastructures import URL
+
+from app.models import TilesetPublic
+
+
+class PageCursor(NamedTuple):
+    """Position in a listing: the sort key of the tileset a page continues from."""
+
+    order_by: Optional[str]
+    reverse: bool
+    key: Tuple[Any, ...]
+    # True for a "previous" cursor: the page ends just before `key` instead of starting after it
+    backwards: bool = False
+
+
+class TilesetPage(NamedTuple):
+    results: List[TilesetPublic]
+    total: int
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+
+def build_page(
+    rows: List[Tuple[Tuple[Any, ...], TilesetPublic]],
+    total: int,
+    page_size: int,
+    position: Optional[PageCursor],
+    page: int,
+    order_by: Optional[str],
+    reverse: bool,
+) -> TilesetPage:
+    """
+    Page of a listing from up to `page_size + 1` (sort key, tileset) rows, with cursors to its neighbours.
+
+    The rows are in walk order: past `position` in the direction of the cursor, or from
+    the start of `page` without one. The extra row only tells whether the walk goes on.
+    """
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if position is not None and position.backwards:
+        rows.reverse()
+        has_previous, has_next = more, True
+    else:
+        has_previous, has_next = position is not None or page > 1, more
+
+    def cursor(key: Tuple[Any, ...], backwards: bool) -> str:
+        return encode_cursor(PageCursor(order_by, reverse, key, backwards))
+
+    return TilesetPage(
+        [tileset for _, tileset in rows],
+        total,
+        next_cursor=cursor(rows[-1][0], False) if has_next and rows else None,
+        previous_cursor=cursor(rows[0][0], True) if has_previous and rows else None,
+    )
+
+
+def encode_cursor(cursor: PageCursor) -> str:
+    """Opaque, URL-safe form of `cursor`."""
+    payload = {"o": cursor.order_by, "r": cursor.reverse, "k": list(cursor.key), "b": cursor.backwards}
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_cursor(
+    token: str, order_by: Optional[str], reverse: bool, key_types: Sequence[Tuple[type, ...]]
+) -> PageCursor:
+    """
+    Parse a cursor made by `encode_cursor` for the listing ordered by `order_by`.
+
+    `key_types` are the types each element of the listing's sort keys may have.
+    Raises ValueError for malformed cursors, for cursors of another ordering and
+    for keys that do not match `key_types`, which could not be compared to the listing's.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(data)
+        cursor = PageCursor(payload["o"], bool(payload["r"]), tuple(payload["k"]), bool(payload["b"]))
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+    if cursor.order_by != order_by or cursor.reverse != reverse:
+        raise ValueError("Cursor belongs to a listing with a different order")
+    if len(cursor.key) != len(key_types) or not all(isinstance(v, t) for v, t in zip(cursor.key, key_types)):
+        raise ValueError(f"Invalid cursor: {token}")
+    return cursor
+
+
+def page_url(url: URL, cursor: Optional[str]) -> Optional[str]:
+    """`url` pointing at the page of `cursor` instead of its own page, keeping its filters."""
+    if cursor is None:
+        return None
+    return str(url.remove_query_params("page").include_query_params(cursor=cursor))
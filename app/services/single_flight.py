@@ -0,0 +1,82 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class FlightCancelled(Exception):
+    """The request computing a value was cancelled before it finished."""
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Deduplicates concurrent computations of the same keys.
+
+    `do_many` computes only the keys no other caller is already computing and
+    awaits the in-flight results for the rest, so N concurrent requests for one
+    tile run one tile generation. If the computing caller is cancelled (e.g. its
+    client disconnected), the waiting callers compute the keys themselves.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: Dict[K, "asyncio.Future[V]"] = {}
+        self.computed = 0
+        self.coalesced = 0
+
+    async def do_many(self, keys: List[K], compute: Callable[[List[K]], Awaitable[Dict[K, V]]]) -> Dict[K, V]:
+        """Return the value of every key, calling `compute` with the keys that are not already in flight."""
+        results: Dict[K, V] = {}
+        pending = list(dict.fromkeys(keys))
+        while pending:
+            loop = asyncio.get_running_loop()
+            owned: List[K] = []
+            waiting: Dict[K, "asyncio.Future[V]"] = {}
+            for key in pending:
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = loop.create_future()
+                    self._in_flight[key] = future
+                    owned.append(key)
+                else:
+                    self.coalesced += 1
+                waiting[key] = future
+
+            if owned:
+                await self._compute(owned, compute)
+
+            pending = []
+            for key, future in waiting.items():
+                try:
+                    results[key] = await asyncio.shield(future)
+                except FlightCancelled:
+                    pending.append(key)
+        return results
+
+    async def _compute(self, keys: List[K], compute: Callable[[List[K]], Awaitable[Dict[K, V]]]) -> None:
+        self.computed += len(keys)
+        try:
+            values = await compute(keys)
+        except BaseException as ex:
+            error = FlightCancelled() if isinstance(ex, asyncio.CancelledError) else ex
+            for key in keys:
+                self._finish(key, error=error)
+            raise
+        for key in keys:
+            if key in values:
+                self._finish(key, value=values[key])
+            else:
+                self._finish(key, error=KeyError(key))
+
+    def _finish(self, key: K, value: Any = None, error: Optional[BaseException] = None) -> None:
+        future = self._in_flight.pop(key)
+        if future.done():
+            return
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+            future.exception()  # retrieved here, so an unawaited failure is not logged as lost
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._in_flight), "computed": self.computed, "coalesced": self.coalesced}
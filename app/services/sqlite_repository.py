@@ -0,0 +1,379 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from app.models import TilesetPublic
+from app.services.assemblies import assembly_aliases
+from app.services.pagination import TilesetPage, build_page, decode_cursor
+from app.services.tileset_repository import StubTilesetRepository
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tilesets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uuid TEXT NOT NULL UNIQUE,
+    filetype TEXT NOT NULL,
+    datatype TEXT NOT NULL,
+    coordSystem TEXT,
+    owner TEXT,
+    name TEXT,
+    name_key TEXT NOT NULL,
+    created_key REAL NOT NULL,
+    record TEXT NOT NULL
+);
+-- Datatype lookups use the leading column of the composite datatype indexes
+DROP INDEX IF EXISTS tilesets_datatype;
+CREATE INDEX IF NOT EXISTS tilesets_datatype_name ON tilesets (datatype, name_key, uuid);
+CREATE INDEX IF NOT EXISTS tilesets_datatype_created ON tilesets (datatype, created_key, uuid);
+CREATE INDEX IF NOT EXISTS tilesets_filetype ON tilesets (filetype);
+CREATE INDEX IF NOT EXISTS tilesets_coord_system ON tilesets (coordSystem);
+CREATE INDEX IF NOT EXISTS tilesets_assembly ON tilesets (lower(coordSystem), datatype != 'chromsizes', seq);
+CREATE INDEX IF NOT EXISTS tilesets_name ON tilesets (name_key, uuid);
+CREATE INDEX IF NOT EXISTS tilesets_created ON tilesets (created_key, uuid);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tileset_names USING fts5(
+    name, content = 'tilesets', content_rowid = 'seq', tokenize = 'trigram'
+);
+CREATE TRIGGER IF NOT EXISTS tileset_names_insert AFTER INSERT ON tilesets BEGIN
+    INSERT INTO tileset_names (rowid, name) VALUES (new.seq, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS tileset_names_delete AFTER DELETE ON tilesets BEGIN
+    INSERT INTO tileset_names (tileset_names, rowid, name) VALUES ('delete', old.seq, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS tileset_names_update AFTER UPDATE OF name ON tilesets BEGIN
+    INSERT INTO tileset_names (tileset_names, rowid, name) VALUES ('delete', old.seq, old.name);
+    INSERT INTO tileset_names (rowid, name) VALUES (new.seq, new.name);
+END;
+
+-- Bumped by every change that can alter the count of a listing, by any process
+CREATE TABLE IF NOT EXISTS tileset_generation (id INTEGER PRIMARY KEY CHECK (id = 0), generation INTEGER NOT NULL);
+INSERT OR IGNORE INTO tileset_generation (id, generation) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS tileset_generation_insert AFTER INSERT ON tilesets BEGIN
+    UPDATE tileset_generation SET generation = generation + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tileset_generation_delete AFTER DELETE ON tilesets BEGIN
+    UPDATE tileset_generation SET generation = generation + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tileset_generation_update AFTER UPDATE OF filetype, datatype, name ON tilesets BEGIN
+    UPDATE tileset_generation SET generation = generation + 1;
+END;
+"""
+
+UPSERT = """
+INSERT INTO tilesets (uuid, filetype, datatype, coordSystem, owner, name, name_key, created_key, record)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (uuid) DO UPDATE SET
+    filetype = excluded.filetype,
+    datatype = excluded.datatype,
+    coordSystem = excluded.coordSystem,
+    owner = excluded.owner,
+    name = excluded.name,
+    name_key = excluded.name_key,
+    created_key = excluded.created_key,
+    record = excluded.record
+"""
+
+SELECT_BY_UUID = "SELECT record FROM tilesets WHERE uuid = ?"
+SELECT_GENERATION = "SELECT generation FROM tileset_generation"
+SELECT_BY_COORD_SYSTEM = "SELECT record FROM tilesets WHERE coordSystem = ? ORDER BY seq"
+# First chromsizes tileset of one spelling of an assembly, else its first tileset: one seek in tilesets_assembly
+SELECT_CHROMSIZES_TILESET = """
+SELECT datatype != 'chromsizes', seq, record FROM tilesets
+WHERE lower(coordSystem) = ? ORDER BY datatype != 'chromsizes', seq LIMIT 1
+"""
+
+# Sort columns of the pre-indexed orderings. Missing names and dates sort first, as in
+# TilesetCatalog: name_key is "" or "\x01" + name, created_key is -inf or the timestamp.
+SORT_COLUMNS = {None: "seq", "name": "name_key", "created": "created_key"}
+# Types of the (sort column, uuid) keys in cursors; other orderings sort on text
+SORT_KEY_TYPES: Dict[Optional[str], Tuple[Tuple[type, ...], ...]] = {
+    None: ((int,),),
+    "created": ((float, int), (str,)),
+}
+
+
+class SqliteConnectionPool:
+    """Up to `size` read-only connections to one database, each used by one thread at a time."""
+
+    def __init__(self, path: str, size: int = 4):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._path = path
+        self._size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._opened) < self._size:
+                conn = _connect(self._path)
+                conn.execute("PRAGMA query_only = ON")
+                self._opened.append(conn)
+                return conn
+        return self._idle.get()
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+            self._idle = queue.LifoQueue()
+
+    def stats(self) -> Dict[str, int]:
+        return {"open": len(self._opened), "idle": self._idle.qsize(), "max_size": self._size}
+
+
+class ListingCounts:
+    """
+    Totals of listings by their count query and parameters, valid for one generation of the catalog.
+
+    A page then only runs its `COUNT(*)` when the catalog changed since the last page
+    of the same listing. Bounded to the `max_entries` most recently used listings.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, generation: int, total: int) -> None:
+        with self._lock:
+            self._entries[key] = (generation, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class SqliteTilesetRepository(StubTilesetRepository):
+    """
+    Tileset repository on a local SQLite database, so that the catalog survives restarts
+    and several worker processes can serve the same one.
+
+    The database runs in WAL mode: readers never block each other or the writer. Writes
+    go through one connection under a lock, and reads through a `SqliteConnectionPool`.
+    Queries run in worker threads via `asyncio.to_thread`. Their SQL text only depends on
+    which filters and ordering are used, never on values, so each connection compiles it
+    once and reuses the prepared statement afterwards. Listings walk the index of their
+    filter and ordering, and cursors seek into it by (sort key, uuid).
+    Tile and tileset info lookups are inherited from `StubTilesetRepository`.
+    """
+
+    def __init__(self, path: str, readers: int = 4, **kwargs: Any):
+        super().__init__(**kwargs)
+        # Only datafile-backed tilesets have infos here
+        self._tileset_info = {}
+        self._path = path
+        self._writer = _connect(path)
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        self._writer.execute("PRAGMA synchronous = NORMAL")
+        self._writer.executescript(SCHEMA)
+        self._write_lock = threading.Lock()
+        self._readers = SqliteConnectionPool(path, readers)
+        self._counts = ListingCounts()
+
+    async def close(self) -> None:
+        await super().close()
+        self._readers.close_all()
+        with self._write_lock:
+            self._writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "sqlite_readers": self._readers.stats(), "sqlite_counts": self._counts.stats()}
+
+    async def _read(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        def run() -> T:
+            with self._readers.connection() as conn:
+                return func(conn)
+
+        return await asyncio.to_thread(run)
+
+    async def _save_tileset(self, tileset: TilesetPublic) -> None:
+        await self.import_tilesets([tileset])
+
+    async def import_tilesets(self, tilesets: Iterable[TilesetPublic]) -> None:
+        """Insert or replace many tilesets in one transaction, e.g. to load an existing catalog."""
+        rows = [_row(tileset) for tileset in tilesets]
+
+        def write() -> None:
+            with self._write_lock:
+                self._writer.execute("BEGIN IMMEDIATE")
+                try:
+                    self._writer.executemany(UPSERT, rows)
+                except BaseException:
+                    self._writer.execute("ROLLBACK")
+                    raise
+                self._writer.execute("COMMIT")
+
+        await asyncio.to_thread(write)
+        for uuid, *_ in rows:
+            self._zoom_indexes.pop(uuid, None)
+            self._info_cache.invalidate(uuid)
+
+    async def get_tileset_by_uuid(self, uuid: str) -> Optional[TilesetPublic]:
+        row = await self._read(lambda conn: conn.execute(SELECT_BY_UUID, (uuid,)).fetchone())
+        return TilesetPublic.model_validate_json(row[0]) if row is not None else None
+
+    async def get_tilesets_by_coord_system(self, coord_system: str) -> List[TilesetPublic]:
+        rows = await self._read(lambda conn: conn.execute(SELECT_BY_COORD_SYSTEM, (coord_system,)).fetchall())
+        return [TilesetPublic.model_validate_json(record) for (record,) in rows]
+
+    async def get_chromsizes_tileset(self, assembly: str) -> Optional[TilesetPublic]:
+        def read(conn: sqlite3.Connection) -> Optional[Tuple[int, int, str]]:
+            rows = [
+                conn.execute(SELECT_CHROMSIZES_TILESET, (alias,)).fetchone() for alias in assembly_aliases(assembly)
+            ]
+            return min((row for row in rows if row is not None), default=None)
+
+        row = await self._read(read)
+        return TilesetPublic.model_validate_json(row[2]) if row is not None else None
+
+    async def list_tilesets(
+        self,
+        autocomplete: Optional[str] = None,
+        filetype: Optional[str] = None,
+        datatype: Optional[List[str]] = None,
+        order_by: Optional[str] = None,
+        reverse_order: Optional[bool] = False,
+        page: int = 1,
+        page_size: int = 10,
+        cursor: Optional[str] = None,
+    ) -> TilesetPage:
+        """
+        List tilesets with the same filters, orderings and cursors as `StubTilesetRepository.list_tilesets`.
+
+        Several datatypes are listed as one index seek per datatype, merged by SQLite,
+        like the catalog merges its per-datatype lists. `autocomplete` needles of three or
+        more characters are looked up in the trigram full-text index of the names.
+        Totals are counted once per listing and catalog generation, see `ListingCounts`.
+        """
+        order = order_by if order_by in TilesetPublic.model_fields else None
+        reverse = bool(reverse_order)
+        key_types = SORT_KEY_TYPES.get(order, ((str,), (str,)))
+        position = decode_cursor(cursor, order, reverse, key_types) if cursor else None
+        datatypes = list(dict.fromkeys(datatype or []))
+
+        conditions: List[str] = []
+        params: List[Any] = []
+        if filetype:
+            conditions.append("filetype = ?")
+            params.append(filetype)
+        if autocomplete:
+            if len(autocomplete) >= 3:
+                # The trigram index narrows the candidates; LIKE below checks them exactly
+                conditions.append("seq IN (SELECT rowid FROM tileset_names WHERE name LIKE ?)")
+                params.append(f"%{autocomplete}%")
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append("%" + _escape_like(autocomplete) + "%")
+        datatype_condition = f"datatype IN ({', '.join('?' * len(datatypes))})" if datatypes else "1"
+        count_sql = f"SELECT COUNT(*) FROM tilesets WHERE {' AND '.join([datatype_condition, *conditions])}"
+        count_params = [*datatypes, *params]
+        count_key = (count_sql, *count_params)
+
+        # Same SQL text for every value of the parameters, so the statement cache hits
+        column = SORT_COLUMNS.get(order) or f"IFNULL(char(1) || json_extract(record, '$.{order}'), '')"
+        backwards = reverse != (position is not None and position.backwards)
+        direction, comparison = ("DESC", "<") if backwards else ("ASC", ">")
+        if order is None:
+            key_columns, order_sql = "seq", f"seq {direction}"
+            if position is not None:
+                conditions.append(f"seq {comparison} ?")
+        else:
+            key_columns, order_sql = f"{column}, uuid", f"{column} {direction}, uuid {direction}"
+            if position is not None:
+                conditions.append(f"({column}, uuid) {comparison} (?, ?)")
+        if position is not None:
+            params.extend(position.key)
+        offset = 0 if position is not None else (page - 1) * page_size
+
+        select = f"SELECT record, {key_columns} FROM tilesets WHERE"
+        if len(datatypes) > 1 and order in SORT_COLUMNS:
+            branch = (
+                f"SELECT * FROM ({select} {' AND '.join(['datatype = ?', *conditions])} ORDER BY {order_sql} LIMIT ?)"
+            )
+            page_sql = f"{' UNION ALL '.join([branch] * len(datatypes))} ORDER BY {order_sql} LIMIT ? OFFSET ?"
+            page_params = [value for dt in datatypes for value in (dt, *params, offset + page_size + 1)]
+        else:
+            page_sql = (
+                f"{select} {' AND '.join([datatype_condition, *conditions])} ORDER BY {order_sql} LIMIT ? OFFSET ?"
+            )
+            page_params = [*datatypes, *params]
+        page_params.extend([page_size + 1, offset])
+
+        def query(conn: sqlite3.Connection) -> Tuple[List[Tuple[Any, ...]], int]:
+            # One read transaction, so that the page, the generation and the count see the same snapshot
+            conn.execute("BEGIN")
+            try:
+                rows = conn.execute(page_sql, page_params).fetchall()
+                (generation,) = conn.execute(SELECT_GENERATION).fetchone()
+                total = self._counts.get(count_key, generation)
+                if total is None:
+                    (total,) = conn.execute(count_sql, count_params).fetchone()
+                    self._counts.put(count_key, generation, total)
+            finally:
+                conn.execute("COMMIT")
+            return rows, total
+
+        rows, total = await self._read(query)
+        page_rows = [(tuple(key), TilesetPublic.model_validate_json(record)) for record, *key in rows]
+        return build_page(page_rows, total, page_size, position, page, order, reverse)
+
+
+def _row(tileset: TilesetPublic) -> Tuple[Any, ...]:
+    name_key = "" if tileset.name is None else "\x01" + tileset.name
+    created_key = float("-inf") if tileset.created is None else tileset.created.timestamp()
+    return (
+        tileset.uuid,
+        tileset.filetype,
+        tileset.datatype,
+        tileset.coordSystem,
+        tileset.owner,
+        tileset.name,
+        name_key,
+        created_key,
+        tileset.model_dump_json(),
+    )
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=256)
+    # Wait for the writer of another process instead of failing right away
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
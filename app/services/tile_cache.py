@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional
+
+from app.config import Settings
+from app.services.tile_ids import parse_tile_id
+
+logger = logging.getLogger(__name__)
+
+
+def tile_cache_key(tile_id: str, options_hash: Optional[str] = None, version: Optional[str] = None) -> Optional[str]:
+    """
+    Normalized cache key for a tile: uuid.zoom.x[.y].transform[@version][:options_hash].
+
+    2D tile IDs without a transform get "default", so `uuid.1.0.0` and
+    `uuid.1.0.0.default` share one cache entry. `version` is the datafile version of
+    the tileset (see `StubTilesetRepository.get_datafile_versions`), so entries of a
+    rewritten file are never hit again. Returns None for malformed IDs.
+    """
+    tile = parse_tile_id(tile_id, options_hash)
+    return tile._replace(version=version).cache_key if tile is not None else None
+
+
+def options_hash(options: Optional[Mapping[str, Any]]) -> Optional[str]:
+    """
+    Canonical hash of tile options for `tile_cache_key`: the md5 of their JSON with sorted keys.
+
+    Options equal as JSON hash the same whatever their key order. No or empty options
+    give None, so those tiles share the cache entries of plain GET requests.
+    """
+    if not options:
+        return None
+    canonical = json.dumps(options, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+class TileCache(ABC):
+    """Stores encoded tiles by `tile_cache_key`. Values are opaque bytes."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Return the cached values for `keys`; missing keys are left out."""
+
+    @abstractmethod
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        """Store `items`, evicting older entries as the backend sees fit."""
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for the metrics endpoint."""
+
+    async def close(self) -> None:
+        pass
+
+    def _count(self, requested: int, found: int) -> None:
+        self.hits += found
+        self.misses += requested - found
+
+
+class LRUTileCache(TileCache):
+    """In-process LRU cache bounded by the total size of keys and values."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+            self._count(len(keys), len(found))
+        return found
+
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        with self._lock:
+            for key, value in items.items():
+                size = len(key) + len(value)
+                if size > self.max_bytes:
+                    continue
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self.current_bytes -= len(key) + len(previous)
+                self._entries[key] = value
+                self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted_key) + len(evicted)
+                self.evictions += 1
+
+    async def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "lru",
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class RedisTileCache(TileCache):
+    """
+    Tile cache on any server speaking the Redis protocol.
+
+    `client` is a `redis.asyncio.Redis`-compatible object. Like the reference
+    server, cache errors are logged and treated as misses so a cache outage
+    never fails a tile request. Evictions are reported from the server's
+    `evicted_keys` counter.
+    """
+
+    def __init__(self, client: Any, prefix: str = "loglass:tile:", ttl_seconds: Optional[int] = None):
+        super().__init__()
+        self._client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisTileCache":
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as ex:
+            raise RuntimeError(
+                "The 'redis' package is required to use a Redis tile cache; install the 'redis' extra"
+            ) from ex
+        return cls(aioredis.from_url(url), **kwargs)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        try:
+            values = await self._client.mget([self.prefix + key for key in keys])
+        except Exception as ex:
+            logger.warning("Tile cache read failed: %s", ex)
+            self.errors += 1
+            self._count(len(keys), 0)
+            return {}
+        found = {key: value for key, value in zip(keys, values) if value is not None}
+        self._count(len(keys), len(found))
+        return found
+
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        if not items:
+            return
+        try:
+            if self.ttl_seconds is None:
+                await self._client.mset({self.prefix + key: value for key, value in items.items()})
+            else:
+                async with self._client.pipeline(transaction=False) as pipe:
+                    for key, value in items.items():
+                        pipe.set(self.prefix + key, value, ex=self.ttl_seconds)
+                    await pipe.execute()
+        except Exception as ex:
+            logger.warning("Tile cache write failed: %s", ex)
+            self.errors += 1
+
+    async def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"backend": "redis", "hits": self.hits, "misses": self.misses, "errors": self.errors}
+        try:
+            server_stats = await self._client.info("stats")
+            stats["evictions"] = int(server_stats.get("evicted_keys", 0))
+        except Exception as ex:
+            logger.warning("Unable to read tile cache server stats: %s", ex)
+            stats["evictions"] = None
+        return stats
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_tile_cache(settings: Settings) -> TileCache:
+    if settings.tile_cache_url:
+        return RedisTileCache.from_url(settings.tile_cache_url, ttl_seconds=settings.tile_cache_ttl_seconds)
+    return LRUTileCache(max_bytes=settings.tile_cache_max_bytes)
@@ -0,0 +1,154 @@
+import base64
+import json
+import math
+import struct
+from typing import Dict, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.models import ErrorModel, TileDataCooler
+
+FLOAT16_MIN = float(np.finfo("float16").min)
+FLOAT16_MAX = float(np.finfo("float16").max)
+
+# Cache envelope: magic, dtype code, ndim, two shape dims (0 when unused), min, max; then the raw array bytes
+ENVELOPE_MAGIC = b"LGT1"
+_ENVELOPE_HEADER = struct.Struct("<4sBB2xIIdd")
+_DTYPE_CODES = {"float16": 0, "float32": 1}
+_DTYPES_BY_CODE = {code: dtype for dtype, code in _DTYPE_CODES.items()}
+_ITEM_SIZES = {"float16": 2, "float32": 4}
+
+
+class EncodedTile:
+    """
+    A dense tile whose values have already been cast to their wire dtype.
+
+    `payload` holds the raw little-endian array bytes. The tile can be stored in a
+    cache as a binary envelope (`to_envelope`) and written to a response as JSON
+    (`to_json`) without going through a Pydantic model or a Python dict.
+    """
+
+    __slots__ = ("dtype", "shape", "min_value", "max_value", "payload")
+
+    def __init__(
+        self,
+        dtype: str,
+        shape: Tuple[int, ...],
+        min_value: float,
+        max_value: float,
+        payload: Union[bytes, memoryview],
+    ):
+        if dtype not in _DTYPE_CODES:
+            raise ValueError(f"Unsupported tile dtype: {dtype}")
+        if not 1 <= len(shape) <= 2:
+            raise ValueError(f"Tiles must have one or two dimensions, got shape {shape}")
+        self.dtype = dtype
+        self.shape = shape
+        self.min_value = min_value
+        self.max_value = max_value
+        self.payload = payload
+
+    def to_envelope(self) -> bytes:
+        rows, cols = self.shape if len(self.shape) == 2 else (self.shape[0], 0)
+        header = _ENVELOPE_HEADER.pack(
+            ENVELOPE_MAGIC, _DTYPE_CODES[self.dtype], len(self.shape), rows, cols, self.min_value, self.max_value
+        )
+        return header + self.payload
+
+    @classmethod
+    def from_envelope(cls, data: bytes) -> "EncodedTile":
+        """Read a tile back from `to_envelope` bytes. The payload is a view into `data`, not a copy."""
+        if len(data) < _ENVELOPE_HEADER.size:
+            raise ValueError("Tile envelope is truncated")
+        magic, dtype_code, ndim, rows, cols, min_value, max_value = _ENVELOPE_HEADER.unpack_from(data)
+        if magic != ENVELOPE_MAGIC or dtype_code not in _DTYPES_BY_CODE or ndim not in (1, 2):
+            raise ValueError("Not a tile envelope")
+        dtype = _DTYPES_BY_CODE[dtype_code]
+        shape = (rows, cols) if ndim == 2 else (rows,)
+        payload = memoryview(data)[_ENVELOPE_HEADER.size :]
+        if len(payload) != math.prod(shape) * _ITEM_SIZES[dtype]:
+            raise ValueError("Tile envelope payload does not match its shape")
+        return cls(dtype, shape, min_value, max_value, payload)
+
+    def to_json(self) -> bytes:
+        """The tile as a JSON object with the same fields as `TileDataCooler`."""
+        shape = f"[{self.shape[0]},{self.shape[1]}]" if len(self.shape) == 2 else "null"
+        return b"".join(
+            (
+                b'{"dense":"',
+                base64.b64encode(self.payload),
+                f'","dtype":"{self.dtype}","shape":{shape},'
+                f'"min_value":{_json_float(self.min_value)},"max_value":{_json_float(self.max_value)}}}'.encode(),
+            )
+        )
+
+    def to_model(self) -> TileDataCooler:
+        return TileDataCooler(
+            dense=base64.b64encode(self.payload).decode("ascii"),
+            dtype=self.dtype,
+            shape=list(self.shape) if len(self.shape) > 1 else None,
+            min_value=self.min_value,
+            max_value=self.max_value,
+        )
+
+
+# Tile ID -> encoded tile, or an error for tiles that could not be generated
+TileResults = Dict[str, Union[EncodedTile, ErrorModel]]
+
+
+def encode_dense_tile(dense: np.ndarray) -> EncodedTile:
+    """
+    Cast a dense tile to its wire dtype, following clodius' `generate_1d_tiles`.
+
+    The values are sent as float16 unless they contain NaNs or fall outside the
+    float16 range, in which case float32 is used.
+    """
+    flat = dense.reshape(-1)
+    min_dense, max_dense, has_nan = value_range(flat)
+
+    if not has_nan and FLOAT16_MIN < min_dense and max_dense < FLOAT16_MAX:
+        dtype = "float16"
+        buffer = flat.astype("<f2")
+    else:
+        dtype = "float32"
+        buffer = flat.astype("<f4", copy=False)
+
+    return EncodedTile(dtype, tuple(dense.shape), min_dense, max_dense, buffer.tobytes())
+
+
+def value_range(flat: np.ndarray) -> Tuple[float, float, bool]:
+    """
+    Return (min, max, has_nan) of a 1D array, ignoring NaNs for min and max.
+
+    A plain `min()`/`max()` reduction propagates NaN, so the common NaN-free case
+    costs two vectorized passes and allocates nothing. Only tiles that do contain
+    NaNs pay for the NaN-aware reductions. Empty and all-NaN tiles report (0, 0).
+    """
+    if not flat.size:
+        return 0.0, 0.0, False
+
+    min_dense = float(flat.min())
+    max_dense = float(flat.max())
+    if not (math.isnan(min_dense) or math.isnan(max_dense)):
+        return min_dense, max_dense, False
+
+    finite = flat[~np.isnan(flat)]
+    if not finite.size:
+        return 0.0, 0.0, True
+    return float(finite.min()), float(finite.max()), True
+
+
+def render_tiles_json(tiles: Mapping[str, Union[EncodedTile, ErrorModel]]) -> bytes:
+    """Serialize a tiles response body, {"data": {tile_id: tile, ...}}, straight to bytes."""
+    entries: Sequence[bytes] = [
+        json.dumps(tile_id).encode()
+        + b":"
+        + (tile.to_json() if isinstance(tile, EncodedTile) else tile.model_dump_json().encode())
+        for tile_id, tile in tiles.items()
+    ]
+    return b'{"data":{' + b",".join(entries) + b"}}"
+
+
+def _json_float(value: float) -> str:
+    # JSON has no NaN/Infinity; Pydantic serializes them as null as well
+    return repr(value) if math.isfinite(value) else "null"
@@ -0,0 +1,173 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar, Union
+
+from app.services.tile_workers import init_worker
+
+T = TypeVar("T")
+
+EXECUTOR_MODES = ("thread", "process")
+
+# Tile reads, and tileset info reads, which get workers of their own so they never wait behind tiles
+LANES = ("tiles", "info")
+
+
+class _TilesetLimit:
+    """The concurrency limit of one tileset in one lane, dropped once no job holds or awaits it."""
+
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class TileExecutor:
+    """
+    Runs blocking tile and file reads off the event loop on a bounded worker pool.
+
+    In "thread" mode jobs run on a thread pool and share the server's open files.
+    In "process" mode they run on a pool of worker processes, each with its own
+    warm file handles (see `tile_workers.init_worker`), so that decoding, balancing
+    and encoding are not serialized by the GIL. Jobs must then be module-level
+    functions with picklable arguments.
+
+    At most `per_tileset_limit` jobs of one tileset run at a time, so a burst of
+    slow reads from one file cannot occupy every worker. Jobs waiting for their
+    tileset's slot count as `queued`; jobs handed to the pool and not yet finished
+    count as `in_pool`.
+
+    Tileset info reads run in the "info" lane, on `info_workers` workers of their
+    own and under their own per-tileset limits, so opening a new file is never
+    queued behind a burst of tile reads.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_tileset_limit: int = 4,
+        mode: str = "thread",
+        max_open_files: int = 32,
+        info_workers: int = 2,
+    ):
+        if max_workers < 1 or per_tileset_limit < 1 or info_workers < 1:
+            raise ValueError("max_workers, per_tileset_limit and info_workers must be at least 1")
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown tile executor mode: {mode}")
+        self.max_workers = max_workers
+        self.per_tileset_limit = per_tileset_limit
+        self.info_workers = info_workers
+        self.mode = mode
+        self._pools: Dict[str, Union[ThreadPoolExecutor, ProcessPoolExecutor]] = {
+            "tiles": self._create_pool(max_workers, max_open_files, "tiles"),
+            "info": self._create_pool(info_workers, max_open_files, "tileset-info"),
+        }
+        self._executor = self._pools["tiles"]
+        # (lane, tileset uuid) -> limit, for the tilesets with jobs in flight
+        self._limits: Dict[Tuple[str, str], _TilesetLimit] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._counter_lock = threading.Lock()
+        self.queued = 0
+        self.in_pool = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    def _create_pool(
+        self, max_workers: int, max_open_files: int, name: str
+    ) -> Union[ThreadPoolExecutor, ProcessPoolExecutor]:
+        if self.mode == "process":
+            # spawn, not fork: forking a server process that holds open HDF5 files and threads is unsafe
+            return ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(max_open_files,),
+            )
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.mode == "process"
+
+    @property
+    def executor(self) -> Executor:
+        return self._executor
+
+    async def run(self, tileset_uuid: str, func: Callable[..., T], *args: Any, lane: str = "tiles") -> T:
+        """Run `func(*args)` on the pool of `lane` under `tileset_uuid`'s concurrency limit there."""
+        pool = self._pools[lane]
+        key = (lane, tileset_uuid)
+        limit = self._limit(asyncio.get_running_loop(), key)
+        limit.users += 1
+        try:
+            self._count("queued", 1)
+            try:
+                await limit.semaphore.acquire()
+            finally:
+                self._count("queued", -1)
+
+            try:
+                self._count("in_pool", 1)
+                try:
+                    future = pool.submit(func, *args)
+                    future.add_done_callback(self._job_done)
+                except BaseException:
+                    # Never reached the pool, e.g. after shutdown, so `_job_done` will not count it
+                    self._count("in_pool", -1)
+                    raise
+                try:
+                    return await asyncio.wrap_future(future)
+                finally:
+                    # Succeeds only if no worker picked the job up, e.g. when the request was cancelled
+                    future.cancel()
+            finally:
+                limit.semaphore.release()
+        finally:
+            limit.users -= 1
+            if limit.users == 0 and self._limits.get(key) is limit:
+                del self._limits[key]
+
+    def _job_done(self, future: "Future[Any]") -> None:
+        with self._counter_lock:
+            self.in_pool -= 1
+            if future.cancelled():
+                return
+            self.completed += 1
+            self.failed += future.exception() is not None
+
+    def _limit(self, loop: asyncio.AbstractEventLoop, key: Tuple[str, str]) -> _TilesetLimit:
+        if loop is not self._loop:
+            # asyncio primitives belong to one event loop
+            self._loop = loop
+            self._limits = {}
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = _TilesetLimit(self.per_tileset_limit)
+        return limit
+
+    def _count(self, counter: str, delta: int) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + delta)
+            self.max_queue_depth = max(self.max_queue_depth, self.queued + self.in_pool)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "per_tileset_limit": self.per_tileset_limit,
+                "info_workers": self.info_workers,
+                "tilesets_in_flight": len(self._limits),
+                "queued": self.queued,
+                "in_pool": self.in_pool,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queue_depth": self.max_queue_depth,
+            }
+
+    def shutdown(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
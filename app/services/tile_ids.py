@@ -0,0 +1,66 @@
+import re
+from typing import NamedTuple, Optional, Tuple
+
+DEFAULT_TRANSFORM = "default"
+
+_INTEGER = re.compile(r"-?[0-9]+")
+
+
+class TileId(NamedTuple):
+    """
+    A tile ID uuid.zoom.x[.y[.transform]], parsed once where it enters the server.
+
+    `raw` is the ID as requested, which keys the tile's result. Everything after
+    parsing works on the integer fields; 1D tiles have no `y`. `version` is the
+    version token of the tileset's datafile, when it has one.
+    """
+
+    raw: str
+    uuid: str
+    zoom: int
+    x: int
+    y: Optional[int] = None
+    transform: str = DEFAULT_TRANSFORM
+    options_hash: Optional[str] = None
+    version: Optional[str] = None
+
+    @property
+    def dimension(self) -> int:
+        return 1 if self.y is None else 2
+
+    @property
+    def position(self) -> Tuple[int, ...]:
+        return (self.x,) if self.y is None else (self.x, self.y)
+
+    @property
+    def cache_key(self) -> str:
+        """Normalized cache key: uuid.zoom.x[.y].transform[@version][:options_hash], see `tile_cache.tile_cache_key`."""
+        key = f"{self.uuid}.{self.zoom}.{self.x}"
+        if self.y is not None:
+            key = f"{key}.{self.y}.{self.transform}"
+        if self.version:
+            key = f"{key}@{self.version}"
+        return f"{key}:{self.options_hash}" if self.options_hash else key
+
+
+def parse_tile_id(tile_id: str, options_hash: Optional[str] = None) -> Optional[TileId]:
+    """
+    Parse uuid.zoom.x, uuid.zoom.x.y or uuid.zoom.x.y.transform, or return None if malformed.
+
+    The strings are kept as sent: interning them would make every uuid a client
+    makes up immortal.
+    """
+    parts = tile_id.split(".")
+    if not 3 <= len(parts) <= 5 or not parts[0] or not all(_INTEGER.fullmatch(p) for p in parts[1:4]):
+        return None
+    if len(parts) == 5 and not parts[4]:
+        return None
+    return TileId(
+        raw=tile_id,
+        uuid=parts[0],
+        zoom=int(parts[1]),
+        x=int(parts[2]),
+        y=int(parts[3]) if len(parts) > 3 else None,
+        transform=parts[4] if len(parts) > 4 else DEFAULT_TRANSFORM,
+        options_hash=options_hash,
+    )
@@ -0,0 +1,132 @@
+import collections as col
+import itertools
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from app.services.tile_ids import TileId, parse_tile_id
+
+TilePosition = Tuple[int, ...]
+
+
+class TileGroup(NamedTuple):
+    """Adjacent tiles of one zoom level, sorted by position."""
+
+    tile_ids: List[TileId]
+    positions: List[TilePosition]
+    # Smallest and largest tile position along each dimension, both inclusive
+    min_position: TilePosition
+    max_position: TilePosition
+
+
+def bin_tiles_by_zoom_level_and_transform(tile_ids: Iterable[TileId]) -> Dict[Tuple[int, str], Set[TileId]]:
+    """
+    Place these tiles into separate sets according to their zoom level and
+    transform type. Tiles without a transform are binned under "default".
+
+    Parameters
+    ----------
+    tile_ids: [TileId,...]
+        The parsed tile_ids (e.g. xyx.0.0.1) identifying the tiles
+        to be retrieved
+
+    Returns
+    -------
+    tile_lists: {(zoomLevel, transformType): {tile_id, tile_id}}
+        A dictionary of tile id sets
+    """
+    tile_id_lists: Dict[Tuple[int, str], Set[TileId]] = col.defaultdict(set)
+
+    for tile_id in tile_ids:
+        tile_id_lists[(tile_id.zoom, tile_id.transform)].add(tile_id)
+
+    return tile_id_lists
+
+
+def group_adjacent_tiles(tile_ids: Iterable[TileId], dimension: int = 2) -> List[TileGroup]:
+    """
+    Group tile ids into connected components of tiles within 1 position of each other.
+
+    Each tile is joined (union-find) with those of its
+    3^dimension - 1 grid neighbours that were requested, so grouping takes O(n log n)
+    for the sort instead of comparing every tile with every group.
+
+    Parameters
+    ----------
+    tile_ids: [TileId,...]
+        The parsed tile_ids (e.g. xyx.0.0.1) identifying the tiles
+        to be retrieved. They should all share a zoom level.
+    dimension: int
+        The dimensionality of the tiles
+
+    Returns
+    -------
+    groups: [TileGroup, ...]
+        The groups ordered by their first position, each with its tiles sorted
+        by position and its bounding box
+    """
+    entries = sorted(((tile_id.position[:dimension], tile_id) for tile_id in tile_ids), key=lambda e: (e[0], e[1].raw))
+    index_of: Dict[TilePosition, int] = {}
+    parent = list(range(len(entries)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    offsets = [offset for offset in itertools.product((-1, 0, 1), repeat=dimension) if any(offset)]
+    for i, (position, _) in enumerate(entries):
+        # Tiles sharing a position (e.g. with and without ".default") fall in the same group
+        neighbours = [index_of.get(position)] + [
+            index_of.get(tuple(p + d for p, d in zip(position, offset))) for offset in offsets
+        ]
+        for j in neighbours:
+            if j is not None:
+                root_i, root_j = find(i), find(j)
+                # The root is always the smallest index, i.e. the group's first tile
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+        index_of.setdefault(position, i)
+
+    members: Dict[int, List[int]] = {}
+    for i in range(len(entries)):
+        members.setdefault(find(i), []).append(i)
+
+    groups = []
+    for indexes in members.values():
+        positions = [entries[i][0] for i in indexes]
+        groups.append(
+            TileGroup(
+                tile_ids=[entries[i][1] for i in indexes],
+                positions=positions,
+                min_position=tuple(min(axis) for axis in zip(*positions)),
+                max_position=tuple(max(axis) for axis in zip(*positions)),
+            )
+        )
+    return groups
+
+
+def partition_by_adjacent_tiles(tile_ids: List[str], dimension: int = 2) -> List[List[str]]:
+    """
+    Partition a set of tile ids into sets of adjacent tiles. Ported from
+    `old_reference_impl.generate_tiles`; see `group_adjacent_tiles` for the
+    groups' positions and bounding boxes.
+
+    Parameters
+    ----------
+    tile_ids: [str,...]
+        A list of tile_ids (e.g. xyx.0.0.1) identifying the tiles
+        to be retrieved. They should all share a zoom level.
+    dimension: int
+        The dimensionality of the tiles
+
+    Returns
+    -------
+    tile_lists: [tile_ids, tile_ids]
+        A list of tile lists, all of which have tiles that
+        are within 1 position of another tile in the list
+    """
+    parsed = [parse_tile_id(tile_id) for tile_id in tile_ids]
+    invalid = [tile_id for tile_id, tile in zip(tile_ids, parsed) if tile is None]
+    if invalid:
+        raise ValueError(f"Invalid tile ID format: {invalid[0]}")
+    groups = group_adjacent_tiles([tile for tile in parsed if tile is not None], dimension)
+    return [[tile.raw for tile in group.tile_ids] for group in groups]
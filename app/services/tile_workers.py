@@ -0,0 +1,98 @@
+"""
+Tile jobs submitted to the `TileExecutor`.
+
+The functions here are module-level so they can be sent to worker processes.
+Passing `engine` runs them against that engine (thread mode); without it they
+use the engine of the current worker process, set up by `init_worker`, which
+keeps its HDF5 handles open for the lifetime of the worker. Jobs take the
+`FileSignature` of the datafile as the repository last saw it, and reopen a
+handle that still points at an older version of the file.
+"""
+
+from typing import List, Optional, Tuple
+
+from app.models import TilesetInfoCooler
+from app.services.cooler_tiles import CoolerTileEngine
+from app.services.hdf5_pool import FileSignature, HDF5HandlePool
+from app.services.multivec_aggregation import AggregationPlan
+from app.services.multivec_tiles import MultivecTileEngine
+from app.services.tile_encoding import encode_dense_tile
+
+_worker_engine: Optional[CoolerTileEngine] = None
+_worker_multivec_engine: Optional[MultivecTileEngine] = None
+
+
+def init_worker(max_open_files: int = 32) -> None:
+    """Process pool initializer: give the worker its own pool of open files."""
+    global _worker_engine, _worker_multivec_engine
+    _worker_engine = CoolerTileEngine(HDF5HandlePool(max_open=max_open_files))
+    _worker_multivec_engine = MultivecTileEngine(_worker_engine.pool)
+
+
+def _engine(engine: Optional[CoolerTileEngine], datafile: str, signature: Optional[FileSignature]) -> CoolerTileEngine:
+    if engine is None:
+        if _worker_engine is None:
+            init_worker()
+        assert _worker_engine is not None
+        engine = _worker_engine
+    if signature is not None:
+        engine.pool.revalidate(datafile, signature)
+    return engine
+
+
+def read_tile_envelopes(
+    datafile: str,
+    resolution: int,
+    transform: str,
+    positions: List[Tuple[int, int]],
+    signature: Optional[FileSignature] = None,
+    engine: Optional[CoolerTileEngine] = None,
+) -> List[bytes]:
+    """
+    Read and encode a group of tiles, returning one `EncodedTile` envelope per position.
+
+    Envelopes are the raw wire-dtype array bytes behind a fixed header, so results
+    cross the process boundary as flat byte strings rather than pickled objects.
+    """
+    tiles = _engine(engine, datafile, signature).read_resolution_tiles(datafile, resolution, positions, transform)
+    return [encode_dense_tile(tiles[position]).to_envelope() for position in positions]
+
+
+def read_tileset_info(
+    datafile: str, signature: Optional[FileSignature] = None, engine: Optional[CoolerTileEngine] = None
+) -> TilesetInfoCooler:
+    return _engine(engine, datafile, signature).tileset_info(datafile)
+
+
+def _multivec_engine(
+    engine: Optional[MultivecTileEngine], datafile: str, signature: Optional[FileSignature]
+) -> MultivecTileEngine:
+    if engine is None:
+        if _worker_multivec_engine is None:
+            init_worker()
+        assert _worker_multivec_engine is not None
+        engine = _worker_multivec_engine
+    if signature is not None:
+        engine.pool.revalidate(datafile, signature)
+    return engine
+
+
+def read_multivec_envelopes(
+    datafile: str,
+    resolution: int,
+    positions: List[int],
+    aggregation: Optional[AggregationPlan] = None,
+    signature: Optional[FileSignature] = None,
+    engine: Optional[MultivecTileEngine] = None,
+) -> List[bytes]:
+    """Read a group of multivec tiles, aggregate their rows if asked to, and encode them like `read_tile_envelopes`."""
+    tiles = _multivec_engine(engine, datafile, signature).read_tiles(datafile, resolution, positions)
+    if aggregation is not None:
+        tiles = {position: aggregation.apply(tile) for position, tile in tiles.items()}
+    return [encode_dense_tile(tiles[position]).to_envelope() for position in positions]
+
+
+def read_multivec_tileset_info(
+    datafile: str, signature: Optional[FileSignature] = None, engine: Optional[MultivecTileEngine] = None
+) -> TilesetInfoCooler:
+    return _multivec_engine(engine, datafile, signature).tileset_info(datafile)
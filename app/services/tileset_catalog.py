@@ -0,0 +1,441 @@
+import bisect
+import functools
+import heapq
+import itertools
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from app.models import TilesetPublic
+from app.services.assemblies import canonical_assembly
+from app.services.ngram_index import NgramIndex
+
+# Fields with an inverted index: value -> tilesets, kept in every ordering
+INDEXED_FIELDS = ("filetype", "datatype", "coordSystem", "owner")
+# Orderings kept pre-sorted; "insertion" is the default order of listings
+SORTED_ORDERINGS = ("insertion", "name", "created")
+
+# Name matches up to which the n-gram postings are intersected, and lists up to which the
+# matches of a name walk are counted exactly; larger counts are estimated from a sample
+MAX_NAME_CANDIDATES = 5_000
+MAX_COUNT_WALK = 5_000
+COUNT_SAMPLE_SIZE = 1_024
+
+# (flag, value, uuid) for name/created, (sequence, uuid) for insertion; the uuid breaks ties
+SortKey = Tuple[Any, ...]
+# Types of the sort key values of fields that are not strings
+_VALUE_TYPES: Dict[str, Tuple[type, ...]] = {"created": (float, int), "private": (int,)}
+
+
+class TilesetCatalog(MutableMapping[str, TilesetPublic]):
+    """
+    In-memory tileset table with secondary indexes, usable as a `uuid -> TilesetPublic` dict.
+
+    Every ordering in `SORTED_ORDERINGS` is kept as a sorted list of keys, once for
+    the whole catalog and once per value of each field in `INDEXED_FIELDS`. A page
+    filtered on one indexed field is then a slice of one pre-sorted list, so
+    `query` costs O(page_size + log n) instead of a scan and sort of the catalog.
+    Tilesets without a name or creation date sort first. Names are also kept in a
+    trigram index for substring (autocomplete) lookups, and coordSystems by assembly,
+    synonyms merged, to find the tileset providing its chromosome sizes.
+    """
+
+    def __init__(self, tilesets: Iterable[TilesetPublic] = ()):
+        self._records: Dict[str, TilesetPublic] = {}
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+        self._all: Dict[str, List[SortKey]] = {ordering: [] for ordering in SORTED_ORDERINGS}
+        self._postings: Dict[Tuple[str, Any], Dict[str, List[SortKey]]] = {}
+        self._names = NgramIndex(n=3)
+        # Canonical assembly -> (0 for chromsizes tilesets else 1, sequence, uuid), sorted
+        self._assemblies: Dict[str, List[SortKey]] = {}
+        self._load(tilesets)
+
+    def _load(self, tilesets: Iterable[TilesetPublic]) -> None:
+        # Bulk insert: append everything, then sort each list once
+        for tileset in tilesets:
+            if tileset.uuid in self._records:
+                self._remove(tileset.uuid)
+            self._assign_sequence(tileset.uuid)
+            self._records[tileset.uuid] = tileset
+            if tileset.name is not None:
+                self._names.add(tileset.uuid, tileset.name)
+            if tileset.coordSystem:
+                self._assemblies.setdefault(canonical_assembly(tileset.coordSystem), []).append(
+                    self._assembly_key(tileset)
+                )
+            for ordering, key_lists in self._key_lists(tileset):
+                key = self._sort_key(ordering, tileset)
+                for keys in key_lists:
+                    keys.append(key)
+        for lists_by_ordering in [self._all, *self._postings.values()]:
+            for keys in lists_by_ordering.values():
+                keys.sort()
+        for keys in self._assemblies.values():
+            keys.sort()
+
+    def __getitem__(self, uuid: str) -> TilesetPublic:
+        return self._records[uuid]
+
+    def __setitem__(self, uuid: str, tileset: TilesetPublic) -> None:
+        if uuid != tileset.uuid:
+            raise ValueError(f"Tileset {tileset.uuid} stored under a different uuid: {uuid}")
+        if uuid in self._records:
+            self._remove(uuid)
+        self._assign_sequence(uuid)
+        self._records[uuid] = tileset
+        if tileset.name is not None:
+            self._names.add(uuid, tileset.name)
+        if tileset.coordSystem:
+            bisect.insort(
+                self._assemblies.setdefault(canonical_assembly(tileset.coordSystem), []), self._assembly_key(tileset)
+            )
+        for ordering, key_lists in self._key_lists(tileset):
+            key = self._sort_key(ordering, tileset)
+            for keys in key_lists:
+                bisect.insort(keys, key)
+
+    def __delitem__(self, uuid: str) -> None:
+        if uuid not in self._records:
+            raise KeyError(uuid)
+        self._remove(uuid)
+        del self._sequence[uuid]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _assign_sequence(self, uuid: str) -> None:
+        # A replaced tileset keeps its place in insertion order
+        if uuid not in self._sequence:
+            self._sequence[uuid] = self._next_sequence
+            self._next_sequence += 1
+
+    def _remove(self, uuid: str) -> None:
+        tileset = self._records.pop(uuid)
+        self._names.remove(uuid)
+        if tileset.coordSystem:
+            assembly = canonical_assembly(tileset.coordSystem)
+            keys = self._assemblies[assembly]
+            del keys[bisect.bisect_left(keys, self._assembly_key(tileset))]
+            if not keys:
+                del self._assemblies[assembly]
+        for ordering, key_lists in self._key_lists(tileset):
+            key = self._sort_key(ordering, tileset)
+            for keys in key_lists:
+                del keys[bisect.bisect_left(keys, key)]
+        for field in INDEXED_FIELDS:
+            postings = self._postings.get((field, getattr(tileset, field)))
+            if postings is not None and not postings["insertion"]:
+                del self._postings[(field, getattr(tileset, field))]
+
+    def _key_lists(self, tileset: TilesetPublic) -> Iterator[Tuple[str, List[List[SortKey]]]]:
+        postings = []
+        for field in INDEXED_FIELDS:
+            posting = self._postings.get((field, getattr(tileset, field)))
+            if posting is None:
+                posting = self._postings[(field, getattr(tileset, field))] = {o: [] for o in SORTED_ORDERINGS}
+            postings.append(posting)
+        for ordering in SORTED_ORDERINGS:
+            yield ordering, [self._all[ordering]] + [posting[ordering] for posting in postings]
+
+    def _sort_key(self, ordering: str, tileset: TilesetPublic) -> SortKey:
+        if ordering == "insertion":
+            return (self._sequence[tileset.uuid], tileset.uuid)
+        value = getattr(tileset, ordering)
+        if value is None:
+            return (0, 0.0 if ordering == "created" else "", tileset.uuid)
+        if ordering == "created":
+            value = value.timestamp()
+        return (1, value, tileset.uuid)
+
+    def _assembly_key(self, tileset: TilesetPublic) -> SortKey:
+        return (0 if tileset.datatype == "chromsizes" else 1, self._sequence[tileset.uuid], tileset.uuid)
+
+    def chromsizes_tileset(self, assembly: str) -> Optional[TilesetPublic]:
+        """
+        The tileset to take the chromosome sizes of `assembly` from, in O(1).
+
+        That is the first chromsizes tileset whose coordSystem is `assembly` or one of
+        its synonyms (case-insensitively), or else the first such tileset of any datatype.
+        """
+        keys = self._assemblies.get(canonical_assembly(assembly))
+        return self._records[keys[0][-1]] if keys else None
+
+    def sort_key(self, tileset: TilesetPublic, order_by: Optional[str] = None) -> SortKey:
+        """Position of `tileset` in the listing ordered by `order_by`, e.g. to resume a listing after it."""
+        if order_by is None or order_by in SORTED_ORDERINGS:
+            return self._sort_key(order_by or "insertion", tileset)
+        return _fallback_sort_key(tileset, order_by)
+
+    def sort_key_types(self, order_by: Optional[str] = None) -> Tuple[Tuple[type, ...], ...]:
+        """Types of the elements of `sort_key`s for `order_by`, e.g. to check keys taken from cursors."""
+        if order_by is None or order_by == "insertion":
+            return ((int,), (str,))
+        return ((int,), _VALUE_TYPES.get(order_by, (str,)), (str,))
+
+    def query(
+        self,
+        filters: Optional[Mapping[str, Sequence[Any]]] = None,
+        order_by: Optional[str] = None,
+        reverse: bool = False,
+        name_contains: Optional[str] = None,
+        predicate: Optional[Callable[[TilesetPublic], bool]] = None,
+        after: Optional[SortKey] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[TilesetPublic], int]:
+        """
+        Return one page of matching tilesets and the total number of matches.
+
+        `filters` maps indexed fields to the values they may take (values of one field
+        are OR-ed, fields are AND-ed). `name_contains` is a case-insensitive substring
+        of the name, looked up in the name n-gram index. `order_by` may be any
+        `TilesetPublic` field; fields outside `SORTED_ORDERINGS` are sorted per query.
+        `predicate` is applied on top of the index lookups.
+
+        `after` is a `sort_key` of the same ordering: the page then starts with the first
+        match past it in the direction of `reverse`, found by bisection, and `offset`
+        counts from there. The total still counts every match, but when a name needle
+        leaves more candidates than can be counted quickly it is estimated from a sample.
+        """
+        unique_filters = {field: list(dict.fromkeys(values)) for field, values in (filters or {}).items()}
+        for field in unique_filters:
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"Cannot filter tilesets on {field}")
+
+        ordering = order_by if order_by in SORTED_ORDERINGS else "insertion"
+        key_lists, checks = self._plan(unique_filters, ordering)
+        stop = None if limit is None else offset + limit
+        # The number of matches, when it is known without walking all of them
+        known_total: Optional[int] = None
+        # Lowercased substring matched against the indexed names of the walked keys
+        needle: Optional[str] = None
+
+        if name_contains:
+            # Walking the lists and checking names beats intersecting the postings of common n-grams,
+            # and with filters, scanning their (shorter) lists beats verifying a huge set of name matches
+            max_candidates = MAX_NAME_CANDIDATES
+            if unique_filters:
+                max_candidates = min(max_candidates, sum(map(len, key_lists)) // 2)
+            candidates = self._names.search(name_contains, max_candidates)
+            if candidates is None:
+                needle = name_contains.lower()
+                if not unique_filters and len(needle) <= self._names.n:
+                    # Counted by the index in O(1): a single n-gram's posting, or a shorter substring's count
+                    known_total = self._names.count_containing(needle)
+            elif (order_by is not None and ordering != order_by) or len(candidates) <= _walk_cost(
+                key_lists, len(candidates), stop, unique_filters
+            ):
+                return self._sorted_page(candidates, unique_filters, order_by, reverse, predicate, after, offset, stop)
+            else:
+                checks.append(lambda ts: ts.uuid in candidates)
+                if not unique_filters:
+                    known_total = len(candidates)
+        if predicate is not None:
+            checks.append(predicate)
+            known_total = None
+
+        if order_by is not None and ordering != order_by:
+            matches = [self._records[key[-1]] for key in self._name_filter(_merge(key_lists, False), needle)]
+            matches = [ts for ts in matches if all(check(ts) for check in checks)]
+            matches.sort(key=lambda ts: _fallback_sort_key(ts, order_by), reverse=reverse)
+            start = (
+                0
+                if after is None
+                else _bisect_past(matches, after, reverse, lambda ts: _fallback_sort_key(ts, order_by))
+            )
+            return matches[start + offset : None if stop is None else start + stop], len(matches)
+
+        if len(key_lists) == 1 and not checks and needle is None:
+            keys = key_lists[0]
+            if reverse:
+                end = len(keys) if after is None else bisect.bisect_left(keys, after)
+                start = 0 if stop is None else max(end - stop, 0)
+                page_keys = keys[start : max(end - offset, 0)][::-1]
+            else:
+                start = 0 if after is None else bisect.bisect_right(keys, after)
+                page_keys = keys[start + offset : None if stop is None else start + stop]
+            return [self._records[key[-1]] for key in page_keys], len(keys)
+
+        if not checks and needle is None:
+            # A tileset has one value per field, so the lists of the driving field are disjoint
+            merged = itertools.islice(_merge(key_lists, reverse, after), offset, stop)
+            return [self._records[key[-1]] for key in merged], sum(len(keys) for keys in key_lists)
+
+        if needle is not None and known_total is None and sum(map(len, key_lists)) > MAX_COUNT_WALK:
+            known_total = self._estimate_matches(key_lists, checks, needle)
+
+        page: List[TilesetPublic] = []
+        total = 0
+        for key in self._name_filter(_merge(key_lists, reverse, after), needle):
+            tileset = self._records[key[-1]]
+            if checks and not all(check(tileset) for check in checks):
+                continue
+            if offset <= total and (stop is None or total < stop):
+                page.append(tileset)
+            total += 1
+            if known_total is not None and stop is not None and total >= stop:
+                break
+        if after is not None and known_total is None:
+            # The walk started at `after`; count the matches before it too
+            total += self._count_before(key_lists, checks, needle, reverse, after)
+        return page, total if known_total is None else max(known_total, total)
+
+    def _name_filter(self, keys: Iterator[SortKey], needle: Optional[str]) -> Iterator[SortKey]:
+        if needle is None:
+            return keys
+        contains = self._names.contains
+        return (key for key in keys if contains(key[-1], needle))
+
+    def _sorted_page(
+        self,
+        uuids: AbstractSet[str],
+        filters: Mapping[str, List[Any]],
+        order_by: Optional[str],
+        reverse: bool,
+        predicate: Optional[Callable[[TilesetPublic], bool]],
+        after: Optional[SortKey],
+        offset: int,
+        stop: Optional[int],
+    ) -> Tuple[List[TilesetPublic], int]:
+        """A page of a small candidate set, filtered and sorted directly instead of walking an ordering."""
+        checks = [_field_check(field, values) for field, values in filters.items()]
+        if predicate is not None:
+            checks.append(predicate)
+        matches = [ts for ts in map(self._records.__getitem__, uuids) if all(check(ts) for check in checks)]
+
+        if order_by is None or order_by in SORTED_ORDERINGS:
+            sort_key: Callable[[TilesetPublic], SortKey] = functools.partial(self._sort_key, order_by or "insertion")
+        else:
+            sort_key = functools.partial(_fallback_sort_key, field=order_by)
+        page = matches
+        if after is not None:
+            page = [ts for ts in matches if (sort_key(ts) < after if reverse else sort_key(ts) > after)]
+        if stop is None:
+            page = sorted(page, key=sort_key, reverse=reverse)
+        else:
+            page = (heapq.nlargest if reverse else heapq.nsmallest)(stop, page, key=sort_key)
+        return page[offset:stop], len(matches)
+
+    def _estimate_matches(
+        self, key_lists: List[List[SortKey]], checks: List[Callable[[TilesetPublic], bool]], needle: str
+    ) -> Optional[int]:
+        """
+        Matches in `key_lists`, extrapolated from about `COUNT_SAMPLE_SIZE` evenly spaced entries.
+
+        None if the sample has no match: the matches are then too rare to estimate
+        their number, and the walk for the page would visit most entries anyway.
+        """
+        size = sum(map(len, key_lists))
+        step = max(size // COUNT_SAMPLE_SIZE, 1)
+        sampled = matched = 0
+        for keys in key_lists:
+            sample = keys[step // 2 :: step]
+            sampled += len(sample)
+            for key in self._name_filter(iter(sample), needle):
+                tileset = self._records[key[-1]]
+                if all(check(tileset) for check in checks):
+                    matched += 1
+        return round(matched * size / sampled) if matched else None
+
+    def _count_before(
+        self,
+        key_lists: List[List[SortKey]],
+        checks: List[Callable[[TilesetPublic], bool]],
+        needle: Optional[str],
+        reverse: bool,
+        after: SortKey,
+    ) -> int:
+        """Matches up to and including `after`, i.e. those a walk starting past it skipped."""
+        count = 0
+        for key in self._name_filter(_merge(key_lists, not reverse, after, inclusive=True), needle):
+            tileset = self._records[key[-1]]
+            if all(check(tileset) for check in checks):
+                count += 1
+        return count
+
+    def _plan(
+        self, filters: Mapping[str, List[Any]], ordering: str
+    ) -> Tuple[List[List[SortKey]], List[Callable[[TilesetPublic], bool]]]:
+        """Pick the most selective filter to walk the index of; the others become checks."""
+        if not filters:
+            return [self._all[ordering]], []
+
+        candidates = {
+            field: [self._postings[(field, value)][ordering] for value in values if (field, value) in self._postings]
+            for field, values in filters.items()
+        }
+        driver = min(candidates, key=lambda field: sum(len(keys) for keys in candidates[field]))
+        checks: List[Callable[[TilesetPublic], bool]] = [
+            _field_check(field, values) for field, values in filters.items() if field != driver
+        ]
+        return candidates[driver], checks
+
+
+def _walk_cost(key_lists: List[List[SortKey]], matches: int, stop: Optional[int], filters: Mapping[str, Any]) -> int:
+    """Entries visited to page through `matches` exact name matches by walking an ordering."""
+    size = sum(len(keys) for keys in key_lists)
+    if filters or stop is None or not matches:
+        # The total is unknown, so every entry is visited to count the matches
+        return size
+    # The total is known and the walk stops after the page
+    return min(size, stop * size // matches)
+
+
+def _merge(
+    key_lists: List[List[SortKey]], reverse: bool, after: Optional[SortKey] = None, inclusive: bool = False
+) -> Iterator[SortKey]:
+    """Walk the union of sorted key lists, starting past `after` (or at it, if `inclusive`) when given."""
+    iterators = [_walk(keys, reverse, after, inclusive) for keys in key_lists]
+    if len(iterators) == 1:
+        return iterators[0]
+    return heapq.merge(*iterators, reverse=reverse)
+
+
+def _walk(keys: List[SortKey], reverse: bool, after: Optional[SortKey], inclusive: bool) -> Iterator[SortKey]:
+    if after is None:
+        return reversed(keys) if reverse else iter(keys)
+    if reverse:
+        end = (bisect.bisect_right if inclusive else bisect.bisect_left)(keys, after)
+        return (keys[i] for i in range(end - 1, -1, -1))
+    start = (bisect.bisect_left if inclusive else bisect.bisect_right)(keys, after)
+    return (keys[i] for i in range(start, len(keys)))
+
+
+def _bisect_past(
+    tilesets: List[TilesetPublic], after: SortKey, reverse: bool, key: Callable[[TilesetPublic], SortKey]
+) -> int:
+    """Index of the first of the sorted `tilesets` past `after`."""
+    lo, hi = 0, len(tilesets)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        position = key(tilesets[mid])
+        if (position >= after) if reverse else (position <= after):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _field_check(field: str, values: Sequence[Any]) -> Callable[[TilesetPublic], bool]:
+    allowed = set(values)
+    return lambda tileset: getattr(tileset, field) in allowed
+
+
+def _fallback_sort_key(tileset: TilesetPublic, field: str) -> SortKey:
+    value = getattr(tileset, field)
+    return (0, "", tileset.uuid) if value is None else (1, value, tileset.uuid)
@@ -0,0 +1,80 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.models import TilesetInfoCooler
+from app.services.hdf5_pool import FileSignature, file_signature
+
+
+class TilesetInfoCache:
+    """
+    Computed tileset infos, keyed on the tileset and the (size, mtime, inode) of its datafile.
+
+    A lookup costs one `stat` call; the file is only reopened when it was modified
+    or replaced since the info was computed.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[FileSignature, TilesetInfoCooler]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.compute_seconds = 0.0
+        self.max_compute_seconds = 0.0
+
+    async def get_or_compute(
+        self,
+        uuid: str,
+        path: str,
+        compute: Callable[[], Awaitable[TilesetInfoCooler]],
+        on_invalidate: Optional[Callable[[], None]] = None,
+    ) -> TilesetInfoCooler:
+        """
+        Return the cached info of `uuid`, or `await compute()` if `path` changed since it was cached.
+
+        `on_invalidate` is called before recomputing a stale entry, e.g. to close
+        handles that still point at the old file.
+        """
+        signature = self.revalidate(uuid, path, on_invalidate)
+        entry = self._entries.get(uuid)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        start = time.perf_counter()
+        info = await compute()
+        elapsed = time.perf_counter() - start
+        self.compute_seconds += elapsed
+        self.max_compute_seconds = max(self.max_compute_seconds, elapsed)
+        self._entries[uuid] = (signature, info)
+        return info
+
+    def revalidate(self, uuid: str, path: str, on_invalidate: Optional[Callable[[], None]] = None) -> FileSignature:
+        """
+        Return the current signature of `path`, first dropping the entry of `uuid` if it was computed from another one.
+
+        `on_invalidate` is called as for `get_or_compute`. Costs one `stat` call.
+        """
+        signature = file_signature(path)
+        entry = self._entries.get(uuid)
+        if entry is not None and entry[0] != signature:
+            del self._entries[uuid]
+            self.invalidations += 1
+            if on_invalidate is not None:
+                on_invalidate()
+        return signature
+
+    def invalidate(self, uuid: str) -> None:
+        self._entries.pop(uuid, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "compute_seconds_total": self.compute_seconds,
+            "compute_seconds_max": self.max_compute_seconds,
+        }
@@ -1,66 +1,91 @@
+import asyncio
 import datetime
-from typing import Dict, List, Optional, Tuple, Union
+import logging
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-from app.models import ErrorModel, TileDataCooler, TilesetInfoCooler, TilesetPublic
+import numpy as np
+
+from app.config import get_settings
+from app.models import ErrorModel, TilesetInfoCooler, TilesetPublic
+from app.services.cooler_tiles import CoolerTileEngine
+from app.services.hdf5_pool import FileSignature, HDF5HandlePool, file_signature
+from app.services.multivec_aggregation import AggregationPlan, MultivecAggregator
+from app.services.multivec_tiles import MultivecTileEngine
+from app.services.pagination import TilesetPage, build_page, decode_cursor
+from app.services.tile_encoding import EncodedTile, TileResults, encode_dense_tile
+from app.services.tile_executor import TileExecutor
+from app.services.tile_ids import TileId, parse_tile_id
+from app.services.tile_partition import TileGroup, bin_tiles_by_zoom_level_and_transform, group_adjacent_tiles
+from app.services.tile_workers import (
+    read_multivec_envelopes,
+    read_multivec_tileset_info,
+    read_tile_envelopes,
+    read_tileset_info,
+)
+from app.services.tileset_catalog import TilesetCatalog
+from app.services.tileset_info_cache import TilesetInfoCache
+from app.services.zoom_index import ZoomIndex
 
 # Dummy data for stubbing
-stub_tilesets_db: Dict[str, TilesetPublic] = {
-    "stub_cooler_1": TilesetPublic(
-        uuid="stub_cooler_1",
-        filetype="cooler",
-        datatype="matrix",
-        name="My Stub Cooler 1",
-        coordSystem="hg19",
-        created=datetime.datetime.now(datetime.timezone.utc),
-        owner="stub_user",
-        project_name="Stub Project",
-        description="A cooler file for testing.",
-    ),
-    "stub_cooler_2": TilesetPublic(
-        uuid="stub_cooler_2",
-        filetype="cooler",
-        datatype="matrix",
-        name="Another Cooler Example",
-        coordSystem="hg38",
-        created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1),
-        owner="stub_user",
-        project_name="Stub Project",
-        description="Second cooler tileset.",
-    ),
-    "hg19_chromsizes": TilesetPublic(
-        uuid="hg19_chromsizes",
-        filetype="chromsizes-tsv",
-        datatype="chromsizes",
-        name="Human (hg19) Chromosome Sizes",
-        coordSystem="hg19",
-        created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30),
-        owner="admin",
-        project_name="Reference Genomes",
-        description="Chromosome sizes for the hg19 human genome assembly.",
-    ),
-    "hg38_chromsizes": TilesetPublic(
-        uuid="hg38_chromsizes",
-        filetype="chromsizes-tsv",
-        datatype="chromsizes",
-        name="Human (hg38) Chromosome Sizes",
-        coordSystem="hg38",
-        created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30),
-        owner="admin",
-        project_name="Reference Genomes",
-        description="Chromosome sizes for the hg38 human genome assembly.",
-    ),
-    "mm10_chromsizes": TilesetPublic(
-        uuid="mm10_chromsizes",
-        filetype="chromsizes-tsv",
-        datatype="chromsizes",
-        name="Mouse (mm10) Chromosome Sizes",
-        coordSystem="mm10",
-        created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30),
-        owner="admin",
-        project_name="Reference Genomes",
-        description="Chromosome sizes for the mm10 mouse genome assembly.",
-    ),
-}
+stub_tilesets_db = TilesetCatalog(
+    [
+        TilesetPublic(
+            uuid="stub_cooler_1",
+            filetype="cooler",
+            datatype="matrix",
+            name="My Stub Cooler 1",
+            coordSystem="hg19",
+            created=datetime.datetime.now(datetime.timezone.utc),
+            owner="stub_user",
+            project_name="Stub Project",
+            description="A cooler file for testing.",
+        ),
+        TilesetPublic(
+            uuid="stub_cooler_2",
+            filetype="cooler",
+            datatype="matrix",
+            name="Another Cooler Example",
+            coordSystem="hg38",
+            created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1),
+            owner="stub_user",
+            project_name="Stub Project",
+            description="Second cooler tileset.",
+        ),
+        TilesetPublic(
+            uuid="hg19_chromsizes",
+            filetype="chromsizes-tsv",
+            datatype="chromsizes",
+            name="Human (hg19) Chromosome Sizes",
+            coordSystem="hg19",
+            created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30),
+            owner="admin",
+            project_name="Reference Genomes",
+            description="Chromosome sizes for the hg19 human genome assembly.",
+        ),
+        TilesetPublic(
+            uuid="hg38_chromsizes",
+            filetype="chromsizes-tsv",
+            datatype="chromsizes",
+            name="Human (hg38) Chromosome Sizes",
+            coordSystem="hg38",
+            created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30),
+            owner="admin",
+            project_name="Reference Genomes",
+            description="Chromosome sizes for the hg38 human genome assembly.",
+        ),
+        TilesetPublic(
+            uuid="mm10_chromsizes",
+            filetype="chromsizes-tsv",
+            datatype="chromsizes",
+            name="Mouse (mm10) Chromosome Sizes",
+            coordSystem="mm10",
+            created=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30),
+            owner="admin",
+            project_name="Reference Genomes",
+            description="Chromosome sizes for the mm10 mouse genome assembly.",
+        ),
+    ]
+)
 
 stub_tileset_info_db: Dict[str, TilesetInfoCooler] = {
     "stub_cooler_1": TilesetInfoCooler(
@@ -201,12 +226,105 @@ stub_tileset_info_db: Dict[str, TilesetInfoCooler] = {
     ),
 }
 
+logger = logging.getLogger(__name__)
+
+# Errors expected from unreadable or malformed datafiles
+READ_ERRORS = (ValueError, OSError, KeyError)
+
+# Filetypes whose tiles and infos are read from their datafile
+DATAFILE_FILETYPES = ("cooler", "multivec")
+
+# Filetypes whose tiles depend on the options of POST /tiles/ requests
+TILE_OPTIONS_FILETYPES = ("multivec",)
+
+# Example 4x4 tile returned for stub tilesets that have no datafile
+PLACEHOLDER_TILE = np.array(
+    [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8], dtype=np.float32
+).reshape(4, 4)
+
+
+def _log_unexpected(uuid: str, ex: Exception) -> None:
+    # Any failure reading one tileset becomes an error entry for it; log the ones that point at a bug
+    if not isinstance(ex, READ_ERRORS):
+        logger.warning("Unexpected error reading tileset %s", uuid, exc_info=ex)
+
 
 class StubTilesetRepository:
-    def __init__(self):
+    """
+    Tileset catalog, infos and tiles, on the in-memory stub tables.
+
+    Each repository owns its open files, tile executor, info cache and zoom level
+    tables, which are made from the settings unless given, and released by `close`.
+    The app shares one repository across requests (see `dependencies.create_tileset_repository`).
+    """
+
+    def __init__(
+        self,
+        cooler_engine: Optional[CoolerTileEngine] = None,
+        multivec_engine: Optional[MultivecTileEngine] = None,
+        executor: Optional[TileExecutor] = None,
+        info_cache: Optional[TilesetInfoCache] = None,
+        info_concurrency: Optional[int] = None,
+        info_timeout_seconds: Optional[float] = None,
+    ):
         # In a real scenario, this would connect to a DB or load from files
         self._tilesets = stub_tilesets_db
         self._tileset_info = stub_tileset_info_db
+        settings = get_settings()
+        # Zoom level lookup tables of datafile-backed tilesets, built when they are registered
+        self._zoom_indexes: Dict[str, ZoomIndex] = {}
+        self._cooler_engine = cooler_engine or CoolerTileEngine(HDF5HandlePool(max_open=settings.max_open_files))
+        # Both engines read through one pool, so that replacing a datafile closes its handle for both
+        self._multivec_engine = multivec_engine or MultivecTileEngine(self._cooler_engine.pool)
+        self._aggregator = MultivecAggregator()
+        # Blocking file reads run here instead of on the event loop
+        self._executor = executor or TileExecutor(
+            max_workers=settings.tile_workers,
+            per_tileset_limit=settings.tile_workers_per_tileset,
+            mode=settings.tile_executor,
+            max_open_files=settings.max_open_files,
+            info_workers=settings.tileset_info_workers,
+        )
+        # Infos computed from datafiles, recomputed only when the file changes
+        self._info_cache = info_cache or TilesetInfoCache()
+        self._info_concurrency = info_concurrency or settings.tileset_info_concurrency
+        self._info_timeout_seconds = info_timeout_seconds or settings.tileset_info_timeout_seconds
+
+    async def warmup(self, limit: int = 32) -> None:
+        """
+        Read the infos and zoom tables of up to `limit` datafile-backed cooler tilesets.
+
+        The first requests for them then find their files open and their infos cached.
+        `limit` is capped at the size of the file handle pool, since files opened past
+        it would only evict the ones opened before. Tilesets whose info cannot be read are skipped.
+        """
+        limit = min(limit, self._cooler_engine.pool.max_open)
+        uuids: List[str] = []
+        cursor = None
+        while len(uuids) < limit:
+            page = await self.list_tilesets(filetype="cooler", page_size=100, cursor=cursor)
+            uuids.extend(tileset.uuid for tileset in page.results if tileset.datafile is not None)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        infos = await self.get_tileset_infos(uuids[:limit])
+        for uuid, info in infos.items():
+            if isinstance(info, TilesetInfoCooler):
+                await self._zoom_index(uuid)
+
+    async def close(self) -> None:
+        """Shut down the tile executor and close the open datafiles, waiting for running reads."""
+        await asyncio.to_thread(self._executor.shutdown)
+        self._cooler_engine.pool.close_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hdf5_handles": self._cooler_engine.pool.stats(),
+            "multivec_chunks": self._multivec_engine.stats(),
+            "multivec_aggregations": self._aggregator.stats(),
+            "tile_executor": self._executor.stats(),
+            "tileset_info_cache": self._info_cache.stats(),
+        }
 
     async def list_tilesets(
         self,
@@ -217,142 +335,362 @@ class StubTilesetRepository:
         reverse_order: Optional[bool] = False,
         page: int = 1,
         page_size: int = 10,
-    ) -> Tuple[List[TilesetPublic], int]:
-        """Stub method to list tilesets with basic filtering and pagination."""
-        results = list(self._tilesets.values())
+        cursor: Optional[str] = None,
+    ) -> TilesetPage:
+        """
+        List tilesets through the catalog's indexes, in insertion order unless `order_by` is given.
 
-        # Basic filtering (can be expanded)
-        if autocomplete:
-            results = [ts for ts in results if ts.name and autocomplete.lower() in ts.name.lower()]
+        Pages are addressed by `page` number, or by a `cursor` from a previous page, which
+        resumes right after (or before) the tileset it was made from. Cursor pages cost
+        the same at any depth and do not shift when tilesets are added.
+        Raises ValueError for cursors that are malformed or belong to another ordering.
+        """
+        filters: Dict[str, List[str]] = {}
         if filetype:
-            results = [ts for ts in results if ts.filetype == filetype]
+            filters["filetype"] = [filetype]
         if datatype:
-            results = [ts for ts in results if ts.datatype in datatype]
+            filters["datatype"] = datatype
+        order = order_by if order_by in TilesetPublic.model_fields else None
+        reverse = bool(reverse_order)
+
+        key_types = self._tilesets.sort_key_types(order)
+        position = decode_cursor(cursor, order, reverse, key_types) if cursor else None
+        # One extra tileset tells whether there is a page beyond this one
+        results, total = self._tilesets.query(
+            filters,
+            order_by=order,
+            reverse=reverse != (position is not None and position.backwards),
+            name_contains=autocomplete,
+            after=position.key if position is not None else None,
+            offset=0 if position is not None else (page - 1) * page_size,
+            limit=page_size + 1,
+        )
+        rows = [(self._tilesets.sort_key(tileset, order), tileset) for tileset in results]
+        return build_page(rows, total, page_size, position, page, order, reverse)
 
-        # Basic sorting (can be expanded)
-        if order_by and hasattr(TilesetPublic, order_by):
-            actual_reverse_order = reverse_order if reverse_order is not None else False
-            results.sort(key=lambda ts: getattr(ts, order_by) or "", reverse=actual_reverse_order)
+    async def register_tileset(self, tileset: TilesetPublic) -> None:
+        """Add a tileset, reading the zoom level table of cooler and multivec datafiles up front."""
+        await self._save_tileset(tileset)
+        self._zoom_indexes.pop(tileset.uuid, None)
+        self._info_cache.invalidate(tileset.uuid)
+        if tileset.datafile is not None and tileset.filetype in DATAFILE_FILETYPES:
+            await self._zoom_index(tileset.uuid)
 
-        total_count = len(results)
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        paginated_results = results[start_index:end_index]
+    async def _save_tileset(self, tileset: TilesetPublic) -> None:
+        self._tilesets[tileset.uuid] = tileset
 
-        return paginated_results, total_count
+    async def _zoom_index(self, uuid: str) -> ZoomIndex:
+        # Tilesets added to the table directly get their index on first use
+        index = self._zoom_indexes.get(uuid)
+        if index is None:
+            info = await self._lookup_tileset_info(uuid)
+            if info is None:
+                raise KeyError(f"Tileset {uuid} has no tileset info")
+            index = self._zoom_indexes[uuid] = ZoomIndex.from_tileset_info(info)
+        return index
 
     async def get_tileset_by_uuid(self, uuid: str) -> Optional[TilesetPublic]:
         """Stub method to get a single tileset by UUID."""
         return self._tilesets.get(uuid)
 
     async def get_tileset_infos(self, uuids: List[str]) -> Dict[str, Union[TilesetInfoCooler, ErrorModel]]:
-        """Stub method to get tileset info for multiple UUIDs.
-
-        In a real implementation, this would involve:
-        1. Resolving each UUID to its corresponding Cooler file path.
-        2. Opening each Cooler file (e.g., using `cooler.Cooler('path/to/file.mcool::/resolutions/1000')`).
-        3. Extracting metadata attributes like chromsizes, max_zoom, resolutions, min_pos, max_pos, etc.
-           - `chromsizes` can be obtained from `c.chroms()[:]`.
-           - `min_pos` and `max_pos` from `c.extent((0, 0))` and `c.extent((c.shape[0], c.shape[1]))` or similar.
-           - `max_zoom` might be inferred from available resolutions or stored elsewhere.
-           - `tile_size` is often a fixed value (e.g., 256).
-           - `bins_per_dimension` is usually the same as `tile_size` for cooler.
-           - `max_width` can be calculated from `max_pos[0] - min_pos[0]`.
-        4. Formatting this metadata into the TilesetInfoCooler Pydantic model for each tileset.
-        The `old_reference_impl` directory might contain examples of this logic.
+        """Get tileset info for multiple UUIDs.
+
+        Infos come from the stub info table or, for cooler and multivec tilesets backed by a `datafile`,
+        are computed from the file's resolutions and chromosome sizes. Computed infos are
+        cached until the file's size, mtime or inode changes.
+
+        The UUIDs are resolved concurrently, at most `info_concurrency` at a time. A tileset
+        whose info fails or takes longer than `info_timeout_seconds` gets an `ErrorModel`
+        entry, and the other infos are still returned.
         """
-        infos: Dict[str, Union[TilesetInfoCooler, ErrorModel]] = {}
-        for uid in uuids:
-            if uid in self._tileset_info:
-                infos[uid] = self._tileset_info[uid]
-            else:
-                infos[uid] = ErrorModel(error=f"Tileset info for {uid} not found (stub)")
-        return infos
-
-    async def get_tiles_data(self, tile_ids: List[str]) -> Dict[str, Union[TileDataCooler, ErrorModel]]:
-        """Stub method to get data for multiple tiles. Tile ID format: uuid.zoom.x[.y]
-
-        In a real implementation, this would involve, for each tile_id:
-        1. Parsing the tile_id into UUID, zoom level, and x/y coordinates.
-        2. Resolving the UUID to a Cooler file path and the specific resolution dataset within it.
-        (e.g., `path/to/file.mcool::/resolutions/{resolution_value_for_zoom_level}`)
-        3. Using a library like `clodius.tiles.cooler_tiles` or custom logic with the `cooler` library
-        to fetch the raw tile data for the given coordinates and zoom level.
-        - This involves identifying the genomic range for the tile and querying the Cooler matrix.
-        - The data might be a dense numpy array.
-        4. Potentially normalizing or processing the data (e.g., applying log transformations).
-        5. Formatting the data into the TileDataCooler Pydantic model, including the 'dense' array
-        and optionally 'min_value', 'max_value'.
-        The `old_reference_impl` directory, particularly any clodius or cooler interaction code,
-        would be highly relevant here.
+        semaphore = asyncio.Semaphore(self._info_concurrency)
+
+        async def resolve(uid: str) -> Union[TilesetInfoCooler, ErrorModel]:
+            async with semaphore:
+                try:
+                    info = await asyncio.wait_for(self._lookup_tileset_info(uid), self._info_timeout_seconds)
+                except asyncio.TimeoutError:
+                    return ErrorModel(error=f"Timed out reading tileset info for {uid}")
+                except Exception as ex:
+                    _log_unexpected(uid, ex)
+                    return ErrorModel(error=f"Unable to read tileset info for {uid}: {ex}")
+            if info is None:
+                return ErrorModel(error=f"Tileset info for {uid} not found (stub)")
+            return info
+
+        unique_uuids = list(dict.fromkeys(uuids))
+        return dict(zip(unique_uuids, await asyncio.gather(*(resolve(uid) for uid in unique_uuids))))
+
+    async def _lookup_tileset_info(self, uuid: str) -> Optional[TilesetInfoCooler]:
+        if uuid in self._tileset_info:
+            return self._tileset_info[uuid]
+        tileset = await self.get_tileset_by_uuid(uuid)
+        if tileset is None or tileset.datafile is None or tileset.filetype not in DATAFILE_FILETYPES:
+            return None
+        datafile = tileset.datafile
+        read_info = read_multivec_tileset_info if tileset.filetype == "multivec" else read_tileset_info
+
+        async def compute() -> TilesetInfoCooler:
+            info = await self._executor.run(
+                uuid, read_info, datafile, file_signature(datafile), *self._engine_args(tileset.filetype), lane="info"
+            )
+            info.name = tileset.name
+            info.coordSystem = tileset.coordSystem
+            return info
+
+        return await self._info_cache.get_or_compute(
+            uuid, datafile, compute, lambda: self._datafile_changed(uuid, datafile)
+        )
+
+    def _revalidate_datafile(self, uuid: str, datafile: str) -> FileSignature:
+        """The current signature of the datafile of `uuid`, dropping what was read from an older version of it."""
+        return self._info_cache.revalidate(uuid, datafile, lambda: self._datafile_changed(uuid, datafile))
+
+    def _datafile_changed(self, uuid: str, datafile: str) -> None:
+        # The file was rewritten: drop handles and the zoom table that describe the old contents.
+        # Worker processes drop theirs when handed the new signature with their next job.
+        self._cooler_engine.pool.invalidate(datafile)
+        self._zoom_indexes.pop(uuid, None)
+
+    async def get_datafile_versions(self, uuids: Iterable[str]) -> Dict[str, str]:
         """
-        data: Dict[str, Union[TileDataCooler, ErrorModel]] = {}
-        for tile_id in tile_ids:
-            parts = tile_id.split(".")
-            if len(parts) < 3:
-                data[tile_id] = ErrorModel(error=f"Invalid tile ID format: {tile_id}")
+        Version tokens of the datafiles of `uuids`, which change whenever a file is modified or replaced.
+
+        Tile cache keys include them, so tiles of a rewritten file are generated again
+        instead of served from the cache. Tilesets without a datafile, or whose datafile
+        cannot be read, get no entry.
+        """
+        versions: Dict[str, str] = {}
+        for uuid in dict.fromkeys(uuids):
+            tileset = await self.get_tileset_by_uuid(uuid)
+            if tileset is None or tileset.datafile is None or tileset.filetype not in DATAFILE_FILETYPES:
+                continue
+            try:
+                versions[uuid] = self._revalidate_datafile(uuid, tileset.datafile).token
+            except OSError:
                 continue
+        return versions
 
-            uuid = parts[0]
-            # zoom = parts[1]
-            # x_pos = parts[2]
-            # y_pos = parts[3] if len(parts) > 3 else None
-
-            if uuid in self._tilesets:  # Check if tileset exists
-                # TODO: Implement actual tile data fetching logic here.
-                # Steps would be:
-                # 1. Parse tile_id: uuid, zoom, x_pos, (optional y_pos)
-                #    zoom_level = int(parts[1])
-                #    x_coord = int(parts[2])
-                #    y_coord = int(parts[3]) if len(parts) > 3 else None (for 1D tiles/tracks)
-                # 2. Get tileset metadata (e.g., file path, resolutions) from self._tileset_info.get(uuid)
-                # 3. Determine the actual resolution value from zoom_level and tileset's resolutions list.
-                # 4. Construct path to the specific cooler resolution (e.g., cooler_file_path + '::/resolutions/' + str(actual_resolution)).
-                # 5. Call a function (e.g., from clodius or custom cooler logic) to get the tile data:
-                #    tile_values_dense_array = fetch_cooler_tile(cooler_path_with_resolution, zoom_level, x_coord, y_coord)
-                #    min_val, max_val = np.min(tile_values_dense_array), np.max(tile_values_dense_array)
-                # This is highly simplified. Real tile generation is complex.
-                # For now, returning a placeholder:
-                data[tile_id] = TileDataCooler(
-                    dense=[
-                        0.1,
-                        0.2,
-                        0.3,
-                        0.4,
-                        0.5,
-                        0.6,
-                        0.7,
-                        0.8,
-                        0.1,
-                        0.2,
-                        0.3,
-                        0.4,
-                        0.5,
-                        0.6,
-                        0.7,
-                        0.8,
-                    ],  # Example 4x4 tile
-                    min_value=0.0,
-                    max_value=1.0,
-                )  # Dummy dense data
-                # Example for a 256x256 tile (if tile_size is 256):
-                # data[tile_id] = TileDataCooler(
-                #     dense=[random.random() for _ in range(256*256)],
-                #     min_value=0.0,
-                #     max_value=1.0
-                # )
-            else:
-                data[tile_id] = ErrorModel(error=f"Tileset for tile {tile_id} not found (stub)")
+    async def get_tile_options(self, uuid: str, options: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        `options` if the tiles of `uuid` depend on them, else None.
+
+        Only multivec tiles use options (their aggGroups and aggFunc); tiles of other
+        tilesets requested with options share the cache entries of plain requests.
+        """
+        if not options:
+            return None
+        tileset = await self.get_tileset_by_uuid(uuid)
+        if tileset is None or tileset.filetype not in TILE_OPTIONS_FILETYPES:
+            return None
+        return options
+
+    async def get_tiles_data(
+        self, tile_ids: Sequence[Union[str, TileId]], options: Optional[Dict[str, Any]] = None
+    ) -> TileResults:
+        """Get data for multiple tiles. Tile ID format: uuid.zoom.x[.y][.transform]
+
+        Tiles are keyed by their ID as requested, and may be given already parsed as
+        `TileId`s, as the tiles router does; string IDs are parsed once here.
+        Cooler tilesets with a `datafile` are read through the shared `CoolerTileEngine`, which
+        keeps the underlying mcool files open between requests. Requested tiles are binned by
+        tileset, zoom level and transform, and each group of adjacent tiles is fetched with a
+        single matrix query on the tile executor, so the event loop never blocks on file IO.
+        Zoom levels are resolved through the tileset's `ZoomIndex`, so tiles outside the
+        matrix are rejected without touching the file. Each read carries the datafile's current
+        signature, so a file modified since it was opened is reopened, in worker processes too.
+        Multivec tilesets (uuid.zoom.x) are read the same way through the `MultivecTileEngine`,
+        and their rows aggregated by the aggGroups/aggFunc of `options`, compiled once per options.
+        Tilesets without a datafile still return a placeholder tile.
+        """
+        data: TileResults = {}
+        tilesets: Dict[str, Optional[TilesetPublic]] = {}
+        cooler_tile_ids: Dict[str, List[TileId]] = {}
+        multivec_tile_ids: Dict[str, List[TileId]] = {}
+        datafiles: Dict[str, str] = {}
+        for requested in tile_ids:
+            tile_id = requested if isinstance(requested, TileId) else parse_tile_id(requested)
+            if tile_id is None:
+                data[str(requested)] = ErrorModel(error=f"Invalid tile ID format: {requested}")
+                continue
+
+            if tile_id.uuid not in tilesets:
+                tilesets[tile_id.uuid] = await self.get_tileset_by_uuid(tile_id.uuid)
+            tileset = tilesets[tile_id.uuid]
+            if tileset is None:
+                data[tile_id.raw] = ErrorModel(error=f"Tileset for tile {tile_id.raw} not found (stub)")
+                continue
+
+            if tileset.datafile is None:
+                data[tile_id.raw] = encode_dense_tile(PLACEHOLDER_TILE)
+                continue
+
+            if tileset.filetype == "multivec":
+                if tile_id.dimension != 1:
+                    data[tile_id.raw] = ErrorModel(
+                        error=f"Invalid multivec tile ID, expected uuid.zoom.x: {tile_id.raw}"
+                    )
+                    continue
+                multivec_tile_ids.setdefault(tileset.uuid, []).append(tile_id)
+                datafiles[tileset.uuid] = tileset.datafile
+                continue
+
+            if tileset.filetype != "cooler":
+                data[tile_id.raw] = ErrorModel(error=f"Unsupported filetype for tiles: {tileset.filetype}")
+                continue
+
+            if tile_id.dimension != 2:
+                data[tile_id.raw] = ErrorModel(error=f"Invalid cooler tile ID, expected uuid.zoom.x.y: {tile_id.raw}")
+                continue
+
+            cooler_tile_ids.setdefault(tileset.uuid, []).append(tile_id)
+            datafiles[tileset.uuid] = tileset.datafile
+
+        reads: List[Awaitable[TileResults]] = []
+        for uuid, uuid_tile_ids in cooler_tile_ids.items():
+            checked = await self._check_tiles(uuid, datafiles[uuid], uuid_tile_ids, data)
+            if checked is None:
+                continue
+            index, signature, valid_tile_ids = checked
+            for (zoom, transform), binned_tile_ids in bin_tiles_by_zoom_level_and_transform(valid_tile_ids).items():
+                resolution = index.level(zoom).resolution
+                for tile_group in group_adjacent_tiles(binned_tile_ids):
+                    reads.append(
+                        self._read_tile_group(uuid, datafiles[uuid], signature, resolution, transform, tile_group)
+                    )
+
+        if multivec_tile_ids:
+            try:
+                aggregation = self._aggregator.plan(options)
+            except ValueError as ex:
+                for uuid_tile_ids in multivec_tile_ids.values():
+                    data.update(
+                        {tile_id.raw: ErrorModel(error=f"Invalid tile options: {ex}") for tile_id in uuid_tile_ids}
+                    )
+                multivec_tile_ids = {}
+        for uuid, uuid_tile_ids in multivec_tile_ids.items():
+            checked = await self._check_tiles(uuid, datafiles[uuid], uuid_tile_ids, data)
+            if checked is None:
+                continue
+            index, signature, valid_tile_ids = checked
+            for (zoom, _), binned_tile_ids in bin_tiles_by_zoom_level_and_transform(valid_tile_ids).items():
+                resolution = index.level(zoom).resolution
+                for tile_group in group_adjacent_tiles(binned_tile_ids, dimension=1):
+                    reads.append(
+                        self._read_multivec_group(uuid, datafiles[uuid], signature, resolution, aggregation, tile_group)
+                    )
+
+        for group_data in await asyncio.gather(*reads):
+            data.update(group_data)
         return data
 
+    async def _check_tiles(
+        self, uuid: str, datafile: str, tile_ids: List[TileId], data: TileResults
+    ) -> Optional[Tuple[ZoomIndex, FileSignature, List[TileId]]]:
+        """
+        The zoom index and datafile signature of `uuid`, and those of `tile_ids` inside it.
+
+        Errors for the other tiles go to `data`.
+        """
+        try:
+            signature = self._revalidate_datafile(uuid, datafile)
+            index = await self._zoom_index(uuid)
+        except Exception as ex:
+            _log_unexpected(uuid, ex)
+            data.update(
+                {tile_id.raw: ErrorModel(error=f"Unable to read tile {tile_id.raw}: {ex}") for tile_id in tile_ids}
+            )
+            return None
+
+        valid_tile_ids = []
+        for tile_id in tile_ids:
+            error = index.check_tile(tile_id.zoom, *tile_id.position)
+            if error is None:
+                valid_tile_ids.append(tile_id)
+            else:
+                data[tile_id.raw] = ErrorModel(error=f"Invalid tile {tile_id.raw}: {error}")
+        return index, signature, valid_tile_ids
+
+    async def _read_tile_group(
+        self,
+        uuid: str,
+        datafile: str,
+        signature: FileSignature,
+        resolution: int,
+        transform: str,
+        tile_group: TileGroup,
+    ) -> TileResults:
+        positions = [(x, y) for x, y in tile_group.positions]
+        try:
+            envelopes = await self._executor.run(
+                uuid,
+                read_tile_envelopes,
+                datafile,
+                resolution,
+                transform,
+                positions,
+                signature,
+                *self._engine_args(),
+            )
+        except Exception as ex:
+            _log_unexpected(uuid, ex)
+            return {
+                tile_id.raw: ErrorModel(error=f"Unable to read tile {tile_id.raw}: {ex}")
+                for tile_id in tile_group.tile_ids
+            }
+        return {
+            tile_id.raw: EncodedTile.from_envelope(envelope)
+            for tile_id, envelope in zip(tile_group.tile_ids, envelopes)
+        }
+
+    async def _read_multivec_group(
+        self,
+        uuid: str,
+        datafile: str,
+        signature: FileSignature,
+        resolution: int,
+        aggregation: Optional[AggregationPlan],
+        tile_group: TileGroup,
+    ) -> TileResults:
+        positions = [x for (x,) in tile_group.positions]
+        try:
+            envelopes = await self._executor.run(
+                uuid,
+                read_multivec_envelopes,
+                datafile,
+                resolution,
+                positions,
+                aggregation,
+                signature,
+                *self._engine_args("multivec"),
+            )
+        except Exception as ex:
+            _log_unexpected(uuid, ex)
+            return {
+                tile_id.raw: ErrorModel(error=f"Unable to read tile {tile_id.raw}: {ex}")
+                for tile_id in tile_group.tile_ids
+            }
+        return {
+            tile_id.raw: EncodedTile.from_envelope(envelope)
+            for tile_id, envelope in zip(tile_group.tile_ids, envelopes)
+        }
+
+    def _engine_args(self, filetype: str = "cooler") -> Tuple[Any, ...]:
+        # Worker processes read through their own engines; threads share this repository's
+        if self._executor.uses_processes:
+            return ()
+        return (self._multivec_engine,) if filetype == "multivec" else (self._cooler_engine,)
+
     async def get_tilesets_by_coord_system(self, coord_system: str) -> List[TilesetPublic]:
         """Get tilesets by coordinate system (assembly)."""
-        results = []
-        for tileset in self._tilesets.values():
-            if tileset.coordSystem == coord_system:
-                results.append(tileset)
+        results, _ = self._tilesets.query({"coordSystem": [coord_system]})
         return results
 
+    async def get_chromsizes_tileset(self, assembly: str) -> Optional[TilesetPublic]:
+        """Get the tileset providing the chromosome sizes of an assembly, given by any of its names."""
+        return self._tilesets.chromsizes_tileset(assembly)
+
     async def get_tileset_info(self, uuid: str) -> Optional[TilesetInfoCooler]:
         """Get tileset info for a single UUID."""
-        return self._tileset_info.get(uuid)
+        return await self._lookup_tileset_info(uuid)
@@ -0,0 +1,66 @@
+import math
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from app.models import TilesetInfoCooler
+
+
+class ZoomLevel(NamedTuple):
+    resolution: int  # base pairs per bin
+    bins_per_tile: int
+    tile_span: int  # base pairs covered by one tile
+    max_tile_index: int  # last tile x/y that covers any genome position
+
+
+class ZoomIndex:
+    """
+    Per-tileset lookup table of zoom level -> `ZoomLevel`, computed once when a tileset is registered.
+
+    Zoom level z uses the z-th coarsest resolution, as in clodius' mcool layout, so
+    mapping a tile ID to its resolution and genome range is a tuple lookup and tiles
+    outside the matrix can be rejected without opening the file.
+    """
+
+    __slots__ = ("levels",)
+
+    def __init__(self, levels: Sequence[ZoomLevel]):
+        self.levels: Tuple[ZoomLevel, ...] = tuple(levels)
+
+    @classmethod
+    def from_resolutions(
+        cls, resolutions: Sequence[int], chrom_lengths: Sequence[int], bins_per_tile: int
+    ) -> "ZoomIndex":
+        levels = []
+        total_length = sum(chrom_lengths)
+        for resolution in sorted(resolutions, reverse=True):
+            # Tiles cover genome positions, as in clodius, whatever partial bins the chromosomes end in
+            tile_span = resolution * bins_per_tile
+            max_tile_index = max(math.ceil(total_length / tile_span) - 1, 0)
+            levels.append(ZoomLevel(resolution, bins_per_tile, tile_span, max_tile_index))
+        return cls(levels)
+
+    @classmethod
+    def from_tileset_info(cls, info: TilesetInfoCooler) -> "ZoomIndex":
+        if not info.resolutions:
+            raise ValueError("Tileset info has no resolutions")
+        bins_per_tile = info.bins_per_dimension or info.tile_size or 256
+        chrom_lengths: List[int] = [int(size) for _, size in info.chromsizes or []] or [info.max_pos[0]]
+        return cls.from_resolutions(info.resolutions, chrom_lengths, bins_per_tile)
+
+    @property
+    def max_zoom(self) -> int:
+        return len(self.levels) - 1
+
+    def level(self, zoom: int) -> ZoomLevel:
+        if not 0 <= zoom < len(self.levels):
+            raise ValueError(f"Zoom level {zoom} out of range (max_zoom={self.max_zoom})")
+        return self.levels[zoom]
+
+    def check_tile(self, zoom: int, *position: int) -> Optional[str]:
+        """Return why tile (zoom, *position) does not exist, or None if it does."""
+        if not 0 <= zoom < len(self.levels):
+            return f"Zoom level {zoom} out of range (max_zoom={self.max_zoom})"
+        max_tile_index = self.levels[zoom].max_tile_index
+        for index in position:
+            if not 0 <= index <= max_tile_index:
+                return f"Tile position {index} out of range at zoom level {zoom} (max={max_tile_index})"
+        return None
@@ -0,0 +1,54 @@
+"""
+Aggregation of one multivec tile by aggGroups, per group as in higlass' generate_1d_tiles
+and with a compiled `AggregationPlan`.
+
+    python -m benchmarks.bench_multivec_aggregation [--rows N] [--groups N] [--bins N]
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from app.services.multivec_aggregation import AGG_FUNCS, AggregationPlan
+
+REDUCE = {"sum": np.sum, "mean": np.mean, "median": np.median, "std": np.std, "var": np.var, "min": np.amin}
+REDUCE["max"] = np.amax
+
+
+def best_ms(func: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=3000)
+    parser.add_argument("--groups", type=int, default=120)
+    parser.add_argument("--bins", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dense = rng.random((args.rows, args.bins), dtype=np.float32)
+    # Random groups of 1-60 rows, as sample annotations give them
+    groups: List[List[int]] = [
+        sorted(rng.choice(args.rows, size=int(rng.integers(1, 60)), replace=False).tolist()) for _ in range(args.groups)
+    ]
+
+    print(f"{args.rows} rows x {args.bins} bins, {args.groups} groups")
+    print(f"{'aggFunc':8} {'per group':>12} {'compiled':>12} {'compile':>12}")
+    for func in AGG_FUNCS:
+        naive = best_ms(lambda: np.array([REDUCE[func](dense[group], axis=0) for group in groups]))
+        compile_ms = best_ms(lambda: AggregationPlan(groups, func))
+        plan = AggregationPlan(groups, func)
+        compiled = best_ms(lambda: plan.apply(dense))
+        print(f"{func:8} {naive:10.2f}ms {compiled:10.2f}ms {compile_ms:10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
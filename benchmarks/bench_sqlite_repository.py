@@ -0,0 +1,70 @@
+"""
+Cost of one /api/v1/tilesets/ page from the SQLite repository, next to the in-memory catalog.
+
+Each query is timed for its first page and for the page after a cursor from the middle of
+the listing. The database is written to a temporary directory.
+
+    python -m benchmarks.bench_sqlite_repository [--tilesets N]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Dict
+
+from app.services import tileset_repository
+from app.services.sqlite_repository import SqliteTilesetRepository
+from app.services.tileset_catalog import TilesetCatalog
+from app.services.tileset_repository import StubTilesetRepository
+from benchmarks.bench_tileset_catalog import make_tilesets
+
+QUERIES: Dict[str, Dict[str, Any]] = {
+    "(all)": {},
+    "dt=matrix": {"datatype": ["matrix"]},
+    "dt=matrix&o=name": {"datatype": ["matrix"], "order_by": "name"},
+    "dt=matrix&dt=vector&o=created": {"datatype": ["matrix", "vector"], "order_by": "created"},
+    "ac=k562 micro": {"autocomplete": "k562 micro"},
+}
+
+
+async def page_ms(repo: StubTilesetRepository, repeat: int = 20, **kwargs: Any) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await repo.list_tilesets(**kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tilesets", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tilesets = make_tilesets(args.tilesets)
+    tileset_repository.stub_tilesets_db = TilesetCatalog(tilesets)
+    stub = StubTilesetRepository()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "tilesets.db")
+        sqlite = SqliteTilesetRepository(path)
+        start = time.perf_counter()
+        await sqlite.import_tilesets(tilesets)
+        print(f"{args.tilesets} tilesets imported in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<32}{'catalog (ms)':>14}{'sqlite (ms)':>13}{'cursor (ms)':>13}")
+        for label, kwargs in QUERIES.items():
+            middle = await sqlite.list_tilesets(page=max(args.tilesets // 1000, 1), page_size=100, **kwargs)
+            in_catalog = await page_ms(stub, **kwargs)
+            in_sqlite = await page_ms(sqlite, **kwargs)
+            if middle.next_cursor is None:
+                after_cursor = "-"
+            else:
+                after_cursor = f"{await page_ms(sqlite, cursor=middle.next_cursor, **kwargs):.3f}"
+            print(f"{label:<32}{in_catalog:>14.3f}{in_sqlite:>13.3f}{after_cursor:>13}")
+        sqlite.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
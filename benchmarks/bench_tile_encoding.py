@@ -0,0 +1,74 @@
+"""
+Per-tile cost of choosing float16/float32 and encoding a 256x256 tile.
+
+Compares the clodius-era check from `old_reference_impl.generate_tiles.generate_1d_tiles`
+(a Python list comprehension for NaNs plus builtin max/min) against
+`app.services.tile_encoding.encode_dense_tile`.
+
+    python -m benchmarks.bench_tile_encoding
+"""
+
+import base64
+import timeit
+
+import numpy as np
+
+from app.services.tile_encoding import encode_dense_tile
+
+TILE_SHAPE = (256, 256)
+
+
+def reference_encode(dense: np.ndarray) -> dict:
+    """The float16/float32 decision as written in `generate_1d_tiles`."""
+    if len(dense):
+        max_dense = max(dense.reshape(-1))
+        min_dense = min(dense.reshape(-1))
+    else:
+        max_dense = 0
+        min_dense = 0
+
+    min_f16 = np.finfo("float16").min
+    max_f16 = np.finfo("float16").max
+
+    has_nan = len([d for d in dense.reshape((-1,)) if np.isnan(d)]) > 0
+
+    if not has_nan and max_dense > min_f16 and max_dense < max_f16 and min_dense > min_f16 and min_dense < max_f16:
+        return {
+            "dense": base64.b64encode(dense.reshape((-1,)).astype("float16")).decode("utf-8"),
+            "dtype": "float16",
+            "shape": dense.shape,
+        }
+    return {
+        "dense": base64.b64encode(dense.reshape((-1,)).astype("float32")).decode("utf-8"),
+        "dtype": "float32",
+        "shape": dense.shape,
+    }
+
+
+def make_tiles() -> dict:
+    rng = np.random.default_rng(0)
+    counts = rng.poisson(3.0, TILE_SHAPE).astype(np.float32)
+    balanced = counts / rng.uniform(1, 10, TILE_SHAPE[0]).astype(np.float32)
+    balanced[rng.integers(0, TILE_SHAPE[0], 8)] = np.nan  # masked bins, as ICE leaves them
+    return {"float16 (no NaN)": counts, "float32 (NaN rows)": balanced}
+
+
+def vectorized_encode(dense: np.ndarray) -> bytes:
+    """The dtype decision plus base64 wire encoding, as done for every generated tile."""
+    return encode_dense_tile(dense).to_json()
+
+
+def per_tile_ms(func, tile: np.ndarray, number: int) -> float:
+    return min(timeit.repeat(lambda: func(tile), number=number, repeat=5)) / number * 1e3
+
+
+def main() -> None:
+    print(f"{'tile':<20}{'reference (ms)':>16}{'vectorized (ms)':>18}{'speedup':>10}")
+    for name, tile in make_tiles().items():
+        before = per_tile_ms(reference_encode, tile, number=3)
+        after = per_tile_ms(vectorized_encode, tile, number=200)
+        print(f"{name:<20}{before:>16.3f}{after:>18.3f}{before / after:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
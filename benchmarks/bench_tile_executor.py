@@ -0,0 +1,94 @@
+"""
+Tile generation throughput of the thread and process modes of `TileExecutor`.
+
+Builds a synthetic mcool, then reads and encodes every tile of its finest zoom
+level, one job per tile, through a thread pool and a process pool of the same
+size. Process mode only pays off with several cores: on a single core it adds
+pickling and IPC on top of the same amount of CPU work.
+
+    python -m benchmarks.bench_tile_executor [--workers N] [--rounds N]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List, Tuple
+
+import cooler
+import numpy as np
+import pandas as pd
+
+from app.services.cooler_tiles import BINS_PER_TILE
+from app.services.tile_executor import EXECUTOR_MODES, TileExecutor
+from app.services.tile_workers import read_tile_envelopes
+
+RESOLUTIONS = [1000, 2000, 4000, 8000]
+
+
+def make_mcool(directory: str) -> str:
+    base_uri = os.path.join(directory, "bench.cool")
+    mcool_uri = os.path.join(directory, "bench.mcool")
+    chromsizes = pd.Series({"chr1": 1_500_000, "chr2": 1_000_000})
+    bins = cooler.binnify(chromsizes, RESOLUTIONS[0])
+    rng = np.random.default_rng(0)
+    n_bins = len(bins)
+    # A contact decay from the diagonal, dense enough that every tile has data
+    bin1 = rng.integers(0, n_bins, 2_000_000)
+    bin2 = np.minimum(bin1 + rng.geometric(0.01, bin1.size), n_bins - 1)
+    pixels = (
+        pd.DataFrame({"bin1_id": bin1, "bin2_id": bin2, "count": 1})
+        .groupby(["bin1_id", "bin2_id"], as_index=False)
+        .sum()
+    )
+    cooler.create_cooler(base_uri, bins, pixels)
+    cooler.zoomify_cooler(base_uri, mcool_uri, RESOLUTIONS, chunksize=1_000_000)
+    return mcool_uri
+
+
+def finest_resolution_tiles(mcool_uri: str) -> Tuple[int, List[Tuple[int, int]]]:
+    n_bins = len(cooler.Cooler(f"{mcool_uri}::resolutions/{RESOLUTIONS[0]}").bins())
+    n_tiles = -(-n_bins // BINS_PER_TILE)
+    return RESOLUTIONS[0], [(x, y) for x in range(n_tiles) for y in range(x, n_tiles)]
+
+
+async def read_all(executor: TileExecutor, mcool_uri: str, resolution: int, positions: List[Tuple[int, int]]) -> None:
+    # Distinct tileset keys so the per-tileset limit does not cap the pool
+    await asyncio.gather(
+        *(
+            executor.run(f"job{i}", read_tile_envelopes, mcool_uri, resolution, "default", [position])
+            for i, position in enumerate(positions)
+        )
+    )
+
+
+def tiles_per_second(mode: str, workers: int, rounds: int, mcool_uri: str) -> float:
+    resolution, positions = finest_resolution_tiles(mcool_uri)
+    executor = TileExecutor(max_workers=workers, per_tileset_limit=workers, mode=mode)
+    try:
+        asyncio.run(read_all(executor, mcool_uri, resolution, positions))  # start workers and open files
+        start = time.perf_counter()
+        for _ in range(rounds):
+            asyncio.run(read_all(executor, mcool_uri, resolution, positions))
+        return rounds * len(positions) / (time.perf_counter() - start)
+    finally:
+        executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        mcool_uri = make_mcool(directory)
+        print(f"{os.cpu_count()} cores, {args.workers} workers")
+        print(f"{'mode':<10}{'tiles/s':>10}")
+        for mode in EXECUTOR_MODES:
+            print(f"{mode:<10}{tiles_per_second(mode, args.workers, args.rounds, mcool_uri):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Grouping of a request's tile ids into adjacent tiles, with the greedy pairwise scan
+`partition_by_adjacent_tiles` used to do and with `group_adjacent_tiles` on parsed `TileId`s.
+
+    python -m benchmarks.bench_tile_partition [--tiles N]
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from app.services.tile_ids import parse_tile_id
+from app.services.tile_partition import group_adjacent_tiles
+
+
+def pairwise_partition(tile_ids: List[str], dimension: int = 2) -> List[List[str]]:
+    """The former implementation: compare each tile with every tile of every group."""
+    tile_id_lists: List[List[str]] = []
+    for tile_id in sorted(tile_ids, key=lambda x: [int(p) for p in x.split(".")[2 : 2 + dimension]]):
+        tile_position = [int(p) for p in tile_id.split(".")[2 : 2 + dimension]]
+        added = False
+        for tile_id_list in tile_id_lists:
+            for ct_tile_id in tile_id_list:
+                ct_tile_position = [int(p) for p in ct_tile_id.split(".")[2 : 2 + dimension]]
+                if all(abs(p1 - p2) <= 1 for p1, p2 in zip(tile_position, ct_tile_position)):
+                    tile_id_list.append(tile_id)
+                    added = True
+                    break
+            if added:
+                break
+        if not added:
+            tile_id_lists.append([tile_id])
+    return tile_id_lists
+
+
+def best_ms(func: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiles", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    side = int(np.sqrt(args.tiles))
+    # A viewport of adjacent tiles, and tiles scattered over a zoom level
+    layouts = {
+        "viewport": [f"uuid.8.{x}.{y}" for x in range(side) for y in range(side)],
+        "scattered": list({f"uuid.8.{x}.{y}" for x, y in rng.integers(0, 4 * side, size=(args.tiles, 2)).tolist()}),
+    }
+
+    print(f"{'layout':10} {'tiles':>6} {'groups':>7} {'pairwise':>12} {'parse':>12} {'grid':>12}")
+    for name, tile_ids in layouts.items():
+        parsed = [parse_tile_id(tile_id) for tile_id in tile_ids]
+        groups = len(group_adjacent_tiles(parsed))
+        pairwise = best_ms(lambda: pairwise_partition(tile_ids))
+        parse = best_ms(lambda: [parse_tile_id(tile_id) for tile_id in tile_ids])
+        grid = best_ms(lambda: group_adjacent_tiles(parsed))
+        print(f"{name:10} {len(tile_ids):6} {groups:7} {pairwise:10.2f}ms {parse:10.2f}ms {grid:10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
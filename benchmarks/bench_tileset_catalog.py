@@ -0,0 +1,117 @@
+"""
+Cost of one /api/v1/tilesets/ page at catalog scale.
+
+Compares the list-filter-sort-slice of the original `StubTilesetRepository.list_tilesets`
+(including its `ac` substring scan) against `app.services.tileset_catalog.TilesetCatalog.query`,
+and deep pages reached by offset against pages resumed from a cursor.
+
+    python -m benchmarks.bench_tileset_catalog [--tilesets N]
+"""
+
+import argparse
+import datetime
+import random
+import timeit
+from typing import Dict, List, Optional, Tuple
+
+from app.models import TilesetPublic
+from app.services.tileset_catalog import TilesetCatalog
+
+DATATYPES = ["matrix", "vector", "multivec", "chromsizes", "bedlike", "gene-annotations", "2d-rectangle-domains"]
+
+
+CELL_TYPES = ["GM12878", "K562", "HeLa", "IMR90", "HCT116", "HepG2", "H1-hESC", "mESC", "HUVEC", "KBM7"]
+ASSAYS = ["Hi-C", "Micro-C", "in situ Hi-C", "ChIP-seq CTCF", "ChIP-seq H3K27ac", "ATAC-seq", "RNA-seq", "DNase-seq"]
+STUDIES = ["Rao 2014", "Dixon 2012", "Krietenstein 2020", "Bonev 2017", "Hsieh 2020", "ENCODE", "4DN"]
+
+
+def make_tilesets(count: int) -> List[TilesetPublic]:
+    rng = random.Random(0)
+    start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        TilesetPublic(
+            uuid=f"{i:08x}",
+            filetype="cooler",
+            datatype=rng.choice(DATATYPES),
+            name=(
+                f"{rng.choice(CELL_TYPES)} {rng.choice(ASSAYS)} ({rng.choice(STUDIES)}) "
+                f"rep{rng.randint(1, 3)} ENCFF{rng.randrange(36**6):06X}"
+            ),
+            owner=f"user{rng.randrange(100)}",
+            created=start + datetime.timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+def scan_page(
+    tilesets: Dict[str, TilesetPublic],
+    datatype: Optional[List[str]],
+    order_by: Optional[str],
+    autocomplete: Optional[str] = None,
+    page_size: int = 10,
+) -> Tuple[List[TilesetPublic], int]:
+    """The filter/sort/slice of the original list_tilesets, and its total."""
+    results = list(tilesets.values())
+    if autocomplete:
+        results = [ts for ts in results if ts.name and autocomplete.lower() in ts.name.lower()]
+    if datatype:
+        results = [ts for ts in results if ts.datatype in datatype]
+    if order_by:
+        results.sort(key=lambda ts: getattr(ts, order_by) or "")
+    return results[:page_size], len(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tilesets", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tilesets = make_tilesets(args.tilesets)
+    table = {ts.uuid: ts for ts in tilesets}
+    catalog = TilesetCatalog(tilesets)
+
+    print(f"{args.tilesets} tilesets")
+    # Totals of large name matches are estimated; "count error" is the estimate's relative error
+    print(f"{'query':<32}{'scan (ms)':>12}{'catalog (ms)':>14}{'count error':>14}")
+    for label, datatype, order_by, autocomplete in [
+        ("dt=matrix", ["matrix"], None, None),
+        ("dt=matrix&o=name", ["matrix"], "name", None),
+        ("dt=matrix&dt=vector&o=created", ["matrix", "vector"], "created", None),
+        ("ac=h", None, None, "h"),
+        ("ac=hc", None, None, "hc"),
+        ("ac=hct", None, None, "hct"),
+        ("ac=k562", None, None, "k562"),
+        ("ac=encff1a2", None, None, "encff1a2"),
+        ("ac=k562 micro", None, None, "k562 micro"),
+        ("ac=bonev&dt=matrix&o=name", ["matrix"], "name", "bonev"),
+    ]:
+        filters = {"datatype": datatype} if datatype else None
+        before = min(timeit.repeat(lambda: scan_page(table, datatype, order_by, autocomplete), number=1, repeat=3))
+        after = min(
+            timeit.repeat(
+                lambda: catalog.query(filters, order_by=order_by, name_contains=autocomplete, limit=10),
+                number=10,
+                repeat=3,
+            )
+        )
+        _, expected = scan_page(table, datatype, order_by, autocomplete)
+        _, total = catalog.query(filters, order_by=order_by, name_contains=autocomplete, limit=10)
+        error = (total - expected) / max(expected, 1)
+        print(f"{label:<32}{before * 1e3:>12.2f}{after / 10 * 1e3:>14.3f}{error:>+14.1%}")
+
+    # The last page of a listing, reached by offset and by resuming after the previous page
+    filters = {"datatype": ["matrix", "vector"]}
+    _, total = catalog.query(filters, order_by="created", limit=0)
+    previous, _ = catalog.query(filters, order_by="created", offset=total - 20, limit=10)
+    cursor = catalog.sort_key(previous[-1], "created")
+    print(f"\n{'last page of ' + str(total):<32}{'offset (ms)':>12}{'cursor (ms)':>14}")
+    by_offset = min(
+        timeit.repeat(lambda: catalog.query(filters, order_by="created", offset=total - 10, limit=10), number=3)
+    )
+    by_cursor = min(timeit.repeat(lambda: catalog.query(filters, order_by="created", after=cursor, limit=10), number=3))
+    print(f"{'dt=matrix&dt=vector&o=created':<32}{by_offset / 3 * 1e3:>12.2f}{by_cursor / 3 * 1e3:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
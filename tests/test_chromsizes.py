@@ -1,10 +1,16 @@
+import json
 from unittest.mock import AsyncMock
 
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 
+from app.dependencies import get_chromsizes_store
 from app.main import app
 from app.models import TilesetInfoCooler, TilesetPublic
+from app.routers.chromsizes import CHROMSIZES_CACHE_CONTROL, calculate_cumulative_sizes, get_default_chromsizes
+from app.services.chromsizes_store import ChromSizes, ChromSizesStore
+from app.services.pagination import TilesetPage
 from app.services.tileset_repository import StubTilesetRepository
 
 
@@ -90,7 +96,7 @@ class TestChromSizesEndpoint:
         """Test getting chromosome sizes using assembly name"""
         mock_repo = AsyncMock()
         mock_repo.get_tileset_by_uuid.return_value = None
-        mock_repo.get_tilesets_by_coord_system.return_value = [sample_tileset]
+        mock_repo.get_chromsizes_tileset.return_value = sample_tileset
         mock_repo.get_tileset_info.return_value = sample_tileset_info
 
         from app.routers import chromsizes
@@ -106,7 +112,7 @@ class TestChromSizesEndpoint:
             assert len(data["chromsizes"]) == 5
 
             mock_repo.get_tileset_by_uuid.assert_called_once_with("hg19")
-            mock_repo.get_tilesets_by_coord_system.assert_called_once_with("hg19")
+            mock_repo.get_chromsizes_tileset.assert_called_once_with("hg19")
             mock_repo.get_tileset_info.assert_called_once_with("test_hg19_chromsizes")
         finally:
             app.dependency_overrides.clear()
@@ -115,7 +121,7 @@ class TestChromSizesEndpoint:
         """Test getting chromosome sizes using built-in default assembly"""
         mock_repo = AsyncMock()
         mock_repo.get_tileset_by_uuid.return_value = None
-        mock_repo.get_tilesets_by_coord_system.return_value = []
+        mock_repo.get_chromsizes_tileset.return_value = None
 
         from app.routers import chromsizes
 
@@ -137,7 +143,7 @@ class TestChromSizesEndpoint:
         """Test getting chromosome sizes in TSV format"""
         mock_repo = AsyncMock()
         mock_repo.get_tileset_by_uuid.return_value = None
-        mock_repo.get_tilesets_by_coord_system.return_value = []
+        mock_repo.get_chromsizes_tileset.return_value = None
 
         from app.routers import chromsizes
 
@@ -160,7 +166,7 @@ class TestChromSizesEndpoint:
         """Test getting cumulative chromosome sizes"""
         mock_repo = AsyncMock()
         mock_repo.get_tileset_by_uuid.return_value = None
-        mock_repo.get_tilesets_by_coord_system.return_value = []
+        mock_repo.get_chromsizes_tileset.return_value = None
 
         from app.routers import chromsizes
 
@@ -186,7 +192,7 @@ class TestChromSizesEndpoint:
         """Test 404 when assembly/tileset not found"""
         mock_repo = AsyncMock()
         mock_repo.get_tileset_by_uuid.return_value = None
-        mock_repo.get_tilesets_by_coord_system.return_value = []
+        mock_repo.get_chromsizes_tileset.return_value = None
 
         from app.routers import chromsizes
 
@@ -280,7 +286,7 @@ class TestAvailableChromSizesEndpoint:
         ]
 
         mock_repo = AsyncMock()
-        mock_repo.list_tilesets.return_value = (sample_tilesets, 2)
+        mock_repo.list_tilesets.return_value = TilesetPage(sample_tilesets, 2)
 
         from app.routers import chromsizes
 
@@ -299,14 +305,14 @@ class TestAvailableChromSizesEndpoint:
             assert data["results"][0]["datatype"] == "chromsizes"
             assert data["results"][1]["uuid"] == "hg38_chromsizes"
 
-            mock_repo.list_tilesets.assert_called_once_with(datatype=["chromsizes"], page=1, page_size=10)
+            mock_repo.list_tilesets.assert_called_once_with(datatype=["chromsizes"], page=1, page_size=10, cursor=None)
         finally:
             app.dependency_overrides.clear()
 
     def test_get_available_chrom_sizes_with_pagination(self, client, monkeypatch):
         """Test getting available chromosome sizes with pagination parameters"""
         mock_repo = AsyncMock()
-        mock_repo.list_tilesets.return_value = ([], 0)
+        mock_repo.list_tilesets.return_value = TilesetPage([], 0)
 
         from app.routers import chromsizes
 
@@ -320,14 +326,14 @@ class TestAvailableChromSizesEndpoint:
             assert data["count"] == 0
             assert len(data["results"]) == 0
 
-            mock_repo.list_tilesets.assert_called_once_with(datatype=["chromsizes"], page=2, page_size=5)
+            mock_repo.list_tilesets.assert_called_once_with(datatype=["chromsizes"], page=2, page_size=5, cursor=None)
         finally:
             app.dependency_overrides.clear()
 
     def test_get_available_chrom_sizes_empty_result(self, client, monkeypatch):
         """Test getting available chromosome sizes when no datasets exist"""
         mock_repo = AsyncMock()
-        mock_repo.list_tilesets.return_value = ([], 0)
+        mock_repo.list_tilesets.return_value = TilesetPage([], 0)
 
         from app.routers import chromsizes
 
@@ -384,6 +390,11 @@ class TestHelperFunctions:
         result = get_default_chromsizes("unknown_assembly")
         assert result is None
 
+    def test_get_default_chromsizes_synonyms(self):
+        """Test that GRC names and other cases find the built-in assemblies"""
+        assert get_default_chromsizes("GRCm38") is get_default_chromsizes("mm10")
+        assert get_default_chromsizes("HG38") is get_default_chromsizes("hg38")
+
     def test_calculate_cumulative_sizes(self):
         """Test calculating cumulative chromosome sizes"""
         from app.routers.chromsizes import calculate_cumulative_sizes
@@ -467,6 +478,15 @@ class TestIntegration:
         assert data["chromsizes"][0][0] == "chr1"
         assert isinstance(data["chromsizes"][0][1], int)
 
+    def test_assembly_synonyms_resolve_to_the_chromsizes_tileset(self, client):
+        """GRC names are served from the tileset of the matching UCSC assembly"""
+        expected = client.get("/api/v1/chrom-sizes/?id=hg19_chromsizes").json()
+
+        for name in ["hg19", "GRCh37"]:
+            response = client.get(f"/api/v1/chrom-sizes/?id={name}")
+            assert response.status_code == 200
+            assert response.json() == expected
+
     def test_available_chrom_sizes_integration(self, client):
         """Test available chromosome sizes endpoint with real repository"""
         response = client.get("/api/v1/available-chrom-sizes/")
@@ -479,3 +499,116 @@ class TestIntegration:
         # If there are results, they should be chromsizes tilesets
         for tileset in data["results"]:
             assert tileset["datatype"] == "chromsizes"
+
+
+class TestChromSizesStore:
+    """Tests for precomputed chromosome sizes"""
+
+    def test_offsets_and_locate(self):
+        sizes = ChromSizes([["chr1", 100], ["chr2", 50], ["chrM", 10]])
+
+        assert sizes.offsets.tolist() == [0, 100, 150, 160]
+        assert sizes.total_length == 160
+        assert sizes.locate(0) == ("chr1", 0)
+        assert sizes.locate(99) == ("chr1", 99)
+        assert sizes.locate(100) == ("chr2", 0)
+        assert sizes.locate(159) == ("chrM", 9)
+        with pytest.raises(ValueError):
+            sizes.locate(160)
+
+    def test_locate_many(self):
+        sizes = ChromSizes([["chr1", 100], ["chr2", 50]])
+
+        indexes, local = sizes.locate_many(np.array([0, 120, 149, 99]))
+
+        assert indexes.tolist() == [0, 1, 1, 0]
+        assert local.tolist() == [0, 20, 49, 99]
+        with pytest.raises(ValueError):
+            sizes.locate_many(np.array([-1]))
+
+    def test_bodies_match_the_unprecomputed_responses(self):
+        chromsizes = get_default_chromsizes("hg19")
+        sizes = ChromSizes(chromsizes)
+
+        assert json.loads(sizes.body("json").content) == {"chromsizes": chromsizes}
+        assert json.loads(sizes.body("json", cumulative=True).content) == {
+            "chromsizes": calculate_cumulative_sizes(chromsizes)
+        }
+        assert sizes.body("tsv").content.decode() == "\n".join(f"{chrom}\t{size}" for chrom, size in chromsizes)
+        assert sizes.body("tsv").etag != sizes.body("tsv", cumulative=True).etag
+        with pytest.raises(ValueError):
+            sizes.body("xml")
+
+    def test_store_rebuilds_only_for_a_new_list(self):
+        store = ChromSizesStore()
+        chromsizes = [["chr1", 100]]
+
+        first = store.get("hg19", chromsizes)
+        assert store.get("hg19", chromsizes) is first
+        assert store.get("hg19", [["chr1", 100]]) is not first
+        assert store.builds == 2
+
+    def test_endpoint_builds_each_assembly_once(self, client):
+        store = get_chromsizes_store()
+        client.get("/api/v1/chrom-sizes/?id=mm10")
+        builds = store.builds
+
+        client.get("/api/v1/chrom-sizes/?id=mm10&type=tsv")
+        response = client.get("/api/v1/chrom-sizes/?id=mm10&cum=1")
+
+        assert response.json()["chromsizes"][1] == ["chr2", 195471971]
+        assert store.builds == builds
+
+
+class TestChromSizesCaching:
+    """Tests for conditional requests on /api/v1/chrom-sizes/"""
+
+    @pytest.fixture
+    def default_assembly_client(self, client):
+        """Client whose repository has no tilesets, so built-in assemblies are served"""
+        from app.routers import chromsizes
+
+        mock_repo = AsyncMock()
+        mock_repo.get_tileset_by_uuid.return_value = None
+        mock_repo.get_chromsizes_tileset.return_value = None
+        app.dependency_overrides[chromsizes.get_repository] = lambda: mock_repo
+        try:
+            yield client
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_etag_and_cache_control(self, default_assembly_client):
+        """Built-in assemblies get a strong, stable ETag per format, and are revalidated like tileset chromsizes"""
+        client = default_assembly_client
+        response = client.get("/api/v1/chrom-sizes/?id=mm10&type=tsv")
+        json_response = client.get("/api/v1/chrom-sizes/?id=mm10")
+
+        etag = response.headers["etag"]
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag != json_response.headers["etag"]
+        assert response.headers["cache-control"] == CHROMSIZES_CACHE_CONTROL
+        assert "immutable" not in response.headers["cache-control"]
+        assert client.get("/api/v1/chrom-sizes/?id=mm10&type=tsv").headers["etag"] == etag
+
+    def test_if_none_match_returns_304(self, default_assembly_client):
+        """A matching If-None-Match gets an empty 304, a stale one the full body"""
+        client = default_assembly_client
+        etag = client.get("/api/v1/chrom-sizes/?id=hg38").headers["etag"]
+
+        for header in [etag, f"W/{etag}", f'"other", {etag}', "*"]:
+            response = client.get("/api/v1/chrom-sizes/?id=hg38", headers={"If-None-Match": header})
+            assert response.status_code == 304, header
+            assert response.content == b""
+            assert response.headers["etag"] == etag
+
+        response = client.get("/api/v1/chrom-sizes/?id=hg38", headers={"If-None-Match": '"stale"'})
+        assert response.status_code == 200
+        assert response.json()["chromsizes"][0] == ["chr1", 248956422]
+
+    def test_tileset_chromsizes_are_cached_for_less_time(self, client):
+        """Chromsizes of a tileset may change with its datafile, so they are not immutable"""
+        response = client.get("/api/v1/chrom-sizes/?id=hg19_chromsizes")
+
+        assert response.status_code == 200
+        assert "immutable" not in response.headers["cache-control"]
+        assert "etag" in response.headers
@@ -0,0 +1,290 @@
+import base64
+
+import h5py
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import TilesetPublic
+from app.services import tileset_repository
+from app.services.multivec_aggregation import AGG_FUNCS, AggregationPlan, MultivecAggregator
+from app.services.multivec_tiles import MultivecTileEngine
+
+
+@pytest.fixture
+def client():
+    """Test client fixture"""
+    return TestClient(app)
+
+
+def aggregate_per_group(dense, groups, func):
+    """Aggregation as higlass' generate_1d_tiles does it, one group at a time"""
+    reduce = {"sum": np.sum, "mean": np.mean, "median": np.median, "std": np.std, "var": np.var}
+    reduce.update({"min": np.amin, "max": np.amax})
+    return np.array([reduce[func](dense[group if isinstance(group, list) else [group]], axis=0) for group in groups])
+
+
+class TestAggregationPlan:
+    """Tests for aggGroups compiled into vectorized reductions"""
+
+    @pytest.mark.parametrize("func", AGG_FUNCS)
+    def test_matches_per_group_aggregation(self, func):
+        rng = np.random.default_rng(0)
+        dense = rng.random((40, 16), dtype=np.float32)
+        groups = [[3, 1, 2], 7, [0, 39, 5, 5], [10, 11], [12, 13], list(range(20, 30)), 8]
+
+        actual = AggregationPlan(groups, func).apply(dense)
+
+        assert actual.shape == (len(groups), 16)
+        np.testing.assert_allclose(actual, aggregate_per_group(dense, groups, func), rtol=1e-5, atol=1e-6)
+
+    def test_float64_tiles_and_duplicate_rows(self):
+        dense = np.arange(24, dtype=np.float64).reshape(6, 4)
+        plan = AggregationPlan([[0, 1], [2, 3, 4], [5, 5]], "sum")
+
+        np.testing.assert_array_equal(plan.apply(dense), [[4, 6, 8, 10], [36, 39, 42, 45], [40, 42, 44, 46]])
+
+    def test_nan_propagates_like_numpy(self):
+        dense = np.array([[1.0, np.nan], [2.0, 3.0]])
+
+        for func in AGG_FUNCS:
+            np.testing.assert_array_equal(
+                np.isnan(AggregationPlan([[0, 1]], func).apply(dense)), [[False, True]], err_msg=func
+            )
+
+    @pytest.mark.parametrize(
+        "groups, func",
+        [([[0]], "mode"), ([], "sum"), ([[0], []], "sum"), ([[-1]], "sum"), ([[0.5]], "sum"), ([["a"]], "sum")],
+    )
+    def test_rejects_invalid_options(self, groups, func):
+        with pytest.raises(ValueError):
+            AggregationPlan(groups, func)
+
+    def test_rejects_rows_outside_the_tile(self):
+        with pytest.raises(ValueError, match="row 4"):
+            AggregationPlan([[0, 4]], "mean").apply(np.zeros((3, 2)))
+
+
+class TestMultivecAggregator:
+    """Tests for plans compiled once per options hash"""
+
+    def test_compiles_once_per_options(self):
+        aggregator = MultivecAggregator()
+        options = {"aggGroups": [[0, 1], [2]], "aggFunc": "mean", "other": 1}
+
+        plan = aggregator.plan(options)
+        assert aggregator.plan({"aggFunc": "mean", "aggGroups": [[0, 1], [2]], "other": 2}) is plan
+        assert aggregator.plan({**options, "aggFunc": "max"}) is not plan
+        assert aggregator.stats() == {"plans": 2, "hits": 1, "compiles": 2}
+
+    def test_options_without_aggregation(self):
+        aggregator = MultivecAggregator()
+
+        assert aggregator.plan(None) is None
+        assert aggregator.plan({"aggFunc": "sum"}) is None
+        with pytest.raises(ValueError):
+            aggregator.plan({"aggGroups": 3, "aggFunc": "sum"})
+
+    def test_evicts_least_recently_used_plans(self):
+        aggregator = MultivecAggregator(max_plans=2)
+        first = aggregator.plan({"aggGroups": [0], "aggFunc": "sum"})
+        aggregator.plan({"aggGroups": [1], "aggFunc": "sum"})
+        aggregator.plan({"aggGroups": [0], "aggFunc": "sum"})
+        aggregator.plan({"aggGroups": [2], "aggFunc": "sum"})
+
+        assert aggregator.plan({"aggGroups": [0], "aggFunc": "sum"}) is first
+        assert aggregator.stats()["plans"] == 2
+
+
+MULTIVEC_RESOLUTIONS = [10, 20, 40, 80]
+# No chromosome length is a multiple of the 20, 40 or 80 bp resolutions
+MULTIVEC_CHROMS = {"chr1": 995, "chr2": 533, "chr3": 77}
+MULTIVEC_ROWS = 6
+MULTIVEC_TILE_SIZE = 16
+# clodius 0.22.2 `get_single_tile` output for `multivec_path`, as the (chromosome + 1) * 1000 + bin
+# that each column of the tile was read from, 0 for zero-filled columns
+CLODIUS_TILE_BINS = {
+    (80, 0): [*range(1000, 1013), *range(2000, 2003)],
+    (80, 1): [*range(2003, 2007), 3000, *[0] * 11],
+    (40, 0): [*range(1000, 1016)],
+    (40, 1): [*range(1016, 1025), *range(2000, 2007)],
+    (40, 2): [*range(2007, 2014), *range(3000, 3002), *[0] * 7],
+    (20, 0): [*range(1000, 1016)],
+    (20, 1): [*range(1016, 1032)],
+    (20, 2): [*range(1032, 1048)],
+    (20, 3): [*range(1048, 1050), *range(2000, 2014)],
+    (20, 4): [*range(2014, 2027), *range(3000, 3003)],
+    (20, 5): [3003, *[0] * 15],
+    (10, 0): [*range(1000, 1016)],
+    (10, 1): [*range(1016, 1032)],
+    (10, 2): [*range(1032, 1048)],
+    (10, 3): [*range(1048, 1064)],
+    (10, 4): [*range(1064, 1080)],
+    (10, 5): [*range(1080, 1096)],
+    (10, 6): [*range(1096, 1100), *range(2000, 2012)],
+    (10, 7): [*range(2012, 2028)],
+    (10, 8): [*range(2028, 2044)],
+    (10, 9): [*range(2044, 2053), *range(3000, 3007)],
+    (10, 10): [3007, *[0] * 15],
+}
+
+
+@pytest.fixture(scope="module")
+def multivec_path(tmp_path_factory):
+    """
+    A small three-chromosome multivec file in clodius' layout, with gzip chunks of 8 bins.
+
+    Row r of bin b of the c-th chromosome holds ((c + 1) * 1000 + b) * 100 + r.
+    """
+    path = str(tmp_path_factory.mktemp("multivec") / "test.mv5")
+    with h5py.File(path, "w") as f:
+        f.create_group("info").attrs["tile-size"] = MULTIVEC_TILE_SIZE
+        f.create_group("chroms")
+        f["chroms"].create_dataset("name", data=np.array([name.encode() for name in MULTIVEC_CHROMS]))
+        f["chroms"].create_dataset("length", data=np.array(list(MULTIVEC_CHROMS.values())))
+        for resolution in MULTIVEC_RESOLUTIONS:
+            group = f.create_group(f"resolutions/{resolution}")
+            group.attrs["row_infos"] = [f"sample {row}".encode() for row in range(MULTIVEC_ROWS)]
+            for chrom, (name, length) in enumerate(MULTIVEC_CHROMS.items()):
+                bins = -(-length // resolution)
+                labels = (chrom + 1) * 1000 + np.arange(bins)
+                group.create_dataset(
+                    f"values/{name}",
+                    data=(labels[:, None] * 100 + np.arange(MULTIVEC_ROWS)).astype(np.float32),
+                    chunks=(min(bins, 8), MULTIVEC_ROWS),
+                    compression="gzip",
+                )
+    return path
+
+
+def expected_tile(resolution, x):
+    """The (rows, bins) tile clodius returns for `multivec_path`"""
+    labels = np.array(CLODIUS_TILE_BINS[(resolution, x)])
+    return np.where(labels > 0, labels * 100 + np.arange(MULTIVEC_ROWS)[:, None], 0).astype(np.float32)
+
+
+@pytest.fixture
+def multivec_tileset(multivec_path, monkeypatch):
+    """Register a datafile-backed multivec tileset in the stub repository"""
+    tileset = TilesetPublic(
+        uuid="test_multivec",
+        filetype="multivec",
+        datatype="multivec",
+        name="Test multivec",
+        coordSystem="test",
+        datafile=multivec_path,
+    )
+    monkeypatch.setitem(tileset_repository.stub_tilesets_db, tileset.uuid, tileset)
+    return tileset
+
+
+class TestMultivecTileEngine:
+    """Tests for reading multivec tiles out of HDF5 files"""
+
+    def test_tileset_info(self, multivec_path):
+        info = MultivecTileEngine().tileset_info(multivec_path)
+
+        assert info.resolutions == [80, 40, 20, 10]
+        assert info.max_pos == [1605]
+        assert info.chromsizes == [["chr1", 995], ["chr2", 533], ["chr3", 77]]
+        assert info.shape == [MULTIVEC_TILE_SIZE, MULTIVEC_ROWS]
+        assert info.row_infos[0] == "sample 0"
+
+    def test_file_without_resolutions(self, tmp_path):
+        path = str(tmp_path / "empty.mv5")
+        with h5py.File(path, "w") as f:
+            f.create_group("info").attrs["tile-size"] = MULTIVEC_TILE_SIZE
+            f["chroms/name"] = np.array([b"chr1"])
+            f["chroms/length"] = np.array([100])
+            f.create_group("resolutions")
+        engine = MultivecTileEngine()
+
+        with pytest.raises(ValueError, match="no resolutions in"):
+            engine.tileset_info(path)
+        with pytest.raises(ValueError, match="no resolutions in"):
+            engine.read_tiles(path, 10, [0])
+
+    @pytest.mark.parametrize("resolution, x", sorted(CLODIUS_TILE_BINS))
+    def test_read_tile_matches_clodius(self, multivec_path, resolution, x):
+        tile = MultivecTileEngine().read_tiles(multivec_path, resolution, [x])[x]
+
+        assert tile.shape == (MULTIVEC_ROWS, MULTIVEC_TILE_SIZE)
+        np.testing.assert_array_equal(tile, expected_tile(resolution, x))
+
+    def test_adjacent_tiles_decompress_each_chunk_once(self, multivec_path):
+        engine = MultivecTileEngine()
+        tiles = engine.read_tiles(multivec_path, 10, [5, 6, 7])
+        for x in [5, 6, 7]:
+            tiles.update(engine.read_tiles(multivec_path, 10, [x]))
+            np.testing.assert_array_equal(tiles[x], expected_tile(10, x))
+
+        # Tiles 5-7 hold chr1 bins 80-99 (chunks 10-12) and chr2 bins 0-27 (chunks 0-3)
+        assert engine.stats()["misses"] == 7
+        assert engine.stats()["hits"] > 0
+
+    def test_chunk_cache_is_bounded(self, multivec_path):
+        engine = MultivecTileEngine(chunk_cache_bytes=8 * MULTIVEC_ROWS * 4 * 2)
+        engine.read_tiles(multivec_path, 10, [0, 1])
+
+        stats = engine.stats()
+        assert stats["chunks"] == 2 and stats["evictions"] == 2
+
+    def test_reopened_files_do_not_reuse_old_chunks(self, multivec_path):
+        engine = MultivecTileEngine()
+        engine.read_tiles(multivec_path, 10, [0])
+        engine.pool.invalidate(multivec_path)
+        engine.read_tiles(multivec_path, 10, [0])
+
+        assert engine.stats()["hits"] == 0
+
+
+class TestMultivecTilesEndpoint:
+    """Tests for multivec tilesets on /api/v1/tiles/ and /api/v1/tileset_info/"""
+
+    def test_get_tiles(self, client, multivec_tileset):
+        response = client.get(
+            "/api/v1/tiles/", params={"d": ["test_multivec.3.0", "test_multivec.3.1", "test_multivec.9.0"]}
+        )
+
+        data = response.json()["data"]
+        tile = data["test_multivec.3.1"]
+        assert tile["shape"] == [MULTIVEC_ROWS, MULTIVEC_TILE_SIZE]
+        dense = np.frombuffer(base64.b64decode(tile["dense"]), dtype=tile["dtype"]).reshape(tile["shape"])
+        np.testing.assert_array_equal(dense, expected_tile(10, 1))
+        assert "error" in data["test_multivec.9.0"]
+
+    def test_post_aggregates_rows(self, client, multivec_tileset):
+        options = {"aggGroups": [[0, 1], [2, 3, 4], 5], "aggFunc": "sum"}
+        response = client.post(
+            "/api/v1/tiles/", json=[{"tilesetUid": "test_multivec", "tileIds": ["1.0", "1.1"], "options": options}]
+        )
+
+        tile = response.json()["data"]["test_multivec.1.1"]
+        assert tile["shape"] == [3, MULTIVEC_TILE_SIZE]
+        dense = np.frombuffer(base64.b64decode(tile["dense"]), dtype=tile["dtype"]).reshape(tile["shape"])
+        raw = expected_tile(40, 1)
+        np.testing.assert_allclose(dense, [raw[0] + raw[1], raw[2] + raw[3] + raw[4], raw[5]], rtol=1e-3)
+
+    def test_post_rejects_invalid_aggregation(self, client, multivec_tileset):
+        options = {"aggGroups": [[0, -1]], "aggFunc": "sum"}
+        response = client.post(
+            "/api/v1/tiles/", json=[{"tilesetUid": "test_multivec", "tileIds": ["1.0"], "options": options}]
+        )
+
+        assert "aggGroups" in response.json()["data"]["test_multivec.1.0"]["error"]
+        assert (
+            client.post(
+                "/api/v1/tiles/",
+                json=[{"tilesetUid": "test_multivec", "tileIds": ["1.0"], "options": {**options, "aggFunc": "mode"}}],
+            ).status_code
+            == 422
+        )
+
+    def test_tileset_info_and_chromsizes(self, client, multivec_tileset):
+        info = client.get("/api/v1/tileset_info/?d=test_multivec").json()["data"]["test_multivec"]
+        chromsizes = client.get("/api/v1/chrom-sizes/?id=test_multivec&type=tsv")
+
+        assert info["datatype"] == "multivec"
+        assert info["shape"] == [MULTIVEC_TILE_SIZE, MULTIVEC_ROWS]
+        assert chromsizes.text == "chr1\t995\nchr2\t533\nchr3\t77"
@@ -0,0 +1,214 @@
+import asyncio
+import datetime
+import random
+import sqlite3
+
+import pytest
+
+from app.models import TilesetPublic
+from app.services import tileset_repository
+from app.services.pagination import PageCursor, encode_cursor
+from app.services.sqlite_repository import SqliteTilesetRepository
+from app.services.tileset_catalog import TilesetCatalog
+from app.services.tileset_repository import StubTilesetRepository
+
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_tilesets(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        TilesetPublic(
+            uuid=f"ts{i:04d}",
+            filetype=rng.choice(["cooler", "bigwig"]),
+            datatype=rng.choice(["matrix", "vector", "chromsizes"]),
+            name=rng.choice([None, "Hi-C rao", "ChIP seq", "atac", "Rao ChIP 100%"]),
+            owner=rng.choice([None, "ann", "bob"]),
+            coordSystem=rng.choice(["hg19", "hg38"]),
+            private=rng.random() < 0.5,
+            created=rng.choice([None, EPOCH, EPOCH + datetime.timedelta(days=1)]),
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A SQLite repository in a temporary directory"""
+    repo = SqliteTilesetRepository(str(tmp_path / "tilesets.db"), readers=2)
+    yield repo
+    asyncio.run(repo.close())
+
+
+def register_all(repo, tilesets):
+    async def register():
+        for tileset in tilesets:
+            await repo.register_tileset(tileset)
+
+    asyncio.run(register())
+
+
+def walk_pages(repo, **kwargs):
+    """Follow next cursors through a listing, then previous cursors back to its start"""
+
+    async def walk():
+        pages = []
+        result = await repo.list_tilesets(page_size=7, **kwargs)
+        pages.append(result)
+        while result.next_cursor is not None:
+            result = await repo.list_tilesets(page_size=7, cursor=result.next_cursor, **kwargs)
+            pages.append(result)
+        backwards = []
+        while result.previous_cursor is not None:
+            result = await repo.list_tilesets(page_size=7, cursor=result.previous_cursor, **kwargs)
+            backwards.insert(0, result)
+        return pages, backwards
+
+    return asyncio.run(walk())
+
+
+class TestSqliteTilesetRepository:
+    """Tests for the SQLite-backed tileset repository"""
+
+    def test_uses_wal_mode(self, repo, tmp_path):
+        conn = sqlite3.connect(tmp_path / "tilesets.db")
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        conn.close()
+
+    def test_register_and_get(self, repo):
+        tileset = make_tilesets(1)[0]
+        register_all(repo, [tileset])
+
+        assert asyncio.run(repo.get_tileset_by_uuid(tileset.uuid)) == tileset
+        assert asyncio.run(repo.get_tileset_by_uuid("missing")) is None
+
+    def test_survives_reopening(self, repo, tmp_path):
+        tilesets = make_tilesets(5)
+        register_all(repo, tilesets)
+
+        reopened = SqliteTilesetRepository(str(tmp_path / "tilesets.db"))
+        try:
+            assert asyncio.run(reopened.list_tilesets()).results == tilesets
+        finally:
+            asyncio.run(reopened.close())
+
+    def test_replacing_keeps_insertion_position(self, repo):
+        tilesets = make_tilesets(3)
+        register_all(repo, tilesets)
+        replaced = tilesets[0].model_copy(update={"name": "renamed"})
+        register_all(repo, [replaced])
+
+        assert [ts.name for ts in asyncio.run(repo.list_tilesets()).results][0] == "renamed"
+        assert asyncio.run(repo.list_tilesets()).total == 3
+        assert asyncio.run(repo.list_tilesets(autocomplete="RENAME")).results == [replaced]
+
+    def test_coord_system(self, repo):
+        tilesets = make_tilesets(20)
+        register_all(repo, tilesets)
+
+        assert asyncio.run(repo.get_tilesets_by_coord_system("hg38")) == [
+            ts for ts in tilesets if ts.coordSystem == "hg38"
+        ]
+
+    def test_chromsizes_tileset_matches_the_catalog(self, repo):
+        tilesets = make_tilesets(40)
+        tilesets[5] = tilesets[5].model_copy(update={"coordSystem": "GRCh38"})
+        register_all(repo, tilesets)
+        catalog = TilesetCatalog(tilesets)
+
+        for name in ["hg19", "GRCh37", "hg38", "grch38", "mm10"]:
+            assert asyncio.run(repo.get_chromsizes_tileset(name)) == catalog.chromsizes_tileset(name), name
+
+    def test_autocomplete_escapes_wildcards(self, repo):
+        register_all(repo, make_tilesets(30))
+
+        results = asyncio.run(repo.list_tilesets(autocomplete="100%", page_size=100)).results
+        assert results and all(ts.name == "Rao ChIP 100%" for ts in results)
+        assert asyncio.run(repo.list_tilesets(autocomplete="_")).total == 0
+
+    def test_listings_match_the_catalog(self, repo, monkeypatch):
+        tilesets = make_tilesets(60)
+        register_all(repo, tilesets)
+        monkeypatch.setattr(tileset_repository, "stub_tilesets_db", TilesetCatalog(tilesets))
+        stub = StubTilesetRepository()
+
+        for kwargs in [
+            {},
+            {"datatype": ["matrix"]},
+            {"datatype": ["matrix", "vector"], "filetype": "cooler"},
+            {"autocomplete": "rao"},
+        ]:
+            for order_by in (None, "name", "created", "private", "owner"):
+                for reverse in (False, True):
+                    listing = dict(kwargs, order_by=order_by, reverse_order=reverse)
+                    pages, backwards = walk_pages(repo, **listing)
+                    expected, _ = walk_pages(stub, **listing)
+
+                    assert [page.results for page in pages] == [page.results for page in expected], listing
+                    assert {page.total for page in pages} == {expected[0].total}
+                    assert [page.results for page in backwards] == [page.results for page in pages[:-1]], listing
+                    third_page = asyncio.run(repo.list_tilesets(page=3, page_size=7, **listing))
+                    assert third_page.results == asyncio.run(stub.list_tilesets(page=3, page_size=7, **listing)).results
+
+    def test_listing_totals_are_counted_once_per_catalog_version(self, repo, tmp_path):
+        tilesets = make_tilesets(30)
+        register_all(repo, tilesets)
+
+        pages, _ = walk_pages(repo, datatype=["matrix"])
+        assert repo.stats()["sqlite_counts"]["misses"] == 1
+        assert repo.stats()["sqlite_counts"]["hits"] == 2 * len(pages) - 2
+
+        # Another process writing to the same database invalidates the totals too
+        writer = SqliteTilesetRepository(str(tmp_path / "tilesets.db"))
+        try:
+            added = make_tilesets(1, seed=1)[0].model_copy(update={"uuid": "added", "datatype": "matrix"})
+            asyncio.run(writer.import_tilesets([added]))
+        finally:
+            asyncio.run(writer.close())
+        expected = sum(ts.datatype == "matrix" for ts in tilesets) + 1
+        assert asyncio.run(repo.list_tilesets(datatype=["matrix"])).total == expected
+        renamed = added.model_copy(update={"name": "zzz"})
+        register_all(repo, [renamed])
+        assert asyncio.run(repo.list_tilesets(autocomplete="zzz")).total == 1
+
+    def test_datatype_lookups_use_the_composite_indexes(self, tmp_path):
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE tilesets (seq INTEGER PRIMARY KEY AUTOINCREMENT, uuid TEXT NOT NULL UNIQUE, "
+            "filetype TEXT NOT NULL, datatype TEXT NOT NULL, coordSystem TEXT, owner TEXT, name TEXT, "
+            "name_key TEXT NOT NULL, created_key REAL NOT NULL, record TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX tilesets_datatype ON tilesets (datatype)")
+        conn.close()
+
+        repo = SqliteTilesetRepository(path)
+        try:
+            register_all(repo, make_tilesets(10))
+            conn = sqlite3.connect(path)
+            indexes = {name for _, name, *_ in conn.execute("PRAGMA index_list(tilesets)")}
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM tilesets WHERE datatype = 'matrix'").fetchall()
+            conn.close()
+
+            assert "tilesets_datatype" not in indexes
+            assert "tilesets_datatype_name" in indexes
+            assert "USING COVERING INDEX tilesets_datatype_" in " ".join(row[-1] for row in plan)
+        finally:
+            asyncio.run(repo.close())
+
+    def test_cursor_of_another_ordering_is_rejected(self, repo):
+        register_all(repo, make_tilesets(10))
+        cursor = asyncio.run(repo.list_tilesets(order_by="name", page_size=2)).next_cursor
+
+        with pytest.raises(ValueError):
+            asyncio.run(repo.list_tilesets(cursor=cursor))
+
+    @pytest.mark.parametrize(
+        "order_by, key", [(None, ("abc",)), (None, (1, "x")), ("name", (1, "x")), ("created", ("x", "y"))]
+    )
+    def test_cursor_with_mistyped_key_is_rejected(self, repo, order_by, key):
+        register_all(repo, make_tilesets(10))
+        cursor = encode_cursor(PageCursor(order_by, False, key))
+
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            asyncio.run(repo.list_tilesets(order_by=order_by, cursor=cursor))
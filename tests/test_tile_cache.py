@@ -0,0 +1,450 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_tile_cache
+from app.main import app
+from app.models import ErrorModel
+from app.routers import tilesets
+from app.services.single_flight import SingleFlight
+from app.services.tile_cache import LRUTileCache, RedisTileCache, options_hash, tile_cache_key
+from app.services.tile_ids import parse_tile_id
+from app.services.tile_encoding import ENVELOPE_MAGIC, encode_dense_tile
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio.Redis for RedisTileCache"""
+
+    def __init__(self, fail=False):
+        self.store = {}
+        self.expiries = {}
+        self.fail = fail
+
+    async def mget(self, keys):
+        if self.fail:
+            raise ConnectionError("connection refused")
+        return [self.store.get(key) for key in keys]
+
+    async def mset(self, mapping):
+        if self.fail:
+            raise ConnectionError("connection refused")
+        self.store.update(mapping)
+
+    async def info(self, section):
+        return {"evicted_keys": 7}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value, ex))
+
+    async def execute(self):
+        for key, value, ex in self.commands:
+            self.redis.store[key] = value
+            self.redis.expiries[key] = ex
+
+
+@pytest.fixture
+def client():
+    """Test client fixture"""
+    return TestClient(app)
+
+
+def mock_repository(versions=None):
+    """A repository mock whose tilesets have the given datafile versions and all use tile options"""
+    repo = AsyncMock()
+    repo.get_datafile_versions.return_value = versions or {}
+    repo.get_tile_options.side_effect = lambda uuid, options: options
+    return repo
+
+
+class TestTileCacheKey:
+    """Tests for tile cache key normalization"""
+
+    def test_adds_default_transform_to_2d_tiles(self):
+        assert tile_cache_key("abc.1.2.3") == tile_cache_key("abc.1.2.3.default") == "abc.1.2.3.default"
+
+    def test_keeps_explicit_transform(self):
+        assert tile_cache_key("abc.1.2.3.KR") == "abc.1.2.3.KR"
+
+    def test_1d_tiles(self):
+        assert tile_cache_key("abc.1.2") == "abc.1.2"
+
+    def test_options_hash(self):
+        assert tile_cache_key("abc.1.2", "d41d8cd9") == "abc.1.2:d41d8cd9"
+
+    def test_datafile_version(self):
+        assert tile_cache_key("abc.1.2.3", "d41d8cd9", "3e8-1-2") == "abc.1.2.3.default@3e8-1-2:d41d8cd9"
+        assert tile_cache_key("abc.1.2", version="3e8-1-2") == "abc.1.2@3e8-1-2"
+
+    def test_malformed_tile_id(self):
+        assert tile_cache_key("abc.one.2") is None
+        assert tile_cache_key("abc.1") is None
+
+    def test_options_hash_is_canonical(self):
+        options = {"aggregationMethod": "mean", "bins": {"a": 1, "b": [2, 3]}}
+        reordered = {"bins": {"b": [2, 3], "a": 1}, "aggregationMethod": "mean"}
+
+        assert options_hash(options) == options_hash(reordered)
+        assert options_hash(options) != options_hash({"aggregationMethod": "sum"})
+        assert options_hash(None) is None
+        assert options_hash({}) is None
+
+
+class TestLRUTileCache:
+    """Tests for the byte-bounded in-process cache"""
+
+    def test_hit_and_miss(self):
+        cache = LRUTileCache(max_bytes=1024)
+        asyncio.run(cache.set_many({"a": b"1"}))
+
+        assert asyncio.run(cache.get_many(["a", "b"])) == {"a": b"1"}
+        stats = asyncio.run(cache.stats())
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = LRUTileCache(max_bytes=25)
+        asyncio.run(cache.set_many({"a": b"x" * 9, "b": b"x" * 9}))
+        asyncio.run(cache.get_many(["a"]))
+        asyncio.run(cache.set_many({"c": b"x" * 9}))
+
+        assert asyncio.run(cache.get_many(["a", "b", "c"])).keys() == {"a", "c"}
+        stats = asyncio.run(cache.stats())
+        assert stats["evictions"] == 1
+        assert stats["bytes"] == 20
+
+    def test_skips_values_larger_than_the_cache(self):
+        cache = LRUTileCache(max_bytes=10)
+        asyncio.run(cache.set_many({"a": b"x" * 20}))
+
+        assert asyncio.run(cache.get_many(["a"])) == {}
+        assert asyncio.run(cache.stats())["bytes"] == 0
+
+    def test_replacing_a_value_updates_size(self):
+        cache = LRUTileCache(max_bytes=100)
+        asyncio.run(cache.set_many({"a": b"x" * 10}))
+        asyncio.run(cache.set_many({"a": b"x" * 4}))
+
+        assert asyncio.run(cache.stats())["bytes"] == 5
+
+
+class TestRedisTileCache:
+    """Tests for the Redis-protocol backend against an in-memory fake"""
+
+    def test_round_trip_with_prefix(self):
+        fake = FakeRedis()
+        cache = RedisTileCache(fake, prefix="t:")
+        asyncio.run(cache.set_many({"a": b"1"}))
+
+        assert fake.store == {"t:a": b"1"}
+        assert asyncio.run(cache.get_many(["a", "b"])) == {"a": b"1"}
+        stats = asyncio.run(cache.stats())
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 7)
+
+    def test_ttl_uses_pipeline(self):
+        fake = FakeRedis()
+        cache = RedisTileCache(fake, prefix="t:", ttl_seconds=60)
+        asyncio.run(cache.set_many({"a": b"1"}))
+
+        assert fake.expiries == {"t:a": 60}
+
+    def test_errors_are_misses(self):
+        cache = RedisTileCache(FakeRedis(fail=True))
+        asyncio.run(cache.set_many({"a": b"1"}))
+
+        assert asyncio.run(cache.get_many(["a"])) == {}
+        stats = asyncio.run(cache.stats())
+        assert (stats["misses"], stats["errors"]) == (1, 2)
+
+
+class TestTilesEndpointCaching:
+    """Tests for the cache layer in front of /api/v1/tiles/"""
+
+    def test_second_request_is_served_from_cache(self, client):
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        mock_repo = mock_repository()
+        mock_repo.get_tiles_data.return_value = {
+            "abc.1.0.0": encode_dense_tile(np.zeros((2, 2), dtype=np.float32)),
+        }
+        app.dependency_overrides[tilesets.get_repository] = lambda: mock_repo
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            first = client.get("/api/v1/tiles/?d=abc.1.0.0")
+            second = client.get("/api/v1/tiles/?d=abc.1.0.0.default&d=abc.1.0.0")
+
+            assert first.json()["data"]["abc.1.0.0"] == second.json()["data"]["abc.1.0.0"]
+            assert second.json()["data"]["abc.1.0.0.default"]["shape"] == [2, 2]
+            mock_repo.get_tiles_data.assert_called_once_with([parse_tile_id("abc.1.0.0")], None)
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_cache_stores_binary_envelopes(self, client):
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        mock_repo = mock_repository()
+        mock_repo.get_tiles_data.return_value = {"abc.1.0.0": encode_dense_tile(np.ones((2, 2), dtype=np.float32))}
+        app.dependency_overrides[tilesets.get_repository] = lambda: mock_repo
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            client.get("/api/v1/tiles/?d=abc.1.0.0")
+
+            envelope = asyncio.run(cache.get_many(["abc.1.0.0.default"]))["abc.1.0.0.default"]
+            assert envelope.startswith(ENVELOPE_MAGIC)
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_unreadable_cache_entries_are_regenerated(self, client):
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        asyncio.run(cache.set_many({"abc.1.0.0.default": b"not an envelope"}))
+        mock_repo = mock_repository()
+        mock_repo.get_tiles_data.return_value = {"abc.1.0.0": encode_dense_tile(np.ones((2, 2), dtype=np.float32))}
+        app.dependency_overrides[tilesets.get_repository] = lambda: mock_repo
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            response = client.get("/api/v1/tiles/?d=abc.1.0.0")
+
+            assert response.json()["data"]["abc.1.0.0"]["max_value"] == 1.0
+            mock_repo.get_tiles_data.assert_called_once_with([parse_tile_id("abc.1.0.0")], None)
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_errors_are_not_cached(self, client):
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        mock_repo = mock_repository()
+        mock_repo.get_tiles_data.return_value = {"abc.1.0.0": ErrorModel(error="boom")}
+        app.dependency_overrides[tilesets.get_repository] = lambda: mock_repo
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            client.get("/api/v1/tiles/?d=abc.1.0.0")
+            client.get("/api/v1/tiles/?d=abc.1.0.0")
+
+            assert mock_repo.get_tiles_data.call_count == 2
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_rewritten_datafiles_are_not_served_from_cache(self, client):
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        mock_repo = mock_repository()
+        mock_repo.get_datafile_versions.side_effect = [{"abc": "v1"}, {"abc": "v1"}, {"abc": "v2"}]
+        mock_repo.get_tiles_data.side_effect = lambda tile_ids, options: {
+            tile_id.raw: encode_dense_tile(np.full((2, 2), int(tile_id.version[1:]), dtype=np.float32))
+            for tile_id in tile_ids
+        }
+        app.dependency_overrides[tilesets.get_repository] = lambda: mock_repo
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            values = [
+                client.get("/api/v1/tiles/?d=abc.1.0.0").json()["data"]["abc.1.0.0"]["max_value"] for _ in range(3)
+            ]
+
+            assert values == [1.0, 1.0, 2.0]
+            assert mock_repo.get_tiles_data.call_count == 2
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_post_caches_tiles_per_options(self, client):
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        mock_repo = mock_repository()
+        mock_repo.get_tiles_data.side_effect = lambda tile_ids, options: {
+            tile_id.raw: encode_dense_tile(np.full((2, 2), len(options or {}), dtype=np.float32))
+            for tile_id in tile_ids
+        }
+        app.dependency_overrides[tilesets.get_repository] = lambda: mock_repo
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            mean = {"aggGroups": [[0, 1], 2], "aggFunc": "mean"}
+            total = {"aggGroups": [[0, 1], 2], "aggFunc": "sum"}
+            for options in [mean, {"aggFunc": "mean", "aggGroups": [[0, 1], 2]}, total, None]:
+                response = client.post(
+                    "/api/v1/tiles/", json=[{"tilesetUid": "abc", "tileIds": ["1.0.0", "1.0.0"], "options": options}]
+                )
+                assert response.status_code == 200
+                assert list(response.json()["data"]) == ["abc.1.0.0"]
+
+            assert [
+                ([tile_id.raw for tile_id in call.args[0]], *call.args[1:])
+                for call in mock_repo.get_tiles_data.call_args_list
+            ] == [
+                (["abc.1.0.0"], mean),
+                (["abc.1.0.0"], total),
+                (["abc.1.0.0"], None),
+            ]
+            assert client.get("/api/v1/tiles/?d=abc.1.0.0").json()["data"]["abc.1.0.0"]["max_value"] == 0.0
+            assert mock_repo.get_tiles_data.call_count == 3
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_post_ignores_options_of_tilesets_without_them(self, client):
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        mock_repo = mock_repository()
+        mock_repo.get_tile_options.side_effect = None
+        mock_repo.get_tile_options.return_value = None
+        mock_repo.get_tiles_data.return_value = {"abc.1.0.0": encode_dense_tile(np.ones((2, 2), dtype=np.float32))}
+        app.dependency_overrides[tilesets.get_repository] = lambda: mock_repo
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            options = {"aggGroups": [0], "aggFunc": "sum"}
+            client.post("/api/v1/tiles/", json=[{"tilesetUid": "abc", "tileIds": ["1.0.0"], "options": options}])
+            client.get("/api/v1/tiles/?d=abc.1.0.0")
+
+            mock_repo.get_tile_options.assert_called_once_with("abc", options)
+            mock_repo.get_tiles_data.assert_called_once_with([parse_tile_id("abc.1.0.0")], None)
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_post_validates_the_body(self, client):
+        assert client.post("/api/v1/tiles/", json=[]).status_code == 422
+        assert client.post("/api/v1/tiles/", json=[{"tileIds": ["1.0.0"]}]).status_code == 422
+        assert client.post("/api/v1/tiles/", json=[{"tilesetUid": "abc", "tileIds": []}]).status_code == 422
+        assert (
+            client.post("/api/v1/tiles/", json=[{"tilesetUid": "abc", "tileIds": ["1.0"], "options": 3}]).status_code
+            == 422
+        )
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {"aggregationMethod": "mean"},
+            {"aggFunc": "mode"},
+            {"aggGroups": [[0, "1"]], "aggFunc": "sum"},
+            {"aggGroups": [True], "aggFunc": "sum"},
+            {"aggGroups": 3},
+            {"aggFunc": "sum"},
+            {"aggGroups": [[0, 1]]},
+            {},
+        ],
+    )
+    def test_post_validates_the_options(self, client, options):
+        response = client.post("/api/v1/tiles/", json=[{"tilesetUid": "abc", "tileIds": ["1.0"], "options": options}])
+
+        assert response.status_code == 422
+
+    def test_metrics_expose_cache_counters(self, client):
+        cache = LRUTileCache(max_bytes=1024)
+        app.dependency_overrides[get_tile_cache] = lambda: cache
+
+        try:
+            response = client.get("/api/v1/metrics/")
+
+            assert response.status_code == 200
+            data = response.json()
+            assert data["tile_cache"]["backend"] == "lru"
+            assert {"hits", "misses", "evictions"} <= data["tile_cache"].keys()
+            assert "opens" in data["hdf5_handles"]
+        finally:
+            app.dependency_overrides.clear()
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent computations of the same keys"""
+
+    def test_concurrent_callers_share_one_computation(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def compute(keys):
+            calls.append(keys)
+            await asyncio.sleep(0.01)
+            return {key: key.upper() for key in keys}
+
+        async def run():
+            return await asyncio.gather(flights.do_many(["a", "b"], compute), flights.do_many(["b", "c"], compute))
+
+        first, second = asyncio.run(run())
+
+        assert first == {"a": "A", "b": "B"}
+        assert second == {"b": "B", "c": "C"}
+        assert calls == [["a", "b"], ["c"]]
+        assert flights.stats() == {"in_flight": 0, "computed": 3, "coalesced": 1}
+
+    def test_errors_reach_every_waiter(self):
+        flights = SingleFlight()
+
+        async def compute(keys):
+            await asyncio.sleep(0.01)
+            raise OSError("unreadable file")
+
+        async def run():
+            return await asyncio.gather(
+                flights.do_many(["a"], compute), flights.do_many(["a"], compute), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+
+        assert [type(r) for r in results] == [OSError, OSError]
+        assert flights.stats()["in_flight"] == 0
+
+    def test_waiters_take_over_when_the_leader_is_cancelled(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def compute(keys):
+            calls.append(keys)
+            await asyncio.sleep(0.05)
+            return {key: key.upper() for key in keys}
+
+        async def run():
+            leader = asyncio.create_task(flights.do_many(["a"], compute))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flights.do_many(["a"], compute))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(run()) == {"a": "A"}
+        assert calls == [["a"], ["a"]]
+
+
+class TestTilesRequestCoalescing:
+    """Tests for single-flight tile generation in the tiles path"""
+
+    def test_concurrent_requests_generate_a_tile_once(self):
+        calls = []
+
+        class SlowRepository:
+            async def get_datafile_versions(self, uuids):
+                return {}
+
+            async def get_tiles_data(self, tile_ids, options=None):
+                calls.append([tile_id.raw for tile_id in tile_ids])
+                await asyncio.sleep(0.01)
+                return {tile_id.raw: encode_dense_tile(np.ones((2, 2), dtype=np.float32)) for tile_id in tile_ids}
+
+        repo = SlowRepository()
+        cache = LRUTileCache(max_bytes=1024 * 1024)
+        flights = SingleFlight()
+
+        async def run():
+            return await asyncio.gather(
+                *(tilesets.fetch_tiles(["abc.1.0.0"], repo, cache, flights) for _ in range(5)),
+                tilesets.fetch_tiles(["abc.1.0.0.default", "abc.1.0.1"], repo, cache, flights),
+            )
+
+        results = asyncio.run(run())
+
+        assert calls == [["abc.1.0.0"], ["abc.1.0.1"]]
+        assert all(result["abc.1.0.0"].max_value == 1.0 for result in results[:5])
+        assert results[5].keys() == {"abc.1.0.0.default", "abc.1.0.1"}
+        assert flights.stats()["coalesced"] == 5
@@ -0,0 +1,965 @@
+import asyncio
+import base64
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import cooler
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import ErrorModel, TilesetInfoCooler, TilesetPublic
+from app.services import tileset_repository
+from app.services.cooler_tiles import BINS_PER_TILE, CoolerTileEngine
+from app.services.hdf5_pool import HDF5HandlePool, file_signature
+from app.services.sqlite_repository import SqliteTilesetRepository
+from app.services.tile_cache import LRUTileCache
+from app.services.tile_encoding import EncodedTile, encode_dense_tile, render_tiles_json
+from app.services.tile_executor import TileExecutor
+from app.services.tileset_catalog import TilesetCatalog
+from app.services.tileset_info_cache import TilesetInfoCache
+from app.services.tile_ids import parse_tile_id
+from app.services.tile_partition import (
+    bin_tiles_by_zoom_level_and_transform,
+    group_adjacent_tiles,
+    partition_by_adjacent_tiles,
+)
+from app.services.zoom_index import ZoomIndex
+
+RESOLUTIONS = [10, 20, 40, 80]
+
+
+@pytest.fixture(scope="module")
+def mcool_path(tmp_path_factory):
+    """A small two-chromosome mcool with a known contact pattern"""
+    tmp_dir = tmp_path_factory.mktemp("mcool")
+    base_uri = str(tmp_dir / "test.cool")
+    mcool_uri = str(tmp_dir / "test.mcool")
+
+    chromsizes = pd.Series({"chr1": 5000, "chr2": 3000})
+    bins = cooler.binnify(chromsizes, RESOLUTIONS[0])
+    n_bins = len(bins)
+    # One contact on the diagonal of every bin, plus a contact between bin i and i + 1
+    bin1 = np.concatenate([np.arange(n_bins), np.arange(n_bins - 1)])
+    bin2 = np.concatenate([np.arange(n_bins), np.arange(1, n_bins)])
+    pixels = pd.DataFrame({"bin1_id": bin1, "bin2_id": bin2, "count": 1}).sort_values(["bin1_id", "bin2_id"])
+    cooler.create_cooler(base_uri, bins, pixels)
+    cooler.zoomify_cooler(base_uri, mcool_uri, RESOLUTIONS, chunksize=10_000)
+    return mcool_uri
+
+
+@pytest.fixture
+def client():
+    """Test client fixture"""
+    return TestClient(app)
+
+
+@pytest.fixture
+def cooler_tileset(mcool_path, monkeypatch):
+    """Register a datafile-backed cooler tileset in the stub repository"""
+    tileset = TilesetPublic(
+        uuid="test_mcool",
+        filetype="cooler",
+        datatype="matrix",
+        name="Test mcool",
+        coordSystem="test",
+        datafile=mcool_path,
+    )
+    monkeypatch.setitem(tileset_repository.stub_tilesets_db, tileset.uuid, tileset)
+    return tileset
+
+
+class TestHDF5HandlePool:
+    """Tests for the bounded HDF5 handle pool"""
+
+    def test_reuses_open_handle(self, mcool_path):
+        pool = HDF5HandlePool(max_open=2)
+        with pool.lease(mcool_path) as first:
+            pass
+        with pool.lease(mcool_path) as second:
+            assert second is first
+            assert second.file.id.valid
+
+        assert pool.stats()["opens"] == 1
+        assert pool.stats()["hits"] == 1
+
+    def test_evicts_least_recently_used(self, mcool_path, tmp_path):
+        other_path = str(tmp_path / "other.h5")
+        with h5py.File(other_path, "w") as f:
+            f.attrs["bin-size"] = 1
+
+        pool = HDF5HandlePool(max_open=1)
+        with pool.lease(mcool_path) as first:
+            pass
+        with pool.lease(other_path):
+            pass
+
+        assert not first.file.id.valid
+        assert pool.stats()["evictions"] == 1
+        assert pool.stats()["open"] == 1
+
+    def test_evicted_handle_stays_open_while_leased(self, mcool_path, tmp_path):
+        other_path = str(tmp_path / "other.h5")
+        with h5py.File(other_path, "w") as f:
+            f.attrs["bin-size"] = 1
+
+        pool = HDF5HandlePool(max_open=1)
+        with pool.lease(mcool_path) as first:
+            with pool.lease(other_path):
+                pass
+            assert first.file.id.valid
+        assert not first.file.id.valid
+
+    def test_revalidate_reopens_replaced_files(self, tmp_path):
+        path = str(tmp_path / "data.h5")
+        replacement = str(tmp_path / "replacement.h5")
+        for name, version in [(path, 1), (replacement, 2)]:
+            with h5py.File(name, "w") as f:
+                f.attrs["version"] = version
+
+        pool = HDF5HandlePool()
+        with pool.lease(path) as first:
+            pass
+        pool.revalidate(path, file_signature(path))
+        with pool.lease(path) as handle:
+            assert handle is first
+
+        os.replace(replacement, path)
+        pool.revalidate(path, file_signature(path))
+        with pool.lease(path) as handle:
+            assert handle.file.attrs["version"] == 2
+
+        assert not first.file.id.valid
+        assert pool.stats()["revalidations"] == 1
+
+
+class TestCoolerTileEngine:
+    """Tests for reading tiles and tileset info from an mcool"""
+
+    def test_tileset_info(self, mcool_path):
+        info = CoolerTileEngine().tileset_info(mcool_path)
+
+        assert info.resolutions == sorted(RESOLUTIONS, reverse=True)
+        assert info.max_zoom == len(RESOLUTIONS) - 1
+        assert info.max_pos == [8000, 8000]
+        assert info.chromsizes == [["chr1", 5000], ["chr2", 3000]]
+
+    def test_read_tile_finest_resolution(self, mcool_path):
+        tile = CoolerTileEngine().read_tile(mcool_path, len(RESOLUTIONS) - 1, 0, 0)
+
+        assert tile.shape == (BINS_PER_TILE, BINS_PER_TILE)
+        assert tile[0, 0] == 1
+        # Rows follow y: the contact between bins 0 and 1 is at [1, 0], and is not mirrored
+        assert tile[1, 0] == 1
+        assert tile[0, 1] == 0
+        assert tile[2, 0] == 0
+
+    def test_read_tile_past_end_of_genome_is_zero_filled(self, mcool_path):
+        # 800 bins at the finest resolution: tile 3 holds bins 768-799 and then padding
+        tile = CoolerTileEngine().read_tile(mcool_path, len(RESOLUTIONS) - 1, 3, 3)
+
+        assert tile[31, 31] == 1
+        assert not tile[32:, :].any()
+
+    def test_read_tile_invalid_zoom(self, mcool_path):
+        with pytest.raises(ValueError):
+            CoolerTileEngine().read_tile(mcool_path, len(RESOLUTIONS), 0, 0)
+
+    def test_mcool_without_resolutions(self, tmp_path):
+        path = str(tmp_path / "empty.mcool")
+        with h5py.File(path, "w") as f:
+            f.create_group("resolutions")
+        engine = CoolerTileEngine()
+
+        with pytest.raises(ValueError, match="no resolutions in"):
+            engine.tileset_info(path)
+        with pytest.raises(ValueError, match="no resolutions in"):
+            engine.read_tile(path, 0, 0, 0)
+
+    def test_reads_share_one_file_handle(self, mcool_path):
+        engine = CoolerTileEngine(HDF5HandlePool())
+        for x in range(3):
+            engine.read_tile(mcool_path, len(RESOLUTIONS) - 1, x, x)
+
+        assert engine.pool.stats()["opens"] == 1
+
+
+UNEVEN_CHROMSIZES = {"chr1": 995, "chr2": 1333, "chr3": 787}
+PAST_END = list(range(55, BINS_PER_TILE))  # the genome ends at 3115 bp, offset 55.5 of tile 1
+# clodius 0.22.2 `make_tiles` output for `uneven_mcool_path`: nonzero values, NaN rows and NaN columns
+CLODIUS_TILES = {
+    ("default", 0, 0): (
+        {(0, 0): 1.0, (1, 0): 2.0, (99, 5): 4.0, (99, 99): 6.0, (100, 3): 3.0, (238, 149): 14.0},
+        [7, 199],
+        [7, 199],
+    ),
+    ("default", 0, 1): ({(42, 238): 16.0}, PAST_END, [7, 199]),
+    ("default", 1, 0): ({}, [7, 199], PAST_END),
+    ("default", 1, 1): ({(54, 2): 9.0, (54, 54): 10.0}, PAST_END, PAST_END),
+    ("none", 0, 0): ({(0, 0): 1.0, (1, 0): 2.0, (99, 5): 4.0, (99, 99): 6.0, (100, 3): 3.0, (238, 149): 7.0}, [], []),
+    ("none", 0, 1): ({(42, 238): 8.0}, [], []),
+    ("none", 1, 0): ({}, [], []),
+    ("none", 1, 1): ({(54, 2): 9.0, (54, 54): 10.0}, [], []),
+}
+
+
+@pytest.fixture(scope="module")
+def uneven_mcool_path(tmp_path_factory):
+    """A balanced three-chromosome mcool whose chromosome lengths are not multiples of its 10 bp bins"""
+    path = str(tmp_path_factory.mktemp("uneven") / "uneven.mcool")
+    with h5py.File(path, "w"):
+        pass
+    bins = cooler.binnify(pd.Series(UNEVEN_CHROMSIZES), 10)
+    weight = np.ones(len(bins))
+    weight[[7, 200]] = np.nan
+    weight[240] = 2.0
+    bins["weight"] = weight
+    # Bins 99 | 100 and 233 | 234 straddle chromosome boundaries; bin 312 is the last, 7 bp long
+    pairs = [(0, 0), (0, 1), (3, 101), (5, 99), (99, 100), (100, 100), (150, 240), (240, 300), (260, 312), (312, 312)]
+    pixels = pd.DataFrame(pairs, columns=["bin1_id", "bin2_id"])
+    pixels["count"] = np.arange(1, len(pairs) + 1)
+    cooler.create_cooler(f"{path}::resolutions/10", bins, pixels)
+    return path
+
+
+class TestCoolerTilesMatchClodius:
+    """Tests that cooler tiles match clodius' on a genome whose chromosomes end in partial bins"""
+
+    @pytest.mark.parametrize("transform, x, y", sorted(CLODIUS_TILES))
+    def test_tile_matches_clodius(self, uneven_mcool_path, transform, x, y):
+        values, nan_rows, nan_cols = CLODIUS_TILES[(transform, x, y)]
+        expected = np.zeros((BINS_PER_TILE, BINS_PER_TILE), dtype=np.float32)
+        for (i, j), value in values.items():
+            expected[i, j] = value
+        expected[nan_rows, :] = np.nan
+        expected[:, nan_cols] = np.nan
+
+        tile = CoolerTileEngine().read_tile(uneven_mcool_path, 0, x, y, transform)
+
+        np.testing.assert_array_equal(tile, expected)
+
+    def test_batched_reads_match_single_reads(self, uneven_mcool_path):
+        engine = CoolerTileEngine()
+        positions = [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+        tiles = engine.read_tiles(uneven_mcool_path, 0, positions)
+
+        for x, y in positions:
+            np.testing.assert_array_equal(tiles[(x, y)], engine.read_tile(uneven_mcool_path, 0, x, y))
+
+
+def parse_tile_ids(tile_ids):
+    return [parse_tile_id(tile_id) for tile_id in tile_ids]
+
+
+def raw_ids(group):
+    return [tile_id.raw for tile_id in group.tile_ids]
+
+
+class TestTileId:
+    """Tests for parsing tile IDs once into TileIds"""
+
+    def test_parse_2d_tile_id(self):
+        tile_id = parse_tile_id("abc.3.1.2.KR", "d41d8cd9")
+
+        assert (tile_id.uuid, tile_id.zoom, tile_id.x, tile_id.y, tile_id.transform) == ("abc", 3, 1, 2, "KR")
+        assert tile_id.position == (1, 2) and tile_id.dimension == 2
+        assert tile_id.cache_key == "abc.3.1.2.KR:d41d8cd9"
+
+    def test_parse_1d_tile_id(self):
+        tile_id = parse_tile_id("abc.3.7")
+
+        assert tile_id.position == (7,) and tile_id.dimension == 1
+        assert tile_id.transform == "default"
+        assert tile_id.cache_key == "abc.3.7"
+
+    @pytest.mark.parametrize(
+        "tile_id", ["abc.1", "abc.one.2", ".1.2", "abc.1.2.x", "abc.1.2.3.", "abc.1.2.3.KR.x", "abc.1.²"]
+    )
+    def test_invalid_tile_ids(self, tile_id):
+        assert parse_tile_id(tile_id) is None
+
+    def test_client_strings_are_not_interned(self):
+        uuid = "".join(["made_up", "_uuid"])
+
+        tile_id = parse_tile_id(f"{uuid}.1.0.0.{uuid}")
+
+        # Interned strings are immortal on Python 3.12, with a refcount in the billions
+        assert sys.getrefcount(tile_id.uuid) < 100
+        assert sys.getrefcount(tile_id.transform) < 100
+
+    def test_repository_accepts_string_and_parsed_ids(self):
+        repo = tileset_repository.StubTilesetRepository()
+
+        from_strings = asyncio.run(repo.get_tiles_data(["stub_cooler_1.1.0.0", "stub_cooler_1.1"]))
+        parsed = asyncio.run(repo.get_tiles_data([parse_tile_id("stub_cooler_1.1.0.0")]))
+
+        assert from_strings["stub_cooler_1.1.0.0"].shape == parsed["stub_cooler_1.1.0.0"].shape
+        assert "Invalid tile ID format" in from_strings["stub_cooler_1.1"].error
+
+
+class TestBatchedTileReads:
+    """Tests for grouping adjacent tiles and reading each group with one query"""
+
+    def test_partition_by_adjacent_tiles_rejects_invalid_ids(self):
+        with pytest.raises(ValueError, match="a.3.x.0"):
+            partition_by_adjacent_tiles(["a.3.0.0", "a.3.x.0"])
+
+    def test_partition_by_adjacent_tiles(self):
+        tile_ids = ["a.3.0.0", "a.3.1.1", "a.3.0.1", "a.3.5.5", "a.3.6.5"]
+
+        groups = partition_by_adjacent_tiles(tile_ids)
+
+        assert sorted(sorted(g) for g in groups) == [["a.3.0.0", "a.3.0.1", "a.3.1.1"], ["a.3.5.5", "a.3.6.5"]]
+
+    def test_group_adjacent_tiles_bounding_boxes(self):
+        tile_ids = ["a.3.5.5", "a.3.0.1", "a.3.6.5", "a.3.1.1", "a.3.0.0"]
+
+        groups = group_adjacent_tiles(parse_tile_ids(tile_ids))
+
+        assert [raw_ids(group) for group in groups] == [["a.3.0.0", "a.3.0.1", "a.3.1.1"], ["a.3.5.5", "a.3.6.5"]]
+        assert groups[0].positions == [(0, 0), (0, 1), (1, 1)]
+        assert (groups[0].min_position, groups[0].max_position) == ((0, 0), (1, 1))
+        assert (groups[1].min_position, groups[1].max_position) == ((5, 5), (6, 5))
+
+    def test_group_adjacent_tiles_merges_chains(self):
+        # (0, 2) is only connected to (0, 0) through (1, 1), which sorts after it
+        groups = group_adjacent_tiles(parse_tile_ids(["a.1.0.0", "a.1.0.2", "a.1.1.1", "a.1.0.4"]))
+
+        assert [raw_ids(group) for group in groups] == [["a.1.0.0", "a.1.0.2", "a.1.1.1"], ["a.1.0.4"]]
+
+    def test_group_adjacent_tiles_1d(self):
+        groups = group_adjacent_tiles(parse_tile_ids(["m.2.3", "m.2.0", "m.2.1", "m.2.12", "m.2.4"]), dimension=1)
+
+        assert [(group.min_position, group.max_position) for group in groups] == [
+            ((0,), (1,)),
+            ((3,), (4,)),
+            ((12,), (12,)),
+        ]
+
+    def test_group_adjacent_tiles_matches_pairwise_adjacency(self):
+        rng = np.random.default_rng(0)
+        positions = {tuple(p) for p in rng.integers(0, 12, size=(60, 2)).tolist()}
+        tile_ids = [f"a.4.{x}.{y}" for x, y in positions]
+
+        groups = group_adjacent_tiles(parse_tile_ids(tile_ids))
+
+        group_of = {tile_id: g for g, group in enumerate(groups) for tile_id in raw_ids(group)}
+        assert sorted(group_of) == sorted(tile_ids)
+        for group in groups:
+            # Each group is connected, and no tile outside it is adjacent to one inside
+            reached = {group.positions[0]}
+            frontier = [group.positions[0]]
+            while frontier:
+                x, y = frontier.pop()
+                for p in group.positions:
+                    if p not in reached and abs(p[0] - x) <= 1 and abs(p[1] - y) <= 1:
+                        reached.add(p)
+                        frontier.append(p)
+            assert reached == set(group.positions)
+        for a in positions:
+            for b in positions:
+                if abs(a[0] - b[0]) <= 1 and abs(a[1] - b[1]) <= 1:
+                    assert group_of[f"a.4.{a[0]}.{a[1]}"] == group_of[f"a.4.{b[0]}.{b[1]}"]
+
+    def test_bin_tiles_by_zoom_level_and_transform(self):
+        binned = bin_tiles_by_zoom_level_and_transform(parse_tile_ids(["a.1.0.0", "a.1.0.1.KR", "a.2.0.0"]))
+
+        assert {key: {tile_id.raw for tile_id in tile_ids} for key, tile_ids in binned.items()} == {
+            (1, "default"): {"a.1.0.0"},
+            (1, "KR"): {"a.1.0.1.KR"},
+            (2, "default"): {"a.2.0.0"},
+        }
+
+    def test_read_tiles_matches_single_reads(self, mcool_path):
+        engine = CoolerTileEngine()
+        zoom = len(RESOLUTIONS) - 1
+        positions = [(0, 0), (0, 1), (1, 1), (2, 3)]
+
+        tiles = engine.read_tiles(mcool_path, zoom, positions)
+
+        for x, y in positions:
+            np.testing.assert_array_equal(tiles[(x, y)], engine.read_tile(mcool_path, zoom, x, y))
+
+    def test_read_tiles_issues_one_query_per_group(self, mcool_path, mocker):
+        engine = CoolerTileEngine()
+        zoom = len(RESOLUTIONS) - 1
+        engine.read_tile(mcool_path, zoom, 0, 0)  # warm the handle and the cached Cooler objects
+        spy = mocker.spy(cooler.Cooler, "matrix")
+
+        engine.read_tiles(mcool_path, zoom, [(0, 0), (0, 1), (1, 0), (1, 1)])
+
+        assert spy.call_count == 1
+
+
+class TestZoomIndex:
+    """Tests for the zoom level -> resolution lookup table"""
+
+    def test_levels_from_tileset_info(self, mcool_path):
+        index = ZoomIndex.from_tileset_info(CoolerTileEngine().tileset_info(mcool_path))
+
+        assert index.max_zoom == len(RESOLUTIONS) - 1
+        finest = index.level(index.max_zoom)
+        assert finest.resolution == 10
+        assert finest.tile_span == 10 * BINS_PER_TILE
+        # 500 + 300 bins at 10bp, so tiles 0..3
+        assert finest.max_tile_index == 3
+        assert index.level(0).resolution == 80
+        assert index.level(0).max_tile_index == 0
+
+    def test_tiles_span_genome_positions(self):
+        index = ZoomIndex.from_resolutions([100], [110, 110, 110, 110], bins_per_tile=2)
+
+        # Tiles cover 200 bp each of the 440 bp genome, however many partial bins its chromosomes end in
+        assert index.level(0).max_tile_index == 2
+
+    def test_check_tile(self):
+        index = ZoomIndex.from_resolutions([100, 10], [1000], bins_per_tile=4)
+
+        assert index.check_tile(1, 24, 0) is None
+        assert "out of range" in index.check_tile(1, 25, 0)
+        assert "out of range" in index.check_tile(0, -1, 0)
+        assert "Zoom level 2" in index.check_tile(2, 0, 0)
+        with pytest.raises(ValueError):
+            index.level(2)
+
+    def test_register_tileset_builds_index(self, mcool_path, monkeypatch):
+        monkeypatch.setattr(tileset_repository, "stub_tilesets_db", TilesetCatalog())
+        repo = tileset_repository.StubTilesetRepository()
+        other = tileset_repository.StubTilesetRepository()
+        tileset = TilesetPublic(uuid="registered", filetype="cooler", datatype="matrix", datafile=mcool_path)
+
+        asyncio.run(repo.register_tileset(tileset))
+
+        assert repo._zoom_indexes["registered"].max_zoom == len(RESOLUTIONS) - 1
+        assert other._zoom_indexes == {}
+
+    def test_sqlite_repository_serves_registered_tilesets(self, mcool_path, tmp_path):
+        repo = SqliteTilesetRepository(str(tmp_path / "tilesets.db"), info_cache=TilesetInfoCache())
+        tileset = TilesetPublic(uuid="in_sqlite", filetype="cooler", datatype="matrix", datafile=mcool_path)
+        expected = CoolerTileEngine().read_tile(mcool_path, 3, 0, 0)
+
+        try:
+            asyncio.run(repo.register_tileset(tileset))
+            data = asyncio.run(repo.get_tiles_data(["in_sqlite.3.0.0", "in_sqlite.9.0.0"]))
+
+            assert isinstance(data["in_sqlite.9.0.0"], ErrorModel)
+            assert data["in_sqlite.3.0.0"].to_json() == encode_dense_tile(expected).to_json()
+        finally:
+            asyncio.run(repo.close())
+
+    def test_out_of_range_tiles_do_not_open_the_file(self, cooler_tileset, mocker):
+        repo = tileset_repository.StubTilesetRepository()
+        asyncio.run(repo.get_tileset_info(cooler_tileset.uuid))
+        lease = mocker.spy(repo._cooler_engine.pool, "lease")
+        tile_ids = [f"{cooler_tileset.uuid}.3.4.0", f"{cooler_tileset.uuid}.9.0.0", f"{cooler_tileset.uuid}.0.0.1"]
+
+        data = asyncio.run(repo.get_tiles_data(tile_ids))
+
+        assert all(isinstance(data[tile_id], ErrorModel) for tile_id in tile_ids)
+        lease.assert_not_called()
+
+
+class TestTilesetInfoCache:
+    """Tests for memoized tileset infos of datafile-backed tilesets"""
+
+    def test_computes_once_per_file_version(self, tmp_path):
+        path = tmp_path / "data.mcool"
+        path.write_bytes(b"v1")
+        cache = TilesetInfoCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return TilesetInfoCooler(min_pos=[0], max_pos=[len(calls)], max_zoom=0)
+
+        first = asyncio.run(cache.get_or_compute("a", str(path), compute))
+        second = asyncio.run(cache.get_or_compute("a", str(path), compute))
+        assert first is second
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        invalidated = []
+        third = asyncio.run(cache.get_or_compute("a", str(path), compute, lambda: invalidated.append(1)))
+
+        assert third.max_pos == [2]
+        assert invalidated == [1]
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
+        assert stats["hit_rate"] == pytest.approx(1 / 3)
+        assert stats["compute_seconds_total"] >= stats["compute_seconds_max"] > 0
+
+    def test_missing_file_raises(self, tmp_path):
+        cache = TilesetInfoCache()
+
+        async def compute():
+            raise AssertionError("should not be called")
+
+        with pytest.raises(OSError):
+            asyncio.run(cache.get_or_compute("a", str(tmp_path / "missing.mcool"), compute))
+
+    def test_repository_reads_the_file_once(self, cooler_tileset):
+        executor = TileExecutor(max_workers=1)
+        cache = TilesetInfoCache()
+        repo = tileset_repository.StubTilesetRepository(executor=executor, info_cache=cache)
+
+        try:
+            infos = [asyncio.run(repo.get_tileset_infos([cooler_tileset.uuid])) for _ in range(3)]
+
+            assert all(info[cooler_tileset.uuid].name == "Test mcool" for info in infos)
+            assert executor.stats()["completed"] == 1
+            assert cache.stats()["hits"] == 2
+        finally:
+            executor.shutdown()
+
+    def test_warmup_opens_at_most_the_pool_size(self, mcool_path, tmp_path, monkeypatch):
+        monkeypatch.setattr(tileset_repository, "stub_tilesets_db", TilesetCatalog())
+        cache = TilesetInfoCache()
+        engine = CoolerTileEngine(HDF5HandlePool(max_open=2))
+        repo = tileset_repository.StubTilesetRepository(cooler_engine=engine, info_cache=cache)
+        for i in range(3):
+            path = shutil.copy(mcool_path, tmp_path / f"{i}.mcool")
+            tileset_repository.stub_tilesets_db[f"warm{i}"] = TilesetPublic(
+                uuid=f"warm{i}", filetype="cooler", datatype="matrix", datafile=str(path)
+            )
+
+        try:
+            asyncio.run(repo.warmup(10))
+
+            assert cache.stats()["misses"] == 2
+            assert engine.pool.stats()["evictions"] == 0
+        finally:
+            asyncio.run(repo.close())
+
+
+class TestConcurrentTilesetInfos:
+    """Tests for resolving many tileset infos in one request"""
+
+    def test_slow_and_failing_infos_do_not_block_the_rest(self):
+        repo = tileset_repository.StubTilesetRepository(info_timeout_seconds=0.05)
+
+        async def lookup(uid):
+            if uid == "slow":
+                await asyncio.sleep(1)
+            if uid == "broken":
+                raise OSError("truncated file")
+            return TilesetInfoCooler(name=uid, min_pos=[0], max_pos=[1], max_zoom=0)
+
+        repo._lookup_tileset_info = lookup
+        start = time.monotonic()
+        infos = asyncio.run(repo.get_tileset_infos(["a", "slow", "broken", "b", "a"]))
+
+        assert time.monotonic() - start < 0.5
+        assert list(infos) == ["a", "slow", "broken", "b"]
+        assert infos["a"].name == "a" and infos["b"].name == "b"
+        assert "Timed out" in infos["slow"].error
+        assert "truncated file" in infos["broken"].error
+
+    def test_bounded_parallelism(self):
+        repo = tileset_repository.StubTilesetRepository(info_concurrency=3)
+        running = 0
+        peak = 0
+
+        async def lookup(uid):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return TilesetInfoCooler(name=uid, min_pos=[0], max_pos=[1], max_zoom=0)
+
+        repo._lookup_tileset_info = lookup
+        infos = asyncio.run(repo.get_tileset_infos([f"t{i}" for i in range(10)]))
+
+        assert len(infos) == 10
+        assert peak == 3
+
+
+class TestMalformedDatafiles:
+    """Tests that one malformed datafile only errors its own tileset"""
+
+    @pytest.fixture
+    def broken_tileset(self, tmp_path, monkeypatch):
+        path = tmp_path / "broken.mcool"
+        with h5py.File(path, "w") as f:
+            f["resolutions"] = np.arange(3)
+        tileset = TilesetPublic(
+            uuid="broken_mcool", filetype="cooler", datatype="matrix", coordSystem="test", datafile=str(path)
+        )
+        monkeypatch.setitem(tileset_repository.stub_tilesets_db, tileset.uuid, tileset)
+        return tileset
+
+    def test_tileset_info(self, client, cooler_tileset, broken_tileset):
+        response = client.get("/api/v1/tileset_info/", params={"d": [broken_tileset.uuid, cooler_tileset.uuid]})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert "Unable to read tileset info for broken_mcool" in data[broken_tileset.uuid]["error"]
+        assert data[cooler_tileset.uuid]["name"] == "Test mcool"
+
+    def test_tiles(self, client, cooler_tileset, broken_tileset):
+        tile_ids = [f"{broken_tileset.uuid}.0.0.0", f"{cooler_tileset.uuid}.0.0.0"]
+        response = client.get("/api/v1/tiles/", params={"d": tile_ids})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert "error" in data[tile_ids[0]]
+        assert "dense" in data[tile_ids[1]]
+
+    def test_failing_tile_reads(self, cooler_tileset, mocker):
+        repo = tileset_repository.StubTilesetRepository()
+        mocker.patch.object(repo._cooler_engine, "read_resolution_tiles", side_effect=IndexError("bad index"))
+        tile_id = f"{cooler_tileset.uuid}.0.0.0"
+
+        data = asyncio.run(repo.get_tiles_data([tile_id]))
+
+        assert "bad index" in data[tile_id].error
+
+
+class TestTileEncoding:
+    """Tests for the float16/float32 tile encoding"""
+
+    def test_encodes_float16(self):
+        dense = np.arange(16, dtype=np.float32).reshape(4, 4)
+
+        tile = encode_dense_tile(dense)
+
+        assert tile.dtype == "float16"
+        assert tile.shape == (4, 4)
+        assert (tile.min_value, tile.max_value) == (0.0, 15.0)
+        np.testing.assert_array_equal(np.frombuffer(tile.payload, dtype="<f2"), dense.reshape(-1))
+
+    def test_falls_back_to_float32_for_nan(self):
+        dense = np.array([1.0, np.nan, 3.0], dtype=np.float32)
+
+        tile = encode_dense_tile(dense)
+
+        assert tile.dtype == "float32"
+        assert (tile.min_value, tile.max_value) == (1.0, 3.0)
+        np.testing.assert_array_equal(np.frombuffer(tile.payload, dtype="<f4"), dense)
+
+    def test_falls_back_to_float32_outside_float16_range(self):
+        tile = encode_dense_tile(np.array([0.0, 1e6], dtype=np.float32))
+
+        assert tile.dtype == "float32"
+        assert tile.max_value == 1e6
+
+    def test_all_nan_tile(self):
+        tile = encode_dense_tile(np.full((2, 2), np.nan, dtype=np.float32))
+
+        assert tile.dtype == "float32"
+        assert (tile.min_value, tile.max_value) == (0.0, 0.0)
+
+    def test_empty_tile(self):
+        tile = encode_dense_tile(np.zeros(0, dtype=np.float32))
+
+        assert tile.dtype == "float16"
+        assert tile.to_model().dense == ""
+
+    def test_json_matches_model(self):
+        for dense in (np.arange(6, dtype=np.float32).reshape(2, 3), np.array([1.5, np.nan], dtype=np.float32)):
+            tile = encode_dense_tile(dense)
+
+            assert json.loads(tile.to_json()) == json.loads(tile.to_model().model_dump_json())
+
+    def test_envelope_round_trip(self):
+        tile = encode_dense_tile(np.arange(6, dtype=np.float32).reshape(2, 3))
+        envelope = tile.to_envelope()
+
+        restored = EncodedTile.from_envelope(envelope)
+
+        assert len(envelope) == 32 + 6 * 2
+        assert (restored.dtype, restored.shape) == ("float16", (2, 3))
+        assert (restored.min_value, restored.max_value) == (0.0, 5.0)
+        assert restored.to_json() == tile.to_json()
+
+    def test_envelope_rejects_foreign_values(self):
+        with pytest.raises(ValueError):
+            EncodedTile.from_envelope(b'{"dense": "AAA="}')
+        with pytest.raises(ValueError):
+            EncodedTile.from_envelope(encode_dense_tile(np.zeros(4, dtype=np.float32)).to_envelope()[:-1])
+
+    def test_render_tiles_json(self):
+        tiles = {"a.0.0": encode_dense_tile(np.ones(2, dtype=np.float32)), "b.0.0": ErrorModel(error="nope")}
+
+        body = json.loads(render_tiles_json(tiles))
+
+        assert body["data"]["a.0.0"]["dtype"] == "float16"
+        assert body["data"]["b.0.0"] == {"error": "nope"}
+
+
+class TestTileExecutor:
+    """Tests for running blocking reads on the bounded tile executor"""
+
+    def test_runs_off_the_event_loop_thread(self):
+        executor = TileExecutor(max_workers=2)
+
+        async def run():
+            return await executor.run("a", threading.get_ident)
+
+        try:
+            assert asyncio.run(run()) != threading.get_ident()
+            assert executor.stats()["completed"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_limits_concurrency_per_tileset(self):
+        executor = TileExecutor(max_workers=4, per_tileset_limit=1)
+        lock = threading.Lock()
+        running = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0}
+
+        def read(uuid):
+            with lock:
+                running[uuid] += 1
+                peak[uuid] = max(peak[uuid], running[uuid])
+            time.sleep(0.01)
+            with lock:
+                running[uuid] -= 1
+
+        async def run():
+            await asyncio.gather(*(executor.run(uuid, read, uuid) for uuid in ["a", "a", "a", "b", "b"]))
+
+        try:
+            asyncio.run(run())
+
+            assert peak == {"a": 1, "b": 1}
+            stats = executor.stats()
+            assert (stats["queued"], stats["in_pool"], stats["completed"]) == (0, 0, 5)
+            assert stats["max_queue_depth"] >= 3
+        finally:
+            executor.shutdown()
+
+    def test_errors_are_raised_and_counted(self):
+        executor = TileExecutor(max_workers=1)
+
+        def fail():
+            raise OSError("unreadable file")
+
+        try:
+            with pytest.raises(OSError):
+                asyncio.run(executor.run("a", fail))
+            assert executor.stats()["failed"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_idle_tileset_limits_are_dropped(self):
+        executor = TileExecutor(max_workers=2, per_tileset_limit=1)
+
+        async def run():
+            await asyncio.gather(*(executor.run(f"tileset{i}", time.sleep, 0.001) for i in range(50)))
+            return executor.stats()["tilesets_in_flight"]
+
+        try:
+            assert asyncio.run(run()) == 0
+            assert executor._limits == {}
+        finally:
+            executor.shutdown()
+
+    def test_jobs_refused_by_the_pool_are_not_counted(self):
+        executor = TileExecutor(max_workers=1)
+        executor.shutdown()
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(executor.run("a", int))
+
+        stats = executor.stats()
+        assert (stats["queued"], stats["in_pool"], stats["tilesets_in_flight"]) == (0, 0, 0)
+
+    def test_info_reads_do_not_wait_behind_tile_reads(self):
+        executor = TileExecutor(max_workers=1, per_tileset_limit=1, info_workers=1)
+        release = threading.Event()
+
+        async def run():
+            tile_read = asyncio.ensure_future(executor.run("a", release.wait, 5))
+            queued_tile_read = asyncio.ensure_future(executor.run("a", int))
+            info = await asyncio.wait_for(executor.run("a", threading.current_thread, lane="info"), 1)
+            release.set()
+            await asyncio.gather(tile_read, queued_tile_read)
+            return info.name
+
+        try:
+            assert asyncio.run(run()).startswith("tileset-info")
+        finally:
+            release.set()
+            executor.shutdown()
+
+    def test_event_loop_keeps_running_during_reads(self):
+        executor = TileExecutor(max_workers=1)
+        ticks = []
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        async def run():
+            await asyncio.gather(executor.run("a", time.sleep, 0.1), ticker())
+
+        try:
+            asyncio.run(run())
+
+            assert ticks[-1] - ticks[0] < 0.1
+        finally:
+            executor.shutdown()
+
+    def test_repository_reads_tiles_on_the_executor(self, cooler_tileset):
+        executor = TileExecutor(max_workers=2)
+        repo = tileset_repository.StubTilesetRepository(executor=executor, info_cache=TilesetInfoCache())
+        tile_ids = [f"{cooler_tileset.uuid}.3.0.0", f"{cooler_tileset.uuid}.0.0.0"]
+
+        try:
+            data = asyncio.run(repo.get_tiles_data(tile_ids))
+            asyncio.run(repo.get_tileset_info(cooler_tileset.uuid))
+
+            assert all(isinstance(data[tile_id], EncodedTile) for tile_id in tile_ids)
+            assert executor.stats()["completed"] == 3
+        finally:
+            executor.shutdown()
+
+    def test_process_mode_matches_thread_mode(self, cooler_tileset):
+        thread_repo = tileset_repository.StubTilesetRepository(executor=TileExecutor(max_workers=1))
+        process_executor = TileExecutor(max_workers=1, mode="process")
+        process_repo = tileset_repository.StubTilesetRepository(executor=process_executor)
+        tile_ids = [f"{cooler_tileset.uuid}.3.{x}.{y}" for x in range(2) for y in range(2)]
+
+        try:
+            expected = asyncio.run(thread_repo.get_tiles_data(tile_ids))
+            actual = asyncio.run(process_repo.get_tiles_data(tile_ids))
+            info = asyncio.run(process_repo.get_tileset_info(cooler_tileset.uuid))
+
+            assert {tile_id: tile.to_json() for tile_id, tile in actual.items()} == {
+                tile_id: tile.to_json() for tile_id, tile in expected.items()
+            }
+            assert info is not None and info.name == "Test mcool"
+            assert process_executor.stats()["mode"] == "process"
+        finally:
+            process_executor.shutdown()
+            thread_repo._executor.shutdown()
+
+    def test_process_workers_reopen_rewritten_datafiles(self, mcool_path, tmp_path, monkeypatch):
+        datafile = str(tmp_path / "rewritten.mcool")
+        rewritten = str(tmp_path / "new.mcool")
+        shutil.copy(mcool_path, datafile)
+        shutil.copy(mcool_path, rewritten)
+        with h5py.File(rewritten, "a") as f:
+            counts = f[f"resolutions/{RESOLUTIONS[0]}/pixels/count"]
+            counts[...] = counts[...] * 2
+        tileset = TilesetPublic(uuid="rewritten", filetype="cooler", datatype="matrix", datafile=datafile)
+        monkeypatch.setitem(tileset_repository.stub_tilesets_db, tileset.uuid, tileset)
+        executor = TileExecutor(max_workers=1, mode="process")
+        repo = tileset_repository.StubTilesetRepository(executor=executor, info_cache=TilesetInfoCache())
+        tile_id = "rewritten.3.0.0"
+
+        try:
+            version = asyncio.run(repo.get_datafile_versions([tileset.uuid]))
+            before = asyncio.run(repo.get_tiles_data([tile_id]))[tile_id]
+            os.replace(rewritten, datafile)
+            after = asyncio.run(repo.get_tiles_data([tile_id]))[tile_id]
+
+            assert (before.max_value, after.max_value) == (1.0, 2.0)
+            assert asyncio.run(repo.get_datafile_versions([tileset.uuid, "unknown"])).keys() == {tileset.uuid}
+            assert asyncio.run(repo.get_datafile_versions([tileset.uuid])) != version
+        finally:
+            executor.shutdown()
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            TileExecutor(mode="fiber")
+
+
+class TestTilesEndpoint:
+    """Tests for the /api/v1/tiles/ endpoint backed by cooler files"""
+
+    def test_get_cooler_tile(self, client, cooler_tileset):
+        response = client.get(f"/api/v1/tiles/?d={cooler_tileset.uuid}.3.0.0")
+
+        assert response.status_code == 200
+        tile = response.json()["data"][f"{cooler_tileset.uuid}.3.0.0"]
+        assert tile["dtype"] == "float16"
+        assert tile["shape"] == [BINS_PER_TILE, BINS_PER_TILE]
+        assert tile["max_value"] == 1.0
+        dense = np.frombuffer(base64.b64decode(tile["dense"]), dtype="<f2").reshape(tile["shape"])
+        assert dense[1, 0] == 1.0
+        assert dense[0, 1] == 0.0
+
+    def test_get_adjacent_cooler_tiles(self, client, cooler_tileset):
+        tile_ids = [f"{cooler_tileset.uuid}.3.{x}.{y}" for x in range(2) for y in range(2)]
+        response = client.get("/api/v1/tiles/", params={"d": tile_ids})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert sorted(data) == sorted(tile_ids)
+        assert data[f"{cooler_tileset.uuid}.3.1.1"]["max_value"] == 1.0
+        assert data[f"{cooler_tileset.uuid}.3.0.1"]["max_value"] == 1.0  # bin 255 contacts bin 256
+
+    def test_post_matches_get(self, client, cooler_tileset):
+        tile_ids = [f"{cooler_tileset.uuid}.3.0.0", f"{cooler_tileset.uuid}.3.0.1"]
+        expected = client.get("/api/v1/tiles/", params={"d": tile_ids}).json()
+
+        response = client.post(
+            "/api/v1/tiles/", json=[{"tilesetUid": cooler_tileset.uuid, "tileIds": ["3.0.0", "3.0.1"]}]
+        )
+
+        assert response.status_code == 200
+        assert response.json() == expected
+
+    def test_post_options_do_not_split_cooler_tiles(self, cooler_tileset):
+        repo = tileset_repository.StubTilesetRepository()
+
+        assert asyncio.run(repo.get_tile_options(cooler_tileset.uuid, {"aggGroups": [0], "aggFunc": "sum"})) is None
+
+    def test_get_cooler_tile_invalid_zoom(self, client, cooler_tileset):
+        response = client.get(f"/api/v1/tiles/?d={cooler_tileset.uuid}.12.0.0")
+
+        assert response.status_code == 200
+        assert "error" in response.json()["data"][f"{cooler_tileset.uuid}.12.0.0"]
+
+    def test_get_tileset_info_from_file(self, client, cooler_tileset):
+        response = client.get(f"/api/v1/tileset_info/?d={cooler_tileset.uuid}")
+
+        assert response.status_code == 200
+        info = response.json()["data"][cooler_tileset.uuid]
+        assert info["name"] == "Test mcool"
+        assert info["resolutions"] == sorted(RESOLUTIONS, reverse=True)
+
+
+class TestAppRepository:
+    """Tests for the repository shared by all requests"""
+
+    def test_requests_share_one_repository(self, client, cooler_tileset):
+        client.get(f"/api/v1/tileset_info/?d={cooler_tileset.uuid}")
+        repo = app.state.tileset_repository
+        hits = repo.stats()["tileset_info_cache"]["hits"]
+        client.get(f"/api/v1/tileset_info/?d={cooler_tileset.uuid}")
+
+        assert app.state.tileset_repository is repo
+        metrics = client.get("/api/v1/metrics/").json()
+        assert metrics["tileset_info_cache"]["hits"] == hits + 1
+
+    def test_lifespan_warms_up_and_closes(self, cooler_tileset, monkeypatch, mocker):
+        monkeypatch.setattr(app.state, "tileset_repository", None, raising=False)
+        monkeypatch.setattr(app.state, "tile_cache", None, raising=False)
+        close_cache = mocker.patch.object(LRUTileCache, "close")
+
+        with TestClient(app) as client:
+            repo = app.state.tileset_repository
+            assert repo.stats()["tileset_info_cache"]["entries"] == 1
+            assert repo.stats()["hdf5_handles"]["open"] == 1
+            client.get(f"/api/v1/tiles/?d={cooler_tileset.uuid}.3.0.0")
+            assert repo.stats()["hdf5_handles"]["opens"] == 1
+            assert client.get("/api/v1/metrics/").json()["tile_cache"]["misses"] == 1
+
+        assert app.state.tileset_repository is None
+        assert app.state.tile_cache is None
+        close_cache.assert_awaited_once()
+        assert repo.stats()["hdf5_handles"]["open"] == 0
+        with pytest.raises(RuntimeError):
+            repo._executor.executor.submit(int)
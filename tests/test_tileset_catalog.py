@@ -0,0 +1,423 @@
+import datetime
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import TilesetPublic
+from app.services.ngram_index import NgramIndex
+from app.services.pagination import PageCursor, encode_cursor
+from app.services import tileset_catalog
+from app.services.tileset_catalog import TilesetCatalog
+
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_tileset(uuid, name=None, datatype="matrix", filetype="cooler", owner=None, days=None, coord_system=None):
+    created = EPOCH + datetime.timedelta(days=days) if days is not None else None
+    return TilesetPublic(
+        uuid=uuid,
+        name=name,
+        datatype=datatype,
+        filetype=filetype,
+        owner=owner,
+        created=created,
+        coordSystem=coord_system,
+    )
+
+
+@pytest.fixture
+def catalog():
+    """A small catalog with a mix of datatypes, owners and missing names"""
+    return TilesetCatalog(
+        [
+            make_tileset("c", name="Beta", owner="ann", days=3),
+            make_tileset("a", name="alpha", datatype="vector", filetype="bigwig", owner="bob", days=1),
+            make_tileset("e", name=None, datatype="chromsizes", filetype="chromsizes-tsv", days=None),
+            make_tileset("b", name="Beta", owner="bob", days=2),
+            make_tileset("d", name="Delta", datatype="vector", filetype="bigwig", owner="ann", days=0),
+        ]
+    )
+
+
+def uuids(result):
+    tilesets, _ = result
+    return [ts.uuid for ts in tilesets]
+
+
+class TestTilesetCatalog:
+    """Tests for the indexed in-memory tileset catalog"""
+
+    def test_mapping_interface(self, catalog):
+        assert len(catalog) == 5
+        assert "a" in catalog
+        assert catalog.get("missing") is None
+        assert list(catalog) == ["c", "a", "e", "b", "d"]
+
+    def test_default_order_is_insertion_order(self, catalog):
+        assert uuids(catalog.query()) == ["c", "a", "e", "b", "d"]
+
+    def test_replacing_a_tileset_keeps_its_position(self, catalog):
+        catalog["a"] = make_tileset("a", name="Zeta", datatype="matrix")
+
+        assert uuids(catalog.query()) == ["c", "a", "e", "b", "d"]
+        assert uuids(catalog.query({"datatype": ["vector"]})) == ["d"]
+        assert uuids(catalog.query(order_by="name")) == ["e", "b", "c", "d", "a"]
+
+    def test_order_by_name_puts_none_first_and_breaks_ties_by_uuid(self, catalog):
+        assert uuids(catalog.query(order_by="name")) == ["e", "b", "c", "d", "a"]
+        assert uuids(catalog.query(order_by="name", reverse=True)) == ["a", "d", "c", "b", "e"]
+
+    def test_order_by_created(self, catalog):
+        assert uuids(catalog.query(order_by="created")) == ["e", "d", "a", "b", "c"]
+
+    def test_filters(self, catalog):
+        assert uuids(catalog.query({"datatype": ["vector", "chromsizes"]}, order_by="name")) == ["e", "d", "a"]
+        assert uuids(catalog.query({"datatype": ["vector"], "owner": ["ann"]})) == ["d"]
+        assert uuids(catalog.query({"filetype": ["hitile"]})) == []
+
+    def test_predicate_and_total(self, catalog):
+        page, total = catalog.query(
+            {"filetype": ["cooler"]}, order_by="name", predicate=lambda ts: ts.owner == "bob", limit=10
+        )
+
+        assert [ts.uuid for ts in page] == ["b"]
+        assert total == 1
+
+    def test_pages(self, catalog):
+        assert catalog.query(order_by="name", offset=1, limit=2)[0] == [catalog["b"], catalog["c"]]
+        assert uuids(catalog.query(order_by="name", reverse=True, offset=3, limit=5)) == ["b", "e"]
+        assert uuids(catalog.query({"datatype": ["vector", "matrix"]}, offset=1, limit=2)) == ["a", "b"]
+        page, total = catalog.query(offset=10, limit=5)
+        assert (page, total) == ([], 5)
+
+    def test_delete_removes_from_every_index(self, catalog):
+        del catalog["d"]
+
+        assert "d" not in catalog
+        assert uuids(catalog.query({"datatype": ["vector"]})) == ["a"]
+        assert uuids(catalog.query({"owner": ["ann"]}, order_by="created")) == ["c"]
+        with pytest.raises(KeyError):
+            del catalog["d"]
+
+    def test_order_by_other_field(self, catalog):
+        assert uuids(catalog.query({"datatype": ["matrix", "vector"]}, order_by="owner")) == ["c", "d", "a", "b"]
+
+    def test_rejects_unindexed_filters(self, catalog):
+        with pytest.raises(ValueError):
+            catalog.query({"name": ["alpha"]})
+
+    def test_matches_a_full_scan(self):
+        rng = random.Random(0)
+        tilesets = [
+            make_tileset(
+                f"ts{i:04d}",
+                name=rng.choice([None, "a", "b", "c", "d"]),
+                datatype=rng.choice(["matrix", "vector", "chromsizes"]),
+                owner=rng.choice([None, "ann", "bob"]),
+                days=rng.choice([None, 1, 2, 3]),
+            )
+            for i in range(300)
+        ]
+        catalog = TilesetCatalog(tilesets[:150])
+        for tileset in tilesets[150:]:
+            catalog[tileset.uuid] = tileset
+        for tileset in tilesets[::7]:
+            del catalog[tileset.uuid]
+        remaining = [ts for ts in tilesets if ts.uuid in catalog]
+
+        def scan(datatypes, owner, order_by, reverse):
+            matches = [ts for ts in remaining if ts.datatype in datatypes and (owner is None or ts.owner == owner)]
+            return sorted(
+                matches,
+                key=lambda ts: (getattr(ts, order_by) is not None, getattr(ts, order_by) or "", ts.uuid),
+                reverse=reverse,
+            )
+
+        for datatypes in (["matrix"], ["vector", "chromsizes"]):
+            for owner in (None, "ann"):
+                for order_by in ("name", "created"):
+                    for reverse in (False, True):
+                        expected = scan(datatypes, owner, order_by, reverse)
+                        filters = {"datatype": datatypes, **({"owner": [owner]} if owner else {})}
+                        page, total = catalog.query(filters, order_by=order_by, reverse=reverse, offset=5, limit=20)
+                        assert total == len(expected)
+                        assert page == expected[5:25]
+
+
+class TestCatalogKeysetPages:
+    """Tests for resuming catalog queries after a sort key"""
+
+    def test_after_matches_offset_pages(self):
+        rng = random.Random(2)
+        catalog = TilesetCatalog(
+            make_tileset(
+                f"ts{i:04d}",
+                name=rng.choice([None, "hic rao", "chip seq", "atac", "rao chip"]),
+                datatype=rng.choice(["matrix", "vector", "chromsizes"]),
+                owner=rng.choice([None, "ann", "bob"]),
+                days=rng.choice([None, 1, 2, 3]),
+            )
+            for i in range(200)
+        )
+        queries = [
+            {},
+            {"filters": {"datatype": ["matrix"]}},
+            {"filters": {"datatype": ["matrix", "vector"]}},
+            {"filters": {"datatype": ["matrix"], "owner": ["ann"]}},
+            {"name_contains": "rao"},
+            {"name_contains": "ra"},
+            {"filters": {"datatype": ["vector"]}, "name_contains": "chip"},
+        ]
+        for query in queries:
+            for order_by in (None, "name", "created", "owner"):
+                for reverse in (False, True):
+                    expected, expected_total = catalog.query(**query, order_by=order_by, reverse=reverse)
+                    pages = []
+                    after = None
+                    while True:
+                        page, total = catalog.query(**query, order_by=order_by, reverse=reverse, after=after, limit=7)
+                        assert total == expected_total, (query, order_by, reverse)
+                        if not page:
+                            break
+                        pages.extend(page)
+                        after = catalog.sort_key(page[-1], order_by)
+                    assert pages == expected, (query, order_by, reverse)
+
+    def test_pages_do_not_shift_when_tilesets_are_added(self, catalog):
+        page, _ = catalog.query(order_by="name", limit=2)
+        after = catalog.sort_key(page[-1], "name")
+        catalog["0"] = make_tileset("0", name="Aardvark")
+
+        assert uuids(catalog.query(order_by="name", after=after, limit=2)) == ["c", "d"]
+
+
+class TestCatalogAssemblies:
+    """Tests for the assembly index used to resolve chromosome sizes"""
+
+    def test_prefers_chromsizes_tilesets_and_resolves_synonyms(self):
+        catalog = TilesetCatalog(
+            [
+                make_tileset("cool", coord_system="hg19"),
+                make_tileset("sizes", datatype="chromsizes", filetype="chromsizes-tsv", coord_system="GRCh37"),
+                make_tileset("mouse", coord_system="mm10"),
+            ]
+        )
+
+        for name in ["hg19", "HG19", "GRCh37", "grch37"]:
+            assert catalog.chromsizes_tileset(name).uuid == "sizes", name
+        assert catalog.chromsizes_tileset("GRCm38").uuid == "mouse"
+        assert catalog.chromsizes_tileset("hg38") is None
+
+    def test_index_follows_inserts_and_deletes(self):
+        catalog = TilesetCatalog([make_tileset("cool", coord_system="hg38")])
+        catalog["sizes"] = make_tileset("sizes", datatype="chromsizes", coord_system="hg38")
+        catalog["later"] = make_tileset("later", datatype="chromsizes", coord_system="GRCh38")
+
+        assert catalog.chromsizes_tileset("hg38").uuid == "sizes"
+        del catalog["sizes"]
+        assert catalog.chromsizes_tileset("hg38").uuid == "later"
+        catalog["later"] = make_tileset("later", coord_system="mm10")
+        assert catalog.chromsizes_tileset("hg38").uuid == "cool"
+        del catalog["cool"]
+        assert catalog.chromsizes_tileset("hg38") is None
+        assert catalog.chromsizes_tileset("mm10").uuid == "later"
+
+
+class TestNgramIndex:
+    """Tests for the case-insensitive substring index"""
+
+    def test_search(self):
+        index = NgramIndex(n=3)
+        index.add("a", "Hi-C Rao 2014")
+        index.add("b", "rao2014 ChIP")
+        index.add("c", "ChIP-seq")
+
+        assert index.search("RAO") == {"a", "b"}
+        assert index.search("chip") == {"b", "c"}
+        assert index.search("rao 2") == {"a"}
+        assert index.search("zzz") == set()
+        assert index.search("ch") is None
+
+    def test_grams_out_of_order_are_not_matches(self):
+        index = NgramIndex(n=3)
+        index.add("a", "abcxbcd")
+
+        assert index.search("abcd") == set()
+
+    def test_remove_and_replace(self):
+        index = NgramIndex(n=3)
+        index.add("a", "alpha")
+        index.add("a", "beta")
+        index.add("b", "alphabet")
+        index.remove("b")
+        index.remove("missing")
+
+        assert index.search("alp") == set()
+        assert index.search("bet") == {"a"}
+        assert len(index) == 1
+
+    def test_count_containing(self):
+        index = NgramIndex(n=3)
+        for key, text in enumerate(["aa", "ab", "ba", "abc"]):
+            index.add(str(key), text)
+        index.remove("0")
+
+        assert index.count_containing("a") == 3
+        assert index.count_containing("AB") == 2
+        assert index.count_containing("abc") == 1
+        assert index.count_containing("") == 3
+
+
+class TestCatalogAutocomplete:
+    """Tests for name substring queries on the catalog"""
+
+    def test_name_contains(self, catalog):
+        assert uuids(catalog.query(name_contains="BETA")) == ["c", "b"]
+        assert uuids(catalog.query(name_contains="ta", order_by="name")) == ["b", "c", "d"]
+        assert uuids(catalog.query({"owner": ["bob"]}, name_contains="bet")) == ["b"]
+        assert catalog.query(name_contains="nothing") == ([], 0)
+
+    def test_index_follows_inserts_and_deletes(self, catalog):
+        catalog["f"] = make_tileset("f", name="Betamax")
+        del catalog["c"]
+        catalog["b"] = make_tileset("b", name="Gamma")
+
+        assert uuids(catalog.query(name_contains="beta")) == ["f"]
+        assert uuids(catalog.query(name_contains="amm")) == ["b"]
+
+    def test_matches_a_full_scan(self):
+        rng = random.Random(1)
+        words = ["hic", "rao", "chip", "seq", "atac", "ctcf", "h3k27ac", "gm12878", "k562", "dnase"]
+        tilesets = [
+            make_tileset(
+                f"ts{i:04d}",
+                name=None if i % 17 == 0 else " ".join(rng.sample(words, 3)).title(),
+                datatype=rng.choice(["matrix", "vector"]),
+                days=rng.choice([None, 1, 2]),
+            )
+            for i in range(400)
+        ]
+        catalog = TilesetCatalog(tilesets)
+        for tileset in tilesets[::5]:
+            del catalog[tileset.uuid]
+        remaining = [ts for ts in tilesets if ts.uuid in catalog]
+
+        for needle in ["c", "Ch", "chi", "ctcf", "q h3", "ac K5", "xyz"]:
+            for datatypes in (None, ["matrix"]):
+                for order_by in (None, "name", "owner"):
+                    expected = [
+                        ts
+                        for ts in remaining
+                        if ts.name is not None
+                        and needle.lower() in ts.name.lower()
+                        and (datatypes is None or ts.datatype in datatypes)
+                    ]
+                    if order_by == "name":
+                        expected.sort(key=lambda ts: (ts.name, ts.uuid))
+                    elif order_by == "owner":
+                        expected.sort(key=lambda ts: ts.uuid)
+                    filters = {"datatype": datatypes} if datatypes else None
+                    page, total = catalog.query(filters, order_by=order_by, name_contains=needle, offset=3, limit=10)
+                    assert total == len(expected), (needle, datatypes, order_by)
+                    assert page == expected[3:13], (needle, datatypes, order_by)
+
+    @pytest.fixture
+    def small_limits(self, monkeypatch):
+        monkeypatch.setattr(tileset_catalog, "MAX_NAME_CANDIDATES", 20)
+        monkeypatch.setattr(tileset_catalog, "MAX_COUNT_WALK", 50)
+        monkeypatch.setattr(tileset_catalog, "COUNT_SAMPLE_SIZE", 400)
+
+    def test_estimates_large_totals(self, small_limits):
+        rng = random.Random(2)
+        words = ["hic", "rao", "chip", "seq", "atac", "ctcf", "h3k27ac", "gm12878", "k562", "dnase"]
+        tilesets = [
+            make_tileset(f"ts{i:04d}", name=" ".join(rng.sample(words, 3)), datatype=rng.choice(["matrix", "vector"]))
+            for i in range(2000)
+        ]
+        catalog = TilesetCatalog(tilesets)
+
+        for needle, datatypes, order_by in [("k562", None, None), ("chip", ["matrix"], "name"), ("c h", None, "name")]:
+            expected = [ts for ts in tilesets if needle in ts.name and (datatypes is None or ts.datatype in datatypes)]
+            if order_by == "name":
+                expected.sort(key=lambda ts: (ts.name, ts.uuid))
+            filters = {"datatype": datatypes} if datatypes else None
+            page, total = catalog.query(filters, order_by=order_by, name_contains=needle, limit=10)
+
+            assert page == expected[:10], needle
+            assert total == pytest.approx(len(expected), rel=0.25), needle
+
+    def test_counts_rare_matches_exactly(self, small_limits):
+        # Every n-gram of "xbetax" is common, the needle itself is not
+        names = ["xbeta" if i % 2 else "betax" for i in range(2000)]
+        names[3] = "xbetax"
+        catalog = TilesetCatalog(make_tileset(f"ts{i:04d}", name=name) for i, name in enumerate(names))
+
+        assert uuids(catalog.query(name_contains="xbetax")) == ["ts0003"]
+        assert catalog.query(name_contains="xbetax")[1] == 1
+        assert catalog.query({"datatype": ["matrix"]}, name_contains="xbetax")[1] == 1
+
+
+class TestListTilesetsEndpoint:
+    """Tests for filtering and ordering on /api/v1/tilesets/"""
+
+    def test_order_by_name(self):
+        response = TestClient(app).get("/api/v1/tilesets/", params={"o": "name", "dt": ["chromsizes"]})
+
+        assert response.status_code == 200
+        data = response.json()
+        names = [ts["name"] for ts in data["results"]]
+        assert data["count"] == 3
+        assert names == sorted(names)
+
+    def test_autocomplete_and_filetype(self):
+        response = TestClient(app).get("/api/v1/tilesets/", params={"ac": "COOLER", "t": "cooler"})
+
+        assert [ts["uuid"] for ts in response.json()["results"]] == ["stub_cooler_1", "stub_cooler_2"]
+
+    def test_next_and_previous_cursors(self):
+        client = TestClient(app)
+        everything = client.get("/api/v1/tilesets/", params={"o": "name", "page_size": 100}).json()
+        expected = [ts["uuid"] for ts in everything["results"]]
+        assert everything["next"] is None and everything["previous"] is None
+
+        pages = []
+        url = "/api/v1/tilesets/?o=name&page_size=2"
+        while url is not None:
+            data = client.get(url).json()
+            assert data["count"] == len(expected)
+            pages.append([ts["uuid"] for ts in data["results"]])
+            last_url, url = url, data["next"]
+        assert sum(pages, []) == expected
+        assert "o=name" in last_url
+
+        backwards = []
+        url = client.get(last_url).json()["previous"]
+        while url is not None:
+            data = client.get(url).json()
+            backwards.insert(0, [ts["uuid"] for ts in data["results"]])
+            url = data["previous"]
+        assert backwards == pages[:-1]
+
+    def test_rejects_foreign_cursors(self):
+        client = TestClient(app)
+        next_url = client.get("/api/v1/tilesets/", params={"o": "name", "page_size": 1}).json()["next"]
+        cursor = next_url.split("cursor=")[1]
+
+        assert client.get("/api/v1/tilesets/", params={"cursor": cursor}).status_code == 400
+        assert client.get("/api/v1/tilesets/", params={"cursor": "not-a-cursor"}).status_code == 400
+        assert client.get("/api/v1/available-chrom-sizes/", params={"cursor": cursor}).status_code == 400
+
+    @pytest.mark.parametrize(
+        "order_by, key",
+        [(None, ("abc",)), (None, (None,)), (None, (1, 2)), ("name", (1, 5, "x")), ("created", (1, "x", "y"))],
+    )
+    def test_rejects_cursors_with_mistyped_keys(self, order_by, key):
+        client = TestClient(app)
+        cursor = encode_cursor(PageCursor(order_by, False, key))
+        params = {"cursor": cursor, "o": order_by} if order_by else {"cursor": cursor}
+
+        assert client.get("/api/v1/tilesets/", params=params).status_code == 400
+        if order_by is None:
+            assert client.get("/api/v1/available-chrom-sizes/", params={"cursor": cursor}).status_code == 400